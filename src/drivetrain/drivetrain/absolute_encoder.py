@@ -0,0 +1,42 @@
+# This module contains the code for reading the absolute encoders on the swerve modules.
+
+import numpy as np
+
+
+class AbsoluteEncoder:
+    """An absolute encoder with a precomputed lookup table and a streaming circular mean filter.
+
+    Raw readings (in encoder counts) are converted to angles (in degrees) with a lookup table that already
+    accounts for the magnet offset. The most recent filter_window readings are kept in a ring buffer as unit vectors,
+    so that the filtered angle is a circular mean that behaves correctly when the readings wrap around 0/360 degrees.
+    """
+
+    def __init__(self, magnet_offset: int, counts: int, filter_window: int = 5):
+        self.counts = counts
+        # Angle (in degrees) of every possible raw reading, indexed by the raw reading
+        self.angle_table = 360 * ((np.arange(counts) - magnet_offset) % counts) / counts
+        # Unit vector [cos, sin] of every possible raw reading, indexed by the raw reading
+        self.unit_vector_table = np.stack(
+            [np.cos(np.radians(self.angle_table)), np.sin(np.radians(self.angle_table))], axis=-1
+        )
+
+        self.samples = np.zeros((max(filter_window, 1), 2))
+        self.num_samples = 0
+
+    def update(self, raw: int) -> None:
+        """Add a new raw reading (in encoder counts) to the filter."""
+        self.samples[self.num_samples % len(self.samples)] = self.unit_vector_table[raw % self.counts]
+        self.num_samples += 1
+
+    @property
+    def is_full(self) -> bool:
+        """Whether the filter window has been filled with readings (so the angle is fully filtered)."""
+        return self.num_samples >= len(self.samples)
+
+    @property
+    def angle(self):
+        """The filtered angle (in degrees, from 0 to 360), or None if there have been no readings."""
+        if self.num_samples == 0:
+            return None
+        cos_sum, sin_sum = np.sum(self.samples[: min(self.num_samples, len(self.samples))], axis=0)
+        return float(np.degrees(np.arctan2(sin_sum, cos_sum)) % 360)
@@ -0,0 +1,161 @@
+# This module contains the typed configuration of the drivetrain node (see config/drivetrain_config.yaml).
+
+import dataclasses
+from dataclasses import dataclass, field
+
+
+def default_module_positions(half_wheel_base: float, half_track_width: float) -> list:
+    """Flattened [x, y] positions of a rectangular FL, FR, BL, BR module layout."""
+    return [
+        half_wheel_base,
+        half_track_width,
+        half_wheel_base,
+        -half_track_width,
+        -half_wheel_base,
+        half_track_width,
+        -half_wheel_base,
+        -half_track_width,
+    ]
+
+
+@dataclass(frozen=True)
+class DrivetrainConfig:
+    """Every ROS parameter of the drivetrain node, with its type and default value.
+
+    The field names are the parameter names. Call validate() before using a new config.
+    """
+
+    FRONT_LEFT_DRIVE: int = 10
+    FRONT_LEFT_TURN: int = 4
+    FRONT_RIGHT_DRIVE: int = 9
+    FRONT_RIGHT_TURN: int = 3
+    BACK_LEFT_DRIVE: int = 7
+    BACK_LEFT_TURN: int = 6
+    BACK_RIGHT_DRIVE: int = 8
+    BACK_RIGHT_TURN: int = 4
+    HALF_WHEEL_BASE: float = 0.5
+    HALF_TRACK_WIDTH: float = 0.5
+    # Flattened (N x 2) matrix of [x, y] module positions in meters (FL, FR, BL, BR)
+    # By default, this is derived from HALF_WHEEL_BASE and HALF_TRACK_WIDTH
+    MODULE_POSITIONS: list = field(default_factory=lambda: default_module_positions(0.5, 0.5))
+    STEERING_MOTOR_GEAR_RATIO: int = 40
+    FRONT_LEFT_MAGNET_OFFSET: int = 97
+    FRONT_RIGHT_MAGNET_OFFSET: int = 873
+    BACK_LEFT_MAGNET_OFFSET: int = 50
+    BACK_RIGHT_MAGNET_OFFSET: int = 647
+    ABSOLUTE_ENCODER_COUNTS: int = 1024
+    ABSOLUTE_ENCODER_FILTER_WINDOW: int = 5
+    GAZEBO_SIMULATION: bool = False
+    # Gazebo topics of each module's wheel and swerve joint (FL, FR, BL, BR)
+    GAZEBO_WHEEL_TOPICS: list = field(
+        default_factory=lambda: ["wheel1/cmd_vel", "wheel3/cmd_vel", "wheel4/cmd_vel", "wheel2/cmd_vel"]
+    )
+    GAZEBO_SWERVE_TOPICS: list = field(
+        default_factory=lambda: ["swerve1/cmd_pos", "swerve3/cmd_pos", "swerve4/cmd_pos", "swerve2/cmd_pos"]
+    )
+    POWER_SETPOINT_TOLERANCE: float = 0.005
+    ANGLE_SETPOINT_TOLERANCE: float = 0.5
+    SETPOINT_KEEPALIVE_INTERVAL: float = 0.5
+    CONTROL_LOOP_RATE: float = 0.0  # Set to 0 to drive on every cmd_vel message instead
+    CMD_VEL_TIMEOUT: float = 0.5
+    MAX_TELEMETRY_AGE: float = 1.0
+    ODOMETRY_RATE: float = 0.0  # Set to 0 to disable wheel odometry
+    PUBLISH_ODOMETRY_TF: bool = False
+    ODOMETRY_FRAME: str = "odom"
+    BASE_FRAME: str = "base_link"
+    WHEEL_RADIUS: float = 0.1
+    DRIVE_MOTOR_GEAR_RATIO: float = 1.0
+    DRIVE_MOTOR_POLE_PAIRS: int = 1
+    COSINE_SCALING: bool = False
+
+    # Parameters that create publishers or timers, so changing them requires restarting the node
+    RESTART_REQUIRED = frozenset(
+        [
+            "GAZEBO_SIMULATION",
+            "GAZEBO_WHEEL_TOPICS",
+            "GAZEBO_SWERVE_TOPICS",
+            "CONTROL_LOOP_RATE",
+            "ODOMETRY_RATE",
+            "PUBLISH_ODOMETRY_TF",
+        ]
+    )
+
+    @classmethod
+    def parameter_defaults(cls) -> list:
+        """Returns a list of (name, default value) pairs in the format expected by Node.declare_parameters()."""
+        return [(name, value) for name, value in dataclasses.asdict(cls()).items()]
+
+    @classmethod
+    def from_parameters(cls, parameters: dict) -> "DrivetrainConfig":
+        """Create a config from a dictionary of parameter names -> values (unknown names are ignored)."""
+        values = {}
+        for config_field in dataclasses.fields(cls):
+            if config_field.name in parameters:
+                value = parameters[config_field.name]
+                # ROS 2 returns array parameters as array.array (or tuples), so convert them to lists
+                values[config_field.name] = list(value) if config_field.type is list else value
+        return cls(**values)
+
+    def replace(self, parameters: dict) -> "DrivetrainConfig":
+        """Returns a copy of this config with some parameters changed.
+
+        Changing HALF_WHEEL_BASE or HALF_TRACK_WIDTH also rebuilds MODULE_POSITIONS if it was derived from them. A
+        ValueError is raised if MODULE_POSITIONS was set explicitly instead, since the change would have no effect.
+        """
+        values = {**dataclasses.asdict(self), **parameters}
+        half_dimensions_changed = any(
+            name in parameters and parameters[name] != getattr(self, name)
+            for name in ["HALF_WHEEL_BASE", "HALF_TRACK_WIDTH"]
+        )
+        if half_dimensions_changed and "MODULE_POSITIONS" not in parameters:
+            if self.MODULE_POSITIONS != default_module_positions(self.HALF_WHEEL_BASE, self.HALF_TRACK_WIDTH):
+                raise ValueError(
+                    "MODULE_POSITIONS was set explicitly, so change it instead of HALF_WHEEL_BASE or HALF_TRACK_WIDTH"
+                )
+            values["MODULE_POSITIONS"] = default_module_positions(values["HALF_WHEEL_BASE"], values["HALF_TRACK_WIDTH"])
+        return DrivetrainConfig.from_parameters(values)
+
+    def validate(self, num_modules: int = 4) -> None:
+        """Raise a ValueError if any parameter has the wrong type or an impossible value."""
+        for config_field in dataclasses.fields(self):
+            value = getattr(self, config_field.name)
+            # Integers are allowed wherever a float is expected (but booleans are not numbers here)
+            expected_types = (int, float) if config_field.type is float else config_field.type
+            if isinstance(value, bool) != (config_field.type is bool) or not isinstance(value, expected_types):
+                raise ValueError(f"{config_field.name} must be a {config_field.type.__name__}, got {value!r}")
+
+        if len(self.MODULE_POSITIONS) != 2 * num_modules:
+            raise ValueError(
+                f"MODULE_POSITIONS must contain {num_modules} [x, y] pairs, got {len(self.MODULE_POSITIONS)} values"
+            )
+        if not len(self.GAZEBO_WHEEL_TOPICS) == len(self.GAZEBO_SWERVE_TOPICS) == num_modules:
+            raise ValueError("GAZEBO_WHEEL_TOPICS and GAZEBO_SWERVE_TOPICS must have one topic per module")
+        for name in ["STEERING_MOTOR_GEAR_RATIO", "DRIVE_MOTOR_GEAR_RATIO", "DRIVE_MOTOR_POLE_PAIRS", "WHEEL_RADIUS"]:
+            if getattr(self, name) == 0:
+                raise ValueError(f"{name} cannot be 0")
+        for name in ["ABSOLUTE_ENCODER_COUNTS", "ABSOLUTE_ENCODER_FILTER_WINDOW"]:
+            if getattr(self, name) < 1:
+                raise ValueError(f"{name} must be at least 1")
+        for name in [
+            "POWER_SETPOINT_TOLERANCE",
+            "ANGLE_SETPOINT_TOLERANCE",
+            "SETPOINT_KEEPALIVE_INTERVAL",
+            "CONTROL_LOOP_RATE",
+            "CMD_VEL_TIMEOUT",
+            "MAX_TELEMETRY_AGE",
+            "ODOMETRY_RATE",
+        ]:
+            if getattr(self, name) < 0:
+                raise ValueError(f"{name} cannot be negative")
+
+    def changed_parameters(self, other: "DrivetrainConfig") -> list:
+        """Returns the names of the parameters that differ between this config and another one."""
+        return [
+            config_field.name
+            for config_field in dataclasses.fields(self)
+            if getattr(self, config_field.name) != getattr(other, config_field.name)
+        ]
+
+    def summary(self) -> str:
+        """Returns every parameter on its own line (for logging)."""
+        return "\n".join(f"{name} has been set to: {value}" for name, value in dataclasses.asdict(self).items())
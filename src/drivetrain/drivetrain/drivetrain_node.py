@@ -3,302 +3,397 @@
 # Maintainer: Anthony Brogni <brogn002@umn.edu>
 # Last Updated: February 2024 by Anthony Brogni
 
+import dataclasses
 import math
+import time
+from collections import namedtuple
+
+import numpy as np
 
 # Import the ROS 2 module
 import rclpy
 from rclpy.node import Node
 
 # Import ROS 2 formatted message types
-from geometry_msgs.msg import Twist
+from rcl_interfaces.msg import SetParametersResult
+from geometry_msgs.msg import Twist, TransformStamped
+from nav_msgs.msg import Odometry
 from std_msgs.msg import Float64
+from tf2_ros import TransformBroadcaster
 
 # Import custom ROS 2 interfaces
-from rovr_interfaces.srv import Stop, Drive, MotorCommandSet, MotorCommandGet
-from rovr_interfaces.msg import AbsoluteEncoders
+from rovr_interfaces.srv import Stop, Drive, MotorCommandSetBatch, CalibrateDrivetrain
+from rovr_interfaces.msg import AbsoluteEncoders, MotorTelemetry
+
+# Import our swerve drive kinematics, absolute encoder filtering and typed configuration
+from drivetrain.swerve_kinematics import SwerveKinematics
+from drivetrain.absolute_encoder import AbsoluteEncoder
+from drivetrain.drivetrain_config import DrivetrainConfig, default_module_positions
+
+# The latest status of a motor from motor/telemetry (status_time is when its VESC sent it, in ROS time seconds)
+MotorStatus = namedtuple("MotorStatus", ["position", "velocity", "status_time"])
 
 
 # This class represents an individual swerve module
 class SwerveModule:
-    def __init__(self, drive_motor, turning_motor, drivetrain):
-        self.drive_motor_can_id = drive_motor
-        self.turning_motor_can_id = turning_motor
+    def __init__(self, drive_motor, turning_motor, magnet_offset, drivetrain):
         self.encoder_offset = 0
-        self.current_absolute_angle = None
+        self.absolute_encoder = None
+        self.absolute_encoder_settings = None
         self.gazebo_wheel = None
         self.gazebo_swerve = None
         self.prev_angle = 0.0
         self.drivetrain = drivetrain
 
-    def set_power(self, power: float) -> None:
-        self.drivetrain.cli_motor_set.call_async(
-            MotorCommandSet.Request(can_id=self.drive_motor_can_id, type="duty_cycle", value=power)
-        )
+        # Most recent measured state of the module (used for odometry)
+        self.measured_speed = None  # Wheel speed in meters per second
+        self.measured_angle = None  # Degrees from forwards going counterclockwise (same as prev_angle)
 
-    def set_angle(self, angle: float) -> None:
-        angle = (360 - angle) % 360
+        # Maps CAN ID -> (value, time in seconds) of the last command actually sent to that motor
+        self.last_sent_setpoints = {}
+        self.commands_sent = 0
+        self.commands_suppressed = 0
+
+        self.configure(drive_motor, turning_motor, magnet_offset)
 
-        self.drivetrain.cli_motor_set.call_async(
-            MotorCommandSet.Request(
-                can_id=self.turning_motor_can_id,
-                type="position",
-                value=(angle - self.encoder_offset) * self.drivetrain.STEERING_MOTOR_GEAR_RATIO,
-            )
+    def configure(self, drive_motor, turning_motor, magnet_offset) -> None:
+        """(Re)configure the motors and absolute encoder of this module, keeping its calibration (encoder_offset)."""
+        self.drive_motor_can_id = drive_motor
+        self.turning_motor_can_id = turning_motor
+        self.last_sent_setpoints.clear()  # The CAN IDs or gear ratio may have changed, so resend every setpoint
+
+        # Only rebuild the absolute encoder if its settings changed (rebuilding it discards the filtered readings)
+        settings = (
+            magnet_offset,
+            self.drivetrain.ABSOLUTE_ENCODER_COUNTS,
+            self.drivetrain.ABSOLUTE_ENCODER_FILTER_WINDOW,
         )
+        if settings != self.absolute_encoder_settings:
+            self.absolute_encoder = AbsoluteEncoder(*settings)
+            self.absolute_encoder_settings = settings
+
+    def should_send(self, can_id: int, value: float, tolerance: float) -> bool:
+        """Returns whether a setpoint differs enough from the last one sent (or is due for a keepalive)."""
+        now = self.drivetrain.get_clock().now().nanoseconds / 1e9
+        last_sent = self.last_sent_setpoints.get(can_id)
+        if (
+            last_sent is not None
+            and abs(value - last_sent[0]) <= tolerance
+            and now - last_sent[1] < self.drivetrain.SETPOINT_KEEPALIVE_INTERVAL
+        ):
+            self.commands_suppressed += 1
+            return False
+        self.last_sent_setpoints[can_id] = (value, now)
+        self.commands_sent += 1
+        return True
+
+    # NOTE: set_power and set_angle only queue their motor commands.
+    # Call drivetrain.send_motor_commands() to actually send them (all at once).
+    # Both return whether the setpoint was sent (False if it was suppressed).
+    def set_power(self, power: float) -> bool:
+        if not self.should_send(self.drive_motor_can_id, power, self.drivetrain.POWER_SETPOINT_TOLERANCE):
+            return False
+        self.drivetrain.queue_motor_command(self.drive_motor_can_id, "duty_cycle", power)
+        return True
+
+    def set_angle(self, angle: float) -> bool:
+        # Convert from counterclockwise -> clockwise
+        angle = (360 - angle) % 360
+        position = (angle - self.encoder_offset) * self.drivetrain.STEERING_MOTOR_GEAR_RATIO
+
+        # The tolerance is given in degrees of the wheel, so convert it to degrees of the motor
+        tolerance = self.drivetrain.ANGLE_SETPOINT_TOLERANCE * self.drivetrain.STEERING_MOTOR_GEAR_RATIO
+        if not self.should_send(self.turning_motor_can_id, position, tolerance):
+            return False
+        self.drivetrain.queue_motor_command(self.turning_motor_can_id, "position", position)
+        return True
 
     def reset(self, current_relative_angle) -> None:
-        self.encoder_offset = self.current_absolute_angle - current_relative_angle
+        self.last_sent_setpoints.clear()  # Always send the first setpoints after a reset
+        self.encoder_offset = self.absolute_encoder.angle - current_relative_angle
         self.drivetrain.get_logger().info(
             f"CAN ID {self.turning_motor_can_id} Absolute Encoder angle offset set to: {self.encoder_offset}"
         )
-        self.set_angle(0)  # Rotate the module to the 0 degree position
+        self.set_angle(0)  # Rotate the module to the 0 degree position (queued)
+
+    def update_measured_state(self) -> None:
+        """Update the measured speed and angle of this module from the latest motor telemetry (None if stale)."""
+        drive_status = self.drivetrain.get_motor_status(self.drive_motor_can_id)
+        if drive_status is None:
+            self.measured_speed = None
+        else:
+            self.measured_speed = self.drivetrain.rpm_to_meters_per_second(drive_status.velocity)
+
+        turning_status = self.drivetrain.get_motor_status(self.turning_motor_can_id)
+        if turning_status is None:
+            self.measured_angle = None
+        else:
+            # Undo the conversions done in set_angle
+            angle = turning_status.position / self.drivetrain.STEERING_MOTOR_GEAR_RATIO + self.encoder_offset
+            self.measured_angle = (360 - angle) % 360
 
     def set_state(self, power: float, angle: float) -> None:
-        self.set_angle(angle)
-        self.set_power(power)
+        angle_sent = self.set_angle(angle)
+        power_sent = self.set_power(power)
+        # Only publish the setpoints that were sent (the Gazebo joint controllers hold the last command they got)
         if self.drivetrain.GAZEBO_SIMULATION:
-            self.publish_gazebo(power, angle)
+            self.publish_gazebo(power if power_sent else None, angle if angle_sent else None)
 
     def set_gazebo_pubs(self, wheel, swerve):
         self.gazebo_wheel = wheel
         self.gazebo_swerve = swerve
 
-    def publish_gazebo(self, power: float, angle: float) -> None:
-        # Convert from counterclockwise -> clockwise
-        angle = (360 - angle) % 360
-        # Convert from degrees to radians
-        rad = angle * math.pi / 180
-
-        speed = power * 5
-        self.gazebo_wheel.publish(Float64(data=speed))
-        self.gazebo_swerve.publish(Float64(data=rad))
+    def publish_gazebo(self, power, angle) -> None:
+        """Publish the wheel velocity and swerve position of this module to Gazebo (skipping any that are None)."""
+        if power is not None:
+            speed = power * 5
+            self.gazebo_wheel.publish(Float64(data=speed))
+        if angle is not None:
+            # Convert from counterclockwise -> clockwise
+            angle = (360 - angle) % 360
+            # Convert from degrees to radians
+            rad = angle * math.pi / 180
+            self.gazebo_swerve.publish(Float64(data=rad))
 
 
 # This class represents the drivetrain as a whole (4 swerve modules)
 class DrivetrainNode(Node):
-    def __init__(self):
-        """Initialize the ROS 2 drivetrain node."""
-        super().__init__("drivetrain")
-
-        # Define default values for our ROS parameters below #
-        self.declare_parameter("FRONT_LEFT_DRIVE", 10)
-        self.declare_parameter("FRONT_LEFT_TURN", 4)
-        self.declare_parameter("FRONT_RIGHT_DRIVE", 9)
-        self.declare_parameter("FRONT_RIGHT_TURN", 3)
-        self.declare_parameter("BACK_LEFT_DRIVE", 7)
-        self.declare_parameter("BACK_LEFT_TURN", 6)
-        self.declare_parameter("BACK_RIGHT_DRIVE", 8)
-        self.declare_parameter("BACK_RIGHT_TURN", 4)
-        self.declare_parameter("HALF_WHEEL_BASE", 0.5)
-        self.declare_parameter("HALF_TRACK_WIDTH", 0.5)
-        self.declare_parameter("STEERING_MOTOR_GEAR_RATIO", 40)
-        self.declare_parameter("FRONT_LEFT_MAGNET_OFFSET", 97)
-        self.declare_parameter("FRONT_RIGHT_MAGNET_OFFSET", 873)
-        self.declare_parameter("BACK_LEFT_MAGNET_OFFSET", 50)
-        self.declare_parameter("BACK_RIGHT_MAGNET_OFFSET", 647)
-        self.declare_parameter("ABSOLUTE_ENCODER_COUNTS", 1024)
-        self.declare_parameter("GAZEBO_SIMULATION", False)
-
-        # Assign the ROS Parameters to member variables below #
-        self.FRONT_LEFT_DRIVE = self.get_parameter("FRONT_LEFT_DRIVE").value
-        self.FRONT_LEFT_TURN = self.get_parameter("FRONT_LEFT_TURN").value
-        self.FRONT_RIGHT_DRIVE = self.get_parameter("FRONT_RIGHT_DRIVE").value
-        self.FRONT_RIGHT_TURN = self.get_parameter("FRONT_RIGHT_TURN").value
-        self.BACK_LEFT_DRIVE = self.get_parameter("BACK_LEFT_DRIVE").value
-        self.BACK_LEFT_TURN = self.get_parameter("BACK_LEFT_TURN").value
-        self.BACK_RIGHT_DRIVE = self.get_parameter("BACK_RIGHT_DRIVE").value
-        self.BACK_RIGHT_TURN = self.get_parameter("BACK_RIGHT_TURN").value
-        self.HALF_WHEEL_BASE = self.get_parameter("HALF_WHEEL_BASE").value
-        self.HALF_TRACK_WIDTH = self.get_parameter("HALF_TRACK_WIDTH").value
-        self.STEERING_MOTOR_GEAR_RATIO = self.get_parameter("STEERING_MOTOR_GEAR_RATIO").value
-        self.FRONT_LEFT_MAGNET_OFFSET = self.get_parameter("FRONT_LEFT_MAGNET_OFFSET").value
-        self.FRONT_RIGHT_MAGNET_OFFSET = self.get_parameter("FRONT_RIGHT_MAGNET_OFFSET").value
-        self.BACK_LEFT_MAGNET_OFFSET = self.get_parameter("BACK_LEFT_MAGNET_OFFSET").value
-        self.BACK_RIGHT_MAGNET_OFFSET = self.get_parameter("BACK_RIGHT_MAGNET_OFFSET").value
-        self.ABSOLUTE_ENCODER_COUNTS = self.get_parameter("ABSOLUTE_ENCODER_COUNTS").value
-        self.GAZEBO_SIMULATION = self.get_parameter("GAZEBO_SIMULATION").value
+    def __init__(self, **kwargs):
+        """Initialize the ROS 2 drivetrain node (keyword arguments, e.g. parameter_overrides, are passed to Node)."""
+        super().__init__("drivetrain", **kwargs)
+
+        # Declare every ROS parameter (with its default value) at once, see drivetrain_config.py for the list #
+        self.declare_parameters(
+            "", [(name, value) for name, value in DrivetrainConfig.parameter_defaults() if name != "MODULE_POSITIONS"]
+        )
+        # By default, MODULE_POSITIONS is derived from HALF_WHEEL_BASE and HALF_TRACK_WIDTH
+        self.declare_parameter(
+            "MODULE_POSITIONS",
+            default_module_positions(
+                self.get_parameter("HALF_WHEEL_BASE").value, self.get_parameter("HALF_TRACK_WIDTH").value
+            ),
+        )
+
+        # Load and validate the ROS Parameters, then assign them to member variables #
+        config = DrivetrainConfig.from_parameters(
+            {name: parameter.value for name, parameter in self.get_parameters_by_prefix("").items()}
+        )
+        config.validate()
+        self.set_config(config)
 
         # Define publishers and subscribers here
         self.cmd_vel_sub = self.create_subscription(Twist, "cmd_vel", self.cmd_vel_callback, 10)
         self.absolute_encoders_sub = self.create_subscription(
             AbsoluteEncoders, "absoluteEncoders", self.absolute_encoders_callback, 10
         )
+        self.motor_telemetry_sub = self.create_subscription(
+            MotorTelemetry, "motor/telemetry", self.motor_telemetry_callback, 10
+        )
 
         if self.GAZEBO_SIMULATION:
-            self.gazebo_wheel1_pub = self.create_publisher(Float64, "wheel1/cmd_vel", 10)
-            self.gazebo_wheel2_pub = self.create_publisher(Float64, "wheel2/cmd_vel", 10)
-            self.gazebo_wheel3_pub = self.create_publisher(Float64, "wheel3/cmd_vel", 10)
-            self.gazebo_wheel4_pub = self.create_publisher(Float64, "wheel4/cmd_vel", 10)
-            self.gazebo_swerve1_pub = self.create_publisher(Float64, "swerve1/cmd_pos", 10)
-            self.gazebo_swerve2_pub = self.create_publisher(Float64, "swerve2/cmd_pos", 10)
-            self.gazebo_swerve3_pub = self.create_publisher(Float64, "swerve3/cmd_pos", 10)
-            self.gazebo_swerve4_pub = self.create_publisher(Float64, "swerve4/cmd_pos", 10)
+            self.gazebo_wheel_pubs = [self.create_publisher(Float64, topic, 10) for topic in self.GAZEBO_WHEEL_TOPICS]
+            self.gazebo_swerve_pubs = [self.create_publisher(Float64, topic, 10) for topic in self.GAZEBO_SWERVE_TOPICS]
+
+        if self.ODOMETRY_RATE > 0:
+            self.odometry_pub = self.create_publisher(Odometry, "wheel_odom", 10)
+            if self.PUBLISH_ODOMETRY_TF:
+                self.odometry_tf_broadcaster = TransformBroadcaster(self)
 
         # Define service clients here
-        self.cli_motor_set = self.create_client(MotorCommandSet, "motor/set")
-        self.cli_motor_get = self.create_client(MotorCommandGet, "motor/get")
+        self.cli_motor_set_batch = self.create_client(MotorCommandSetBatch, "motor/set_batch")
 
         # Define services (methods callable from the outside) here
         self.srv_stop = self.create_service(Stop, "drivetrain/stop", self.stop_callback)
         self.srv_drive = self.create_service(Drive, "drivetrain/drive", self.drive_callback)
-        self.srv_calibrate = self.create_service(Stop, "drivetrain/calibrate", self.calibrate_callback)
+        self.srv_calibrate = self.create_service(CalibrateDrivetrain, "drivetrain/calibrate", self.calibrate_callback)
+
+        # Motor commands waiting to be sent in the next motor/set_batch request
+        self.queued_motor_commands = MotorCommandSetBatch.Request()
+
+        # Most recent cmd_vel message (and when it was received) waiting for the control loop
+        # Only used when CONTROL_LOOP_RATE > 0, otherwise every cmd_vel message drives the robot immediately
+        self.latest_cmd_vel = None
+        self.latest_cmd_vel_time = None
+
+        # Wheel odometry state: pose [x, y, yaw] in the odometry frame and its covariance
+        self.odometry_pose = np.zeros(3)
+        self.odometry_pose_covariance = np.zeros((3, 3))
+        self.last_odometry_time = None
+
+        # Maps CAN ID -> MotorStatus of the latest motor/telemetry received for every motor
+        self.motor_statuses = {}
 
         # Define timers here
         self.absolute_angle_timer = self.create_timer(0.05, self.absolute_angle_reset)
+        if self.CONTROL_LOOP_RATE > 0:
+            self.control_loop_timer = self.create_timer(1 / self.CONTROL_LOOP_RATE, self.control_loop_callback)
+        if self.ODOMETRY_RATE > 0:
+            self.odometry_timer = self.create_timer(1 / self.ODOMETRY_RATE, self.odometry_callback)
 
         # Print the ROS Parameters to the terminal below #
-        self.get_logger().info("FRONT_LEFT_DRIVE has been set to: " + str(self.FRONT_LEFT_DRIVE))
-        self.get_logger().info("FRONT_LEFT_TURN has been set to: " + str(self.FRONT_LEFT_TURN))
-        self.get_logger().info("FRONT_RIGHT_DRIVE has been set to: " + str(self.FRONT_RIGHT_DRIVE))
-        self.get_logger().info("FRONT_RIGHT_TURN has been set to: " + str(self.FRONT_RIGHT_TURN))
-        self.get_logger().info("BACK_LEFT_DRIVE has been set to: " + str(self.BACK_LEFT_DRIVE))
-        self.get_logger().info("BACK_LEFT_TURN has been set to: " + str(self.BACK_LEFT_TURN))
-        self.get_logger().info("BACK_RIGHT_DRIVE has been set to: " + str(self.BACK_RIGHT_DRIVE))
-        self.get_logger().info("BACK_RIGHT_TURN has been set to: " + str(self.BACK_RIGHT_TURN))
-        self.get_logger().info("HALF_WHEEL_BASE has been set to: " + str(self.HALF_WHEEL_BASE))
-        self.get_logger().info("HALF_TRACK_WIDTH has been set to: " + str(self.HALF_TRACK_WIDTH))
-        self.get_logger().info("STEERING_MOTOR_GEAR_RATIO has been set to: " + str(self.STEERING_MOTOR_GEAR_RATIO))
-        self.get_logger().info("FRONT_LEFT_MAGNET_OFFSET has been set to: " + str(self.FRONT_LEFT_MAGNET_OFFSET))
-        self.get_logger().info("FRONT_RIGHT_MAGNET_OFFSET has been set to: " + str(self.FRONT_RIGHT_MAGNET_OFFSET))
-        self.get_logger().info("BACK_LEFT_MAGNET_OFFSET has been set to: " + str(self.BACK_LEFT_MAGNET_OFFSET))
-        self.get_logger().info("BACK_RIGHT_MAGNET_OFFSET has been set to: " + str(self.BACK_RIGHT_MAGNET_OFFSET))
-        self.get_logger().info("ABSOLUTE_ENCODER_COUNTS has been set to: " + str(self.ABSOLUTE_ENCODER_COUNTS))
-        self.get_logger().info("GAZEBO_SIMULATION has been set to: " + str(self.GAZEBO_SIMULATION))
+        self.get_logger().info(self.config.summary())
 
         # Create each swerve module using
-        self.front_left = SwerveModule(self.FRONT_LEFT_DRIVE, self.FRONT_LEFT_TURN, self)
-        self.front_right = SwerveModule(self.FRONT_RIGHT_DRIVE, self.FRONT_RIGHT_TURN, self)
-        self.back_left = SwerveModule(self.BACK_LEFT_DRIVE, self.BACK_LEFT_TURN, self)
-        self.back_right = SwerveModule(self.BACK_RIGHT_DRIVE, self.BACK_RIGHT_TURN, self)
+        self.front_left = SwerveModule(self.FRONT_LEFT_DRIVE, self.FRONT_LEFT_TURN, self.FRONT_LEFT_MAGNET_OFFSET, self)
+        self.front_right = SwerveModule(
+            self.FRONT_RIGHT_DRIVE, self.FRONT_RIGHT_TURN, self.FRONT_RIGHT_MAGNET_OFFSET, self
+        )
+        self.back_left = SwerveModule(self.BACK_LEFT_DRIVE, self.BACK_LEFT_TURN, self.BACK_LEFT_MAGNET_OFFSET, self)
+        self.back_right = SwerveModule(self.BACK_RIGHT_DRIVE, self.BACK_RIGHT_TURN, self.BACK_RIGHT_MAGNET_OFFSET, self)
+        # NOTE: The order of this list must match the order of the rows in MODULE_POSITIONS
+        self.modules = [self.front_left, self.front_right, self.back_left, self.back_right]
+
+        self.kinematics = self.create_kinematics()
 
         if self.GAZEBO_SIMULATION:
-            self.front_left.set_gazebo_pubs(self.gazebo_wheel1_pub, self.gazebo_swerve1_pub)
-            self.front_right.set_gazebo_pubs(self.gazebo_wheel3_pub, self.gazebo_swerve3_pub)
-            self.back_left.set_gazebo_pubs(self.gazebo_wheel4_pub, self.gazebo_swerve4_pub)
-            self.back_right.set_gazebo_pubs(self.gazebo_wheel2_pub, self.gazebo_swerve2_pub)
+            for module, wheel_pub, swerve_pub in zip(self.modules, self.gazebo_wheel_pubs, self.gazebo_swerve_pubs):
+                module.set_gazebo_pubs(wheel_pub, swerve_pub)
+
+        # Apply parameter changes made while the node is running (e.g. with ros2 param set)
+        self.add_on_set_parameters_callback(self.parameters_callback)
+
+    def set_config(self, config: DrivetrainConfig) -> None:
+        """This method makes a (validated) config the active one."""
+        self.config = config
+        # Keep every parameter available as a member variable (e.g. self.STEERING_MOTOR_GEAR_RATIO)
+        for name, value in dataclasses.asdict(config).items():
+            setattr(self, name, value)
+
+    def create_kinematics(self) -> SwerveKinematics:
+        """This method creates the swerve kinematics from the current parameters."""
+        return SwerveKinematics.from_flat_list(self.MODULE_POSITIONS, cosine_scaling=self.COSINE_SCALING)
+
+    def configure_modules(self) -> None:
+        """This method reconfigures the swerve modules and kinematics from the current parameters."""
+        self.front_left.configure(self.FRONT_LEFT_DRIVE, self.FRONT_LEFT_TURN, self.FRONT_LEFT_MAGNET_OFFSET)
+        self.front_right.configure(self.FRONT_RIGHT_DRIVE, self.FRONT_RIGHT_TURN, self.FRONT_RIGHT_MAGNET_OFFSET)
+        self.back_left.configure(self.BACK_LEFT_DRIVE, self.BACK_LEFT_TURN, self.BACK_LEFT_MAGNET_OFFSET)
+        self.back_right.configure(self.BACK_RIGHT_DRIVE, self.BACK_RIGHT_TURN, self.BACK_RIGHT_MAGNET_OFFSET)
+        self.kinematics = self.create_kinematics()
+
+    def parameters_callback(self, parameters: list) -> SetParametersResult:
+        """This method validates and applies parameter changes made while the node is running."""
+        try:
+            config = self.config.replace({parameter.name: parameter.value for parameter in parameters})
+            config.validate(len(self.modules))
+        except ValueError as error:
+            return SetParametersResult(successful=False, reason=str(error))
+
+        changed_parameters = config.changed_parameters(self.config)
+        restart_required = [name for name in changed_parameters if name in DrivetrainConfig.RESTART_REQUIRED]
+        if len(restart_required) > 0:
+            return SetParametersResult(successful=False, reason=f"Changing {restart_required} requires a restart")
+
+        self.set_config(config)
+        self.configure_modules()
+        for name in changed_parameters:
+            self.get_logger().info(f"{name} has been set to: {getattr(self, name)}")
+        if any(name.endswith("MAGNET_OFFSET") for name in changed_parameters):
+            self.get_logger().info("New magnet offsets will be used the next time the drivetrain is calibrated")
+        return SetParametersResult(successful=True)
 
     def absolute_angle_reset(self):
-        # self.front_left was chosen arbitrarily
-        if self.front_left.current_absolute_angle is not None:
+        """Calibrate the swerve modules once the absolute encoders and turning motor positions are available."""
+        if not self.absolute_angles_available() or None in self.turning_motor_positions():
+            return
+        if self.calibrate().success == 0:
             print("Absolute Encoder angles reset")
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            front_left_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.FRONT_LEFT_TURN)
-            )
-            front_left_future.add_done_callback(
-                lambda future: self.front_left.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            front_right_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.FRONT_RIGHT_TURN)
-            )
-            front_right_future.add_done_callback(
-                lambda future: self.front_right.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            back_left_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.BACK_LEFT_TURN)
-            )
-            back_left_future.add_done_callback(
-                lambda future: self.back_left.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            back_right_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.BACK_RIGHT_TURN)
-            )
-            back_right_future.add_done_callback(
-                lambda future: self.back_right.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
             self.absolute_angle_timer.cancel()
 
-    # Define subsystem methods here
-    def drive(self, forward_power: float, horizontal_power: float, turning_power: float) -> None:
-        """This method drives the robot with the desired forward, horizontal and turning power."""
+    def absolute_angles_available(self) -> bool:
+        """Returns whether a full filter window of absolute encoder readings was received for every swerve module."""
+        return all(module.absolute_encoder.is_full for module in self.modules)
+
+    def calibrate(self) -> CalibrateDrivetrain.Response:
+        """This method calibrates every swerve module using its absolute encoder.
+
+        The turning motor positions come from motor/telemetry. This never waits for telemetry (it runs inside our own
+        callbacks), so if any position is missing or stale it fails right away and the caller should try again later.
+        The new encoder offsets are only applied if every module has a fresh position, so the modules are never left
+        half-calibrated.
+        """
+        start_time = time.monotonic()
+        response = CalibrateDrivetrain.Response()
+        response.can_id = [module.turning_motor_can_id for module in self.modules]
+
+        # Position of each turning MOTOR (not the wheel) in degrees, or None if there is no fresh telemetry yet
+        motor_positions = self.turning_motor_positions()
+
+        response.module_success = [position is not None for position in motor_positions]
+        if all(response.module_success):
+            # Divide the motor positions by the gear ratio to get the wheel positions
+            for module, motor_position in zip(self.modules, motor_positions):
+                module.reset(motor_position / self.STEERING_MOTOR_GEAR_RATIO)
+            self.send_motor_commands()
+            response.success = 0  # indicates success
+        else:
+            failed_can_ids = [
+                can_id for can_id, module_success in zip(response.can_id, response.module_success) if not module_success
+            ]
+            self.get_logger().warn(f"Drivetrain calibration failed, no fresh telemetry from CAN IDs: {failed_can_ids}")
+            response.success = 1  # indicates failure
 
-        # reverse turning direction
-        turning_power *= -1
+        response.encoder_offset = [float(module.encoder_offset) for module in self.modules]
+        response.duration = time.monotonic() - start_time
+        self.get_logger().info(f"Drivetrain calibration took {response.duration:.3f} seconds")
+        return response
 
-        # Do not change the angle of the modules if the robot is being told to stop
-        if abs(forward_power) < 0.05 and abs(horizontal_power) < 0.05 and abs(turning_power) < 0.05:
-            self.front_left.set_state(0.0, self.front_left.prev_angle)
-            self.front_right.set_state(0.0, self.front_right.prev_angle)
-            self.back_left.set_state(0.0, self.back_left.prev_angle)
-            self.back_right.set_state(0.0, self.back_right.prev_angle)
+    def rpm_to_meters_per_second(self, rpm: float) -> float:
+        """Convert the (electrical) RPM reported by a drive motor's VESC to the wheel's ground speed."""
+        wheel_rpm = rpm / self.DRIVE_MOTOR_POLE_PAIRS / self.DRIVE_MOTOR_GEAR_RATIO
+        return wheel_rpm * 2 * math.pi * self.WHEEL_RADIUS / 60
+
+    def get_motor_status(self, can_id: int):
+        """Returns the latest MotorStatus of a motor, or None if it is older than MAX_TELEMETRY_AGE seconds."""
+        status = self.motor_statuses.get(can_id)
+        if status is None or self.get_clock().now().nanoseconds / 1e9 - status.status_time > self.MAX_TELEMETRY_AGE:
+            return None
+        return status
+
+    def turning_motor_positions(self) -> list:
+        """Returns the position of every module's turning motor (in degrees), or None if its telemetry is stale."""
+        positions = []
+        for module in self.modules:
+            status = self.get_motor_status(module.turning_motor_can_id)
+            positions.append(None if status is None or math.isnan(status.position) else status.position)
+        return positions
+
+    def queue_motor_command(self, can_id: int, command_type: str, value: float) -> None:
+        """This method queues a motor command to be sent by the next call to send_motor_commands()."""
+        self.queued_motor_commands.can_id.append(can_id)
+        self.queued_motor_commands.type.append(command_type)
+        self.queued_motor_commands.value.append(float(value))
+
+    def send_motor_commands(self) -> None:
+        """This method sends every queued motor command to the motor_control_node in a single request."""
+        if len(self.queued_motor_commands.can_id) == 0:
             return
+        self.cli_motor_set_batch.call_async(self.queued_motor_commands)
+        self.queued_motor_commands = MotorCommandSetBatch.Request()
 
-        # Vector layouts = [Drive Power, Drive Direction(Degrees from forwards going counterclockwise)]
-        # Intermediate equations to simplify future expressions
-        A = horizontal_power - turning_power * self.HALF_WHEEL_BASE
-        B = horizontal_power + turning_power * self.HALF_WHEEL_BASE
-        C = forward_power - turning_power * self.HALF_TRACK_WIDTH
-        D = forward_power + turning_power * self.HALF_TRACK_WIDTH
-
-        # Gives the desired speed and angle for each module
-        # Note: Angle has range from 0 to 360 degrees to make future calculations easier
-        front_left_vector = [math.sqrt(B**2 + D**2), ((math.atan2(B, D) * 180 / math.pi) + 360) % 360]
-        front_right_vector = [math.sqrt(B**2 + C**2), ((math.atan2(B, C) * 180 / math.pi) + 360) % 360]
-        back_left_vector = [math.sqrt(A**2 + D**2), ((math.atan2(A, D) * 180 / math.pi) + 360) % 360]
-        back_right_vector = [math.sqrt(A**2 + C**2), ((math.atan2(A, C) * 180 / math.pi) + 360) % 360]
-
-        # Normalize wheel speeds if necessary
-        largest_power = max(
-            [abs(front_left_vector[0]), abs(front_right_vector[0]), abs(back_left_vector[0]), abs(back_right_vector[0])]
+    # Define subsystem methods here
+    def drive(self, forward_power: float, horizontal_power: float, turning_power: float) -> None:
+        """This method drives the robot with the desired forward, horizontal and turning power."""
+        prev_angles = [module.prev_angle for module in self.modules]
+        # The measured module angles are only needed for cosine scaling (and only available with fresh telemetry)
+        current_angles = None
+        if self.COSINE_SCALING:
+            for module in self.modules:
+                module.update_measured_state()
+            current_angles = [module.measured_angle for module in self.modules]
+            if None in current_angles:
+                current_angles = None
+        # Gives the desired speed and angle (degrees from forwards going counterclockwise) for each module
+        speeds, angles = self.kinematics.inverse(
+            [forward_power, horizontal_power, turning_power], prev_angles, current_angles
         )
-        if largest_power > 1.0:
-            front_left_vector[0] = front_left_vector[0] / largest_power
-            front_right_vector[0] = front_right_vector[0] / largest_power
-            back_left_vector[0] = back_left_vector[0] / largest_power
-            back_right_vector[0] = back_right_vector[0] / largest_power
 
-        # Note: no module should ever have to rotate more than 90 degrees from its current angle
-        if (
-            abs(front_left_vector[1] - self.front_left.prev_angle) > 90
-            and abs(front_left_vector[1] - self.front_left.prev_angle) < 270
-        ):
-            front_left_vector[1] = (front_left_vector[1] + 180) % 360
-            # reverse speed of the module
-            front_left_vector[0] = front_left_vector[0] * -1
-        if (
-            abs(front_right_vector[1] - self.front_right.prev_angle) > 90
-            and abs(front_right_vector[1] - self.front_right.prev_angle) < 270
-        ):
-            front_right_vector[1] = (front_right_vector[1] + 180) % 360
-            # reverse speed of the module
-            front_right_vector[0] = front_right_vector[0] * -1
-        if (
-            abs(back_left_vector[1] - self.back_left.prev_angle) > 90
-            and abs(back_left_vector[1] - self.back_left.prev_angle) < 270
-        ):
-            back_left_vector[1] = (back_left_vector[1] + 180) % 360
-            # reverse speed of the module
-            back_left_vector[0] = back_left_vector[0] * -1
-        if (
-            abs(back_right_vector[1] - self.back_right.prev_angle) > 90
-            and abs(back_right_vector[1] - self.back_right.prev_angle) < 270
-        ):
-            back_right_vector[1] = (back_right_vector[1] + 180) % 360
-            # reverse speed of the module
-            back_right_vector[0] = back_right_vector[0] * -1
-
-        self.front_left.set_state(front_left_vector[0], front_left_vector[1])
-        self.front_right.set_state(front_right_vector[0], front_right_vector[1])
-        self.back_left.set_state(back_left_vector[0], back_left_vector[1])
-        self.back_right.set_state(back_right_vector[0], back_right_vector[1])
+        for module, speed, angle in zip(self.modules, speeds.tolist(), angles.tolist()):
+            module.set_state(speed, angle)
+            module.prev_angle = angle  # Update the prev_angle of each module
 
-        # Update the prev_angle of each module
-        self.front_left.prev_angle = front_left_vector[1]
-        self.front_right.prev_angle = front_right_vector[1]
-        self.back_left.prev_angle = back_left_vector[1]
-        self.back_right.prev_angle = back_right_vector[1]
+        # Send the setpoints of every module at once
+        self.send_motor_commands()
 
     def stop(self) -> None:
         """This method stops the drivetrain."""
@@ -308,76 +403,123 @@ class DrivetrainNode(Node):
 
     def stop_callback(self, request, response):
         """This service request stops the drivetrain."""
+        self.latest_cmd_vel = None  # Don't let the control loop override this request
         self.stop()
         response.success = 0  # indicates success
         return response
 
     def drive_callback(self, request, response):
         """This service request drives the robot with the specified speeds."""
+        self.latest_cmd_vel = None  # Don't let the control loop override this request
         self.drive(request.forward_power, request.horizontal_power, request.turning_power)
         response.success = 0  # indicates success
         return response
 
     def calibrate_callback(self, request, response):
         """This service request calibrates the drivetrain."""
-        if self.front_left.current_absolute_angle is not None:
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            front_left_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.FRONT_LEFT_TURN)
-            )
-            front_left_future.add_done_callback(
-                lambda future: self.front_left.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            front_right_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.FRONT_RIGHT_TURN)
-            )
-            front_right_future.add_done_callback(
-                lambda future: self.front_right.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            back_left_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.BACK_LEFT_TURN)
-            )
-            back_left_future.add_done_callback(
-                lambda future: self.back_left.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            # future.result().data will contain the position of the MOTOR (not the wheel) in degrees.
-            # Divide this by the gear ratio to get the wheel position.
-            back_right_future = self.cli_motor_get.call_async(
-                MotorCommandGet.Request(type="position", can_id=self.BACK_RIGHT_TURN)
-            )
-            back_right_future.add_done_callback(
-                lambda future: self.back_right.reset(future.result().data / self.STEERING_MOTOR_GEAR_RATIO)
-            )
-
-            response.success = 0  # indicates success
-        else:
+        if not self.absolute_angles_available():
+            self.get_logger().warn("Cannot calibrate the drivetrain before the absolute encoder filters are full")
             response.success = 1  # indicates failure
-        return response
+            return response
+        return self.calibrate()
+
+    # Define timer callback methods here
+
+    def control_loop_callback(self) -> None:
+        """This method drives the robot with the latest cmd_vel message at a fixed rate."""
+        msg = self.latest_cmd_vel
+        if msg is None:
+            return
+        if (self.get_clock().now() - self.latest_cmd_vel_time).nanoseconds / 1e9 > self.CMD_VEL_TIMEOUT:
+            self.get_logger().warn("cmd_vel has gone stale, stopping the drivetrain")
+            self.latest_cmd_vel = None
+            self.stop()
+            return
+        self.drive(msg.linear.y, msg.linear.x, msg.angular.z)
+
+    def odometry_callback(self) -> None:
+        """This method integrates and publishes the wheel odometry using the measured module states."""
+        for module in self.modules:
+            module.update_measured_state()
+        now = self.get_clock().now()
+        if any(module.measured_speed is None or module.measured_angle is None for module in self.modules):
+            self.last_odometry_time = now
+            return
+        dt = 0.0 if self.last_odometry_time is None else (now - self.last_odometry_time).nanoseconds / 1e9
+        self.last_odometry_time = now
+
+        chassis, chassis_covariance = self.kinematics.forward(
+            [module.measured_speed for module in self.modules], [module.measured_angle for module in self.modules]
+        )
+        # Reorder [forward, horizontal, turning] into the [x, y, yaw] convention used by cmd_vel_callback
+        velocity = chassis[[1, 0, 2]]
+        velocity_covariance = chassis_covariance[np.ix_([1, 0, 2], [1, 0, 2])] + np.eye(3) * 1e-4
+
+        # Integrate the velocity in the odometry frame (using the heading halfway through this time step)
+        heading = self.odometry_pose[2] + velocity[2] * dt / 2
+        rotation = np.array(
+            [[math.cos(heading), -math.sin(heading), 0.0], [math.sin(heading), math.cos(heading), 0.0], [0, 0, 1]]
+        )
+        self.odometry_pose += rotation @ velocity * dt
+        self.odometry_pose[2] = math.atan2(math.sin(self.odometry_pose[2]), math.cos(self.odometry_pose[2]))
+        self.odometry_pose_covariance += rotation @ velocity_covariance @ rotation.T * dt**2
+
+        x, y, yaw = self.odometry_pose.tolist()
+        msg = Odometry()
+        msg.header.stamp = now.to_msg()
+        msg.header.frame_id = self.ODOMETRY_FRAME
+        msg.child_frame_id = self.BASE_FRAME
+        msg.pose.pose.position.x = x
+        msg.pose.pose.position.y = y
+        msg.pose.pose.orientation.z = math.sin(yaw / 2)
+        msg.pose.pose.orientation.w = math.cos(yaw / 2)
+        msg.twist.twist.linear.x, msg.twist.twist.linear.y, msg.twist.twist.angular.z = velocity.tolist()
+
+        # Fill in the x, y, and yaw entries of the 6x6 covariance matrices
+        pose_covariance = np.zeros((6, 6))
+        pose_covariance[np.ix_([0, 1, 5], [0, 1, 5])] = self.odometry_pose_covariance
+        msg.pose.covariance = pose_covariance.flatten().tolist()
+        twist_covariance = np.zeros((6, 6))
+        twist_covariance[np.ix_([0, 1, 5], [0, 1, 5])] = velocity_covariance
+        msg.twist.covariance = twist_covariance.flatten().tolist()
+        self.odometry_pub.publish(msg)
+
+        if self.PUBLISH_ODOMETRY_TF:
+            transform = TransformStamped()
+            transform.header = msg.header
+            transform.child_frame_id = self.BASE_FRAME
+            transform.transform.translation.x = x
+            transform.transform.translation.y = y
+            transform.transform.rotation = msg.pose.pose.orientation
+            self.odometry_tf_broadcaster.sendTransform(transform)
 
     # Define subscriber callback methods here
 
     def cmd_vel_callback(self, msg: Twist) -> None:
         """This method is called whenever a message is received on the cmd_vel topic."""
-        self.drive(msg.linear.y, msg.linear.x, msg.angular.z)
+        if self.CONTROL_LOOP_RATE > 0:
+            # Only keep the latest message, the control loop will drive the robot on its next tick
+            self.latest_cmd_vel = msg
+            self.latest_cmd_vel_time = self.get_clock().now()
+        else:
+            self.drive(msg.linear.y, msg.linear.x, msg.angular.z)
+
+    def motor_telemetry_callback(self, msg: MotorTelemetry) -> None:
+        """This method is called whenever a message is received on the motor/telemetry topic."""
+        stamp = msg.header.stamp.sec + msg.header.stamp.nanosec / 1e9
+        for can_id, position, velocity, age in zip(msg.can_id, msg.position, msg.velocity, msg.age):
+            status = MotorStatus(position, velocity, stamp - age)
+            # The client node may process an old message late, so never replace newer telemetry with it
+            previous_status = self.motor_statuses.get(can_id)
+            if previous_status is None or status.status_time >= previous_status.status_time:
+                self.motor_statuses[can_id] = status
 
     def absolute_encoders_callback(self, msg: AbsoluteEncoders) -> None:
         """This method is called whenever a message is received on the absoluteEncoders topic."""
-        front_left_adjusted = (msg.front_left_encoder - self.FRONT_LEFT_MAGNET_OFFSET) % self.ABSOLUTE_ENCODER_COUNTS
-        front_right_adjusted = (msg.front_right_encoder - self.FRONT_RIGHT_MAGNET_OFFSET) % self.ABSOLUTE_ENCODER_COUNTS
-        back_left_adjusted = (msg.back_left_encoder - self.BACK_LEFT_MAGNET_OFFSET) % self.ABSOLUTE_ENCODER_COUNTS
-        back_right_adjusted = (msg.back_right_encoder - self.BACK_RIGHT_MAGNET_OFFSET) % self.ABSOLUTE_ENCODER_COUNTS
-        self.front_left.current_absolute_angle = 360 * front_left_adjusted / self.ABSOLUTE_ENCODER_COUNTS
-        self.front_right.current_absolute_angle = 360 * front_right_adjusted / self.ABSOLUTE_ENCODER_COUNTS
-        self.back_left.current_absolute_angle = 360 * back_left_adjusted / self.ABSOLUTE_ENCODER_COUNTS
-        self.back_right.current_absolute_angle = 360 * back_right_adjusted / self.ABSOLUTE_ENCODER_COUNTS
+        self.front_left.absolute_encoder.update(msg.front_left_encoder)
+        self.front_right.absolute_encoder.update(msg.front_right_encoder)
+        self.back_left.absolute_encoder.update(msg.back_left_encoder)
+        self.back_right.absolute_encoder.update(msg.back_right_encoder)
 
 
 def main(args=None):
@@ -0,0 +1,127 @@
+# This module contains the swerve drive kinematics math used by the drivetrain node.
+
+import numpy as np
+
+
+class SwerveKinematics:
+    """Batched inverse and forward kinematics for a swerve drivetrain with an arbitrary number of modules.
+
+    Module positions are given as an (N x 2) matrix of [x, y] rows in meters, where x points towards
+    the front of the robot and y points towards the left side of the robot.
+    Chassis commands are [forward_power, horizontal_power, turning_power] rows (duty cycle).
+    Module angles are in degrees from forwards going counterclockwise, in the range [0, 360).
+
+    If cosine_scaling is True, each module's speed is scaled by the cosine of its remaining steering error
+    (when the current module angles are given), so modules don't push in the wrong direction while turning.
+    """
+
+    def __init__(
+        self,
+        module_positions,
+        deadband: float = 0.05,
+        cosine_scaling: bool = False,
+    ):
+        self.module_positions = np.asarray(module_positions, dtype=np.float64).reshape(-1, 2)
+        self.num_modules = self.module_positions.shape[0]
+        self.deadband = deadband
+        self.cosine_scaling = cosine_scaling
+
+        # Linear system mapping a chassis command to the [forward, horizontal] components of every module:
+        # forward_i = forward - turning * y_i and horizontal_i = horizontal - turning * x_i
+        self.forward_matrix = np.zeros((2 * self.num_modules, 3))
+        self.forward_matrix[0::2, 0] = 1.0
+        self.forward_matrix[0::2, 2] = -self.module_positions[:, 1]
+        self.forward_matrix[1::2, 1] = 1.0
+        self.forward_matrix[1::2, 2] = -self.module_positions[:, 0]
+        # Precomputed least-squares solution of the (overdetermined) system above
+        self.forward_pseudo_inverse = np.linalg.pinv(self.forward_matrix)
+        self.forward_normal_inverse = np.linalg.pinv(self.forward_matrix.T @ self.forward_matrix)
+
+    @classmethod
+    def from_flat_list(cls, flat_positions, **kwargs) -> "SwerveKinematics":
+        """Create the kinematics from a flat [x0, y0, x1, y1, ...] list (ROS 2 parameters cannot be 2D)."""
+        if len(flat_positions) == 0 or len(flat_positions) % 2 != 0:
+            raise ValueError(f"Module positions must be a list of [x, y] pairs, got {len(flat_positions)} values")
+        return cls(np.reshape(flat_positions, (-1, 2)), **kwargs)
+
+    def module_vectors(self, commands) -> tuple:
+        """Compute the raw (un-normalized, un-optimized) speed and angle of every module.
+
+        commands can be a single [forward, horizontal, turning] command or an (M x 3) array of them.
+        Returns a tuple of (speeds, angles), each with shape (..., N).
+        """
+        commands = np.asarray(commands, dtype=np.float64)
+        forward = commands[..., 0:1]
+        horizontal = commands[..., 1:2]
+        turning = commands[..., 2:3]
+
+        # Velocity of each module = chassis velocity + (turning rate x module position)
+        # NOTE: The turning direction is reversed to match the steering motor convention
+        horizontal_components = horizontal - turning * self.module_positions[:, 0]
+        forward_components = forward - turning * self.module_positions[:, 1]
+
+        speeds = np.hypot(horizontal_components, forward_components)
+        angles = np.degrees(np.arctan2(horizontal_components, forward_components)) % 360
+        return speeds, angles
+
+    def inverse(self, commands, prev_angles=None, current_angles=None) -> tuple:
+        """Compute the speed and angle setpoints of every module for one or more chassis commands.
+
+        Wheel speeds are normalized so that no module exceeds full power, and any module that would have to
+        rotate more than 90 degrees from its previous angle is flipped 180 degrees with its speed reversed.
+        If a command is within the deadband, every module keeps its previous angle with zero speed.
+        current_angles (the measured module angles) are only used for cosine scaling.
+        Returns a tuple of (speeds, angles), each with shape (..., N).
+        """
+        commands = np.asarray(commands, dtype=np.float64)
+        if prev_angles is None:
+            prev_angles = np.zeros(self.num_modules)
+        prev_angles = np.asarray(prev_angles, dtype=np.float64)
+
+        speeds, angles = self.module_vectors(commands)
+
+        # Normalize wheel speeds if necessary
+        largest_speed = np.max(np.abs(speeds), axis=-1, keepdims=True)
+        speeds = np.where(largest_speed > 1.0, speeds / np.maximum(largest_speed, 1.0), speeds)
+
+        # Note: no module should ever have to rotate more than 90 degrees from its current angle
+        angle_difference = np.abs(angles - prev_angles)
+        flip = (angle_difference > 90) & (angle_difference < 270)
+        angles = np.where(flip, (angles + 180) % 360, angles)
+        speeds = np.where(flip, -speeds, speeds)
+
+        # Scale down the speed of modules that are still turning towards their target angle
+        if self.cosine_scaling and current_angles is not None:
+            steering_error = np.radians(angles - np.asarray(current_angles, dtype=np.float64))
+            speeds = speeds * np.clip(np.cos(steering_error), 0.0, 1.0)
+
+        # Do not change the angle of the modules if the robot is being told to stop
+        stopped = np.all(np.abs(commands) < self.deadband, axis=-1, keepdims=True)
+        speeds = np.where(stopped, 0.0, speeds)
+        angles = np.where(stopped, np.broadcast_to(prev_angles, angles.shape), angles)
+
+        return speeds, angles
+
+    def forward(self, speeds, angles) -> tuple:
+        """Estimate the chassis motion from measured module speeds and angles (degrees) using least squares.
+
+        speeds and angles can have shape (N,) or (M x N) for M sets of measurements.
+        Returns a tuple of (chassis, covariance) where chassis has shape (..., 3) in the same
+        [forward, horizontal, turning] layout as the commands passed to inverse(), and covariance is the (..., 3 x 3)
+        covariance of that estimate derived from how well the modules agree with each other.
+        """
+        speeds = np.asarray(speeds, dtype=np.float64)
+        angles = np.radians(np.asarray(angles, dtype=np.float64))
+
+        module_components = np.empty(speeds.shape[:-1] + (2 * self.num_modules,))
+        module_components[..., 0::2] = speeds * np.cos(angles)  # forward components
+        module_components[..., 1::2] = speeds * np.sin(angles)  # horizontal components
+
+        chassis = module_components @ self.forward_pseudo_inverse.T
+        residuals = module_components - chassis @ self.forward_matrix.T
+
+        # Residual variance (with the number of degrees of freedom left over after fitting 3 unknowns)
+        degrees_of_freedom = max(2 * self.num_modules - 3, 1)
+        variance = np.sum(residuals**2, axis=-1) / degrees_of_freedom
+        covariance = variance[..., np.newaxis, np.newaxis] * self.forward_normal_inverse
+        return chassis, covariance
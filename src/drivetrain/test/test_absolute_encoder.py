@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from drivetrain.absolute_encoder import AbsoluteEncoder
+
+
+def test_lookup_table_matches_direct_calculation():
+    encoder = AbsoluteEncoder(magnet_offset=873, counts=1024, filter_window=1)
+    for raw in [0, 1, 500, 873, 1023, -5, 2000]:
+        encoder.update(raw)
+        assert encoder.angle == pytest.approx(360 * ((raw - 873) % 1024) / 1024, abs=1e-9)
+
+
+def test_no_readings():
+    encoder = AbsoluteEncoder(magnet_offset=0, counts=1024)
+    assert encoder.angle is None
+    assert not encoder.is_full
+
+
+def test_full_once_the_window_is_filled():
+    encoder = AbsoluteEncoder(magnet_offset=0, counts=1024, filter_window=3)
+    for _ in range(2):
+        encoder.update(256)
+        assert encoder.angle is not None
+        assert not encoder.is_full
+    encoder.update(256)
+    assert encoder.is_full
+
+
+def test_filter_averages_noise_across_zero():
+    encoder = AbsoluteEncoder(magnet_offset=0, counts=1024, filter_window=4)
+    # Noisy readings around 0 degrees (which wrap around to just under 360 degrees)
+    for raw in [1020, 4, 1022, 2]:
+        encoder.update(raw)
+    assert min(encoder.angle, 360 - encoder.angle) == pytest.approx(0.0, abs=1e-9)
+
+
+def test_filter_only_keeps_the_latest_window():
+    encoder = AbsoluteEncoder(magnet_offset=0, counts=1024, filter_window=3)
+    rng = np.random.default_rng(0)
+    for raw in rng.integers(0, 1024, 50):
+        encoder.update(int(raw))
+    for _ in range(3):
+        encoder.update(256)
+    assert encoder.angle == pytest.approx(90.0)
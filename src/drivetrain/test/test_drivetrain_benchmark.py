@@ -0,0 +1,292 @@
+# Benchmarks and regression tests for the drivetrain_node command path.
+# DrivetrainNode is run against a fake motor_control_node (services and telemetry), so no hardware is needed.
+#
+# Run with: python3 -m pytest -s test/test_drivetrain_benchmark.py
+# Set DRIVETRAIN_BENCHMARK_RESULTS=<file.json> to save the results of a run, and
+# DRIVETRAIN_BENCHMARK_BASELINE=<file.json> to fail if a benchmark got much slower than a previously saved run.
+
+import json
+import math
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+rclpy = pytest.importorskip("rclpy")
+
+from geometry_msgs.msg import Twist  # noqa: E402
+from rclpy.executors import SingleThreadedExecutor  # noqa: E402
+from rclpy.node import Node  # noqa: E402
+from rclpy.parameter import Parameter  # noqa: E402
+
+from rovr_interfaces.msg import AbsoluteEncoders, MotorTelemetry  # noqa: E402
+from rovr_interfaces.srv import MotorCommandSetBatch  # noqa: E402
+
+from drivetrain.drivetrain_node import DrivetrainNode  # noqa: E402
+
+BASELINE_TOLERANCE = 1.5  # How many times slower than the baseline a benchmark may get before failing
+
+CMD_VEL_RATE = 50.0  # Hz, how often the joystick teleop publishes cmd_vel
+ABSOLUTE_ENCODERS_RATE = 96.0  # Hz, 10 byte packets at 9600 baud from the Arduino (see read_serial.py)
+TELEMETRY_RATE = 50.0  # Hz, the default TELEMETRY_RATE of motor_control_node
+MOTOR_CAN_IDS = range(1, 11)
+
+BENCHMARK_PARAMETERS = [
+    Parameter("CONTROL_LOOP_RATE", value=0.0),  # Drive on every cmd_vel message (the path being benchmarked)
+    Parameter("ODOMETRY_RATE", value=0.0),
+    Parameter("SETPOINT_KEEPALIVE_INTERVAL", value=1e9),  # Keep the command stream independent of timing
+]
+ENCODER_READING = AbsoluteEncoders(
+    front_left_encoder=200, front_right_encoder=900, back_left_encoder=300, back_right_encoder=700
+)
+
+# Benchmark name -> results, saved to DRIVETRAIN_BENCHMARK_RESULTS at the end of the run
+RESULTS = {}
+
+
+class FakeMotorControl(Node):
+    """Stands in for motor_control_node: records every motor/set_batch command and publishes motor/telemetry."""
+
+    def __init__(self):
+        super().__init__("fake_motor_control")
+        self.commands = []  # Every (type, can_id, value) command received, in order
+        self.batches = 0
+        self.positions = {}  # CAN ID -> last position setpoint, reported back on motor/telemetry
+
+        self.srv_motor_set_batch = self.create_service(
+            MotorCommandSetBatch, "motor/set_batch", self.set_batch_callback
+        )
+        self.telemetry_pub = self.create_publisher(MotorTelemetry, "motor/telemetry", 10)
+        self.telemetry_timer = self.create_timer(1 / TELEMETRY_RATE, self.telemetry_callback)
+
+    def set_batch_callback(self, request, response):
+        for command_type, can_id, value in zip(request.type, request.can_id, request.value):
+            self.commands.append((command_type, int(can_id), float(value)))
+            if command_type == "position":
+                self.positions[can_id] = value
+        self.batches += 1
+        response.success = 0
+        return response
+
+    def telemetry_callback(self):
+        msg = MotorTelemetry()
+        msg.header.stamp = self.get_clock().now().to_msg()
+        msg.can_id = list(MOTOR_CAN_IDS)
+        msg.duty_cycle = [0.0] * len(MOTOR_CAN_IDS)
+        msg.velocity = [0.0] * len(MOTOR_CAN_IDS)
+        msg.tachometer = [0] * len(MOTOR_CAN_IDS)
+        msg.position = [float(self.positions.get(can_id, 0.0)) for can_id in MOTOR_CAN_IDS]
+        msg.age = [0.0] * len(MOTOR_CAN_IDS)
+        self.telemetry_pub.publish(msg)
+
+
+def spin_until(executor, condition, timeout=10.0) -> None:
+    """Spin the executor until condition() is true."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Timed out waiting for the drivetrain"
+        executor.spin_once(timeout_sec=0.01)
+
+
+def wait_until_quiet(executor, motor_control, quiet_time=0.2) -> None:
+    """Spin the executor until motor_control has not received a new batch for quiet_time seconds."""
+    batches = None
+    while motor_control.batches != batches:
+        batches = motor_control.batches
+        end = time.monotonic() + quiet_time
+        while time.monotonic() < end:
+            executor.spin_once(timeout_sec=0.01)
+
+
+def teleop_commands(count=200) -> list:
+    """A deterministic joystick-like cmd_vel sequence (driving, strafing and turning at once), ending with a stop."""
+    commands = []
+    for index in range(count):
+        t = index / CMD_VEL_RATE
+        msg = Twist()
+        if index < count - 10:
+            msg.linear.x = 0.5 * math.sin(t)  # horizontal
+            msg.linear.y = 0.5 * math.cos(0.5 * t)  # forward
+            msg.angular.z = 0.3 * math.sin(2 * t)
+        commands.append(msg)
+    return commands
+
+
+def encoder_readings(count=200) -> list:
+    """A sequence of noisy absolute encoder readings (a few counts of jitter around ENCODER_READING)."""
+    readings = []
+    for index in range(count):
+        noise = (index * 7) % 5 - 2
+        readings.append(
+            AbsoluteEncoders(
+                front_left_encoder=ENCODER_READING.front_left_encoder + noise,
+                front_right_encoder=ENCODER_READING.front_right_encoder - noise,
+                back_left_encoder=ENCODER_READING.back_left_encoder + noise,
+                back_right_encoder=ENCODER_READING.back_right_encoder - noise,
+            )
+        )
+    return readings
+
+
+def benchmark(name, executor, function, messages, rate) -> dict:
+    """Call function(message) for every message at the given rate and record its latency and allocations.
+
+    Between calls the executor is spun (like rclpy.spin would), so service responses are handled outside the timing.
+    Allocations are measured in a second, unpaced pass because tracing them slows every call down.
+    """
+    latencies = []
+    next_call = time.monotonic()
+    for message in messages:
+        while next_call - time.monotonic() > 0:
+            executor.spin_once(timeout_sec=max(next_call - time.monotonic(), 0.0))
+        next_call += 1 / rate
+        start = time.perf_counter_ns()
+        function(message)
+        latencies.append((time.perf_counter_ns() - start) / 1000)
+
+    allocations = []
+    tracemalloc.start()
+    try:
+        for message in messages:
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            function(message)
+            _, peak = tracemalloc.get_traced_memory()
+            allocations.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        "calls": len(latencies),
+        "rate_hz": rate,
+        "median_us": statistics.median(latencies),
+        "p99_us": statistics.quantiles(latencies, n=100)[98],
+        "max_us": max(latencies),
+        "median_allocated_bytes": statistics.median(allocations),
+        "max_allocated_bytes": max(allocations),
+    }
+    RESULTS[name] = result
+    print(f"\n{name}: {json.dumps(result)}")
+
+    # Every call has to finish well within the period of the messages, or the node would fall behind
+    assert result["p99_us"] < 0.5 * 1e6 / rate
+
+    baseline_path = os.environ.get("DRIVETRAIN_BENCHMARK_BASELINE")
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+        if name in baseline:
+            assert result["median_us"] <= BASELINE_TOLERANCE * baseline[name]["median_us"], (
+                f"{name} got slower: {result['median_us']:.1f} us vs {baseline[name]['median_us']:.1f} us"
+            )
+    return result
+
+
+@pytest.fixture(scope="module")
+def ros():
+    rclpy.init()
+    yield
+    results_path = os.environ.get("DRIVETRAIN_BENCHMARK_RESULTS")
+    if results_path:
+        Path(results_path).write_text(json.dumps(RESULTS, indent=2))
+    rclpy.shutdown()
+
+
+@pytest.fixture
+def motor_control(ros):
+    # motor_control_node runs in its own thread, like it runs in its own process on the robot
+    node = FakeMotorControl()
+    executor = SingleThreadedExecutor()
+    executor.add_node(node)
+    thread = threading.Thread(target=executor.spin, daemon=True)
+    thread.start()
+    yield node
+    executor.shutdown()
+    thread.join()
+    node.destroy_node()
+
+
+@pytest.fixture
+def drivetrain(motor_control):
+    """Returns a calibrated DrivetrainNode and the executor spinning it."""
+    node = DrivetrainNode(parameter_overrides=BENCHMARK_PARAMETERS)
+    executor = SingleThreadedExecutor()
+    executor.add_node(node)
+
+    # Calibrate the modules the same way as on the robot (with the absolute_angle_reset timer, once filters are full)
+    for _ in range(node.ABSOLUTE_ENCODER_FILTER_WINDOW):
+        node.absolute_encoders_callback(ENCODER_READING)
+    spin_until(executor, node.absolute_angle_timer.is_canceled)
+    wait_until_quiet(executor, motor_control)
+    yield node, executor
+
+    executor.shutdown()
+    node.destroy_node()
+
+
+def test_calibration_zeroes_every_module(drivetrain, motor_control):
+    node, _ = drivetrain
+    turning_motors = sorted(module.turning_motor_can_id for module in node.modules)
+    zeroed_motors = sorted(can_id for command_type, can_id, _ in motor_control.commands if command_type == "position")
+    assert zeroed_motors == turning_motors
+
+
+def test_drive_sends_one_batch(drivetrain, motor_control):
+    node, executor = drivetrain
+    batches = motor_control.batches
+    node.drive(0.5, 0.2, 0.1)
+    wait_until_quiet(executor, motor_control)
+    assert motor_control.batches == batches + 1
+    # Sending the same command again is suppressed entirely
+    node.drive(0.5, 0.2, 0.1)
+    wait_until_quiet(executor, motor_control)
+    assert motor_control.batches == batches + 1
+
+
+def test_teleop_command_stream(drivetrain, motor_control):
+    node, executor = drivetrain
+    motor_control.commands.clear()
+    for msg in teleop_commands():
+        node.cmd_vel_callback(msg)
+    wait_until_quiet(executor, motor_control)
+
+    drive_motors = {module.drive_motor_can_id for module in node.modules}
+    turning_motors = {module.turning_motor_can_id for module in node.modules}
+    assert motor_control.commands
+    for command_type, can_id, value in motor_control.commands:
+        if command_type == "duty_cycle":
+            assert can_id in drive_motors
+            assert -1.0 <= value <= 1.0
+        else:
+            assert command_type == "position"
+            assert can_id in turning_motors
+    # The sequence ends with a stop, so every drive motor was last told to stop
+    last_powers = {
+        can_id: value for command_type, can_id, value in motor_control.commands if command_type == "duty_cycle"
+    }
+    assert last_powers == {can_id: 0.0 for can_id in drive_motors}
+
+
+def test_benchmark_drive(drivetrain):
+    node, executor = drivetrain
+    commands = [(msg.linear.y, msg.linear.x, msg.angular.z) for msg in teleop_commands()]
+    benchmark("drive", executor, lambda command: node.drive(*command), commands, CMD_VEL_RATE)
+
+
+def test_benchmark_cmd_vel_callback(drivetrain):
+    node, executor = drivetrain
+    benchmark("cmd_vel_callback", executor, node.cmd_vel_callback, teleop_commands(), CMD_VEL_RATE)
+
+
+def test_benchmark_absolute_encoders_callback(drivetrain):
+    node, executor = drivetrain
+    benchmark(
+        "absolute_encoders_callback",
+        executor,
+        node.absolute_encoders_callback,
+        encoder_readings(),
+        ABSOLUTE_ENCODERS_RATE,
+    )
@@ -0,0 +1,66 @@
+import array
+
+import pytest
+
+from drivetrain.drivetrain_config import DrivetrainConfig, default_module_positions
+
+
+def test_defaults_are_valid():
+    DrivetrainConfig().validate()
+    names = [name for name, _ in DrivetrainConfig.parameter_defaults()]
+    assert "STEERING_MOTOR_GEAR_RATIO" in names and "MODULE_POSITIONS" in names
+    assert DrivetrainConfig.RESTART_REQUIRED <= set(names)
+
+
+def test_from_parameters_converts_arrays_and_ignores_unknown_names():
+    config = DrivetrainConfig.from_parameters(
+        {"MODULE_POSITIONS": array.array("d", default_module_positions(0.3, 0.2)), "use_sim_time": False}
+    )
+    assert config.MODULE_POSITIONS == [0.3, 0.2, 0.3, -0.2, -0.3, 0.2, -0.3, -0.2]
+    config.validate()
+
+
+def test_replace_and_changed_parameters():
+    config = DrivetrainConfig()
+    new_config = config.replace({"STEERING_MOTOR_GEAR_RATIO": 50, "FRONT_LEFT_MAGNET_OFFSET": 100})
+    assert new_config.STEERING_MOTOR_GEAR_RATIO == 50
+    assert config.STEERING_MOTOR_GEAR_RATIO == 40  # The original config is not modified
+    assert sorted(new_config.changed_parameters(config)) == ["FRONT_LEFT_MAGNET_OFFSET", "STEERING_MOTOR_GEAR_RATIO"]
+
+
+def test_replace_rebuilds_derived_module_positions():
+    config = DrivetrainConfig().replace({"HALF_WHEEL_BASE": 0.3, "HALF_TRACK_WIDTH": 0.2})
+    assert config.MODULE_POSITIONS == default_module_positions(0.3, 0.2)
+    config = config.replace({"HALF_TRACK_WIDTH": 0.25})
+    assert config.MODULE_POSITIONS == default_module_positions(0.3, 0.25)
+
+
+def test_replace_rejects_half_dimensions_with_explicit_module_positions():
+    config = DrivetrainConfig().replace({"MODULE_POSITIONS": [0.4, 0.3, 0.4, -0.3, -0.2, 0.3, -0.2, -0.3]})
+    with pytest.raises(ValueError):
+        config.replace({"HALF_WHEEL_BASE": 0.3})
+    # Changing both at once is fine, the explicit MODULE_POSITIONS wins
+    config = config.replace({"HALF_WHEEL_BASE": 0.3, "MODULE_POSITIONS": default_module_positions(0.1, 0.1)})
+    assert config.MODULE_POSITIONS == default_module_positions(0.1, 0.1)
+
+
+@pytest.mark.parametrize(
+    "parameters",
+    [
+        {"STEERING_MOTOR_GEAR_RATIO": 0},
+        {"ABSOLUTE_ENCODER_FILTER_WINDOW": 0},
+        {"CMD_VEL_TIMEOUT": -1.0},
+        {"MODULE_POSITIONS": [0.5, 0.5, -0.5, -0.5]},
+        {"GAZEBO_WHEEL_TOPICS": ["wheel1/cmd_vel"]},
+        {"STEERING_MOTOR_GEAR_RATIO": "40"},
+        {"COSINE_SCALING": 1},
+        {"FRONT_LEFT_DRIVE": True},
+    ],
+)
+def test_invalid_configs_are_rejected(parameters):
+    with pytest.raises(ValueError):
+        DrivetrainConfig().replace(parameters).validate()
+
+
+def test_integers_are_accepted_as_floats():
+    DrivetrainConfig().replace({"WHEEL_RADIUS": 1}).validate()
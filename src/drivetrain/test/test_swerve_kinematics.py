@@ -0,0 +1,173 @@
+import math
+
+import numpy as np
+import pytest
+
+from drivetrain.swerve_kinematics import SwerveKinematics
+
+HALF_WHEEL_BASE = 0.55959375
+HALF_TRACK_WIDTH = 0.2746375
+MODULE_POSITIONS = [
+    [HALF_WHEEL_BASE, HALF_TRACK_WIDTH],
+    [HALF_WHEEL_BASE, -HALF_TRACK_WIDTH],
+    [-HALF_WHEEL_BASE, HALF_TRACK_WIDTH],
+    [-HALF_WHEEL_BASE, -HALF_TRACK_WIDTH],
+]
+
+
+def reference_drive(forward_power, horizontal_power, turning_power, prev_angles):
+    """The original one-module-at-a-time drive() math (FL, FR, BL, BR)."""
+    turning_power *= -1
+    if abs(forward_power) < 0.05 and abs(horizontal_power) < 0.05 and abs(turning_power) < 0.05:
+        return [0.0] * 4, list(prev_angles)
+    A = horizontal_power - turning_power * HALF_WHEEL_BASE
+    B = horizontal_power + turning_power * HALF_WHEEL_BASE
+    C = forward_power - turning_power * HALF_TRACK_WIDTH
+    D = forward_power + turning_power * HALF_TRACK_WIDTH
+    vectors = [
+        [math.sqrt(B**2 + D**2), ((math.atan2(B, D) * 180 / math.pi) + 360) % 360],
+        [math.sqrt(B**2 + C**2), ((math.atan2(B, C) * 180 / math.pi) + 360) % 360],
+        [math.sqrt(A**2 + D**2), ((math.atan2(A, D) * 180 / math.pi) + 360) % 360],
+        [math.sqrt(A**2 + C**2), ((math.atan2(A, C) * 180 / math.pi) + 360) % 360],
+    ]
+    largest_power = max(abs(vector[0]) for vector in vectors)
+    if largest_power > 1.0:
+        for vector in vectors:
+            vector[0] /= largest_power
+    for vector, prev_angle in zip(vectors, prev_angles):
+        if 90 < abs(vector[1] - prev_angle) < 270:
+            vector[1] = (vector[1] + 180) % 360
+            vector[0] *= -1
+    return [vector[0] for vector in vectors], [vector[1] for vector in vectors]
+
+
+@pytest.fixture
+def kinematics():
+    return SwerveKinematics(MODULE_POSITIONS)
+
+
+def test_matches_reference(kinematics):
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        command = rng.uniform(-1, 1, 3)
+        prev_angles = rng.uniform(0, 360, 4)
+        speeds, angles = kinematics.inverse(command, prev_angles)
+        expected_speeds, expected_angles = reference_drive(*command, prev_angles)
+        np.testing.assert_allclose(speeds, expected_speeds, atol=1e-9)
+        np.testing.assert_allclose(angles, expected_angles, atol=1e-9)
+
+
+def test_batched_commands_match_single_commands(kinematics):
+    rng = np.random.default_rng(1)
+    commands = rng.uniform(-1, 1, (1000, 3))
+    prev_angles = rng.uniform(0, 360, 4)
+    speeds, angles = kinematics.inverse(commands, prev_angles)
+    assert speeds.shape == angles.shape == (1000, 4)
+    for index in range(0, 1000, 97):
+        single_speeds, single_angles = kinematics.inverse(commands[index], prev_angles)
+        np.testing.assert_allclose(speeds[index], single_speeds)
+        np.testing.assert_allclose(angles[index], single_angles)
+
+
+def test_stop_holds_previous_angles(kinematics):
+    speeds, angles = kinematics.inverse([0.01, -0.02, 0.0], [10.0, 20.0, 30.0, 40.0])
+    np.testing.assert_array_equal(speeds, 0.0)
+    np.testing.assert_array_equal(angles, [10.0, 20.0, 30.0, 40.0])
+
+
+def test_speeds_are_normalized(kinematics):
+    speeds, _ = kinematics.inverse([1.0, 1.0, 1.0])
+    assert np.max(np.abs(speeds)) == pytest.approx(1.0)
+
+
+def test_from_flat_list_supports_other_layouts():
+    # A three module (triangular) chassis
+    kinematics = SwerveKinematics.from_flat_list([0.5, 0.0, -0.25, 0.4, -0.25, -0.4])
+    assert kinematics.num_modules == 3
+    speeds, angles = kinematics.inverse([0.5, 0.0, 0.0], [0.0, 0.0, 0.0])
+    np.testing.assert_allclose(speeds, 0.5)
+    np.testing.assert_allclose(angles, 0.0)
+    with pytest.raises(ValueError):
+        SwerveKinematics.from_flat_list([0.5, 0.0, -0.25])
+
+
+def test_forward_inverts_inverse(kinematics):
+    rng = np.random.default_rng(2)
+    # Keep the commands small enough that the wheel speeds are never normalized
+    commands = rng.uniform(-0.3, 0.3, (200, 3))
+    speeds, angles = kinematics.inverse(commands, rng.uniform(0, 360, 4))
+    chassis, covariance = kinematics.forward(speeds, angles)
+    moving = np.any(np.abs(commands) >= 0.05, axis=-1)
+    np.testing.assert_allclose(chassis[moving], commands[moving], atol=1e-9)
+    assert covariance.shape == (200, 3, 3)
+    np.testing.assert_allclose(covariance[moving], 0.0, atol=1e-12)
+
+
+def test_forward_covariance_grows_when_modules_disagree(kinematics):
+    speeds, angles = kinematics.inverse([0.3, 0.0, 0.0])
+    slipping_speeds = speeds.copy()
+    slipping_speeds[0] *= 0.5  # One wheel is slipping
+    _, covariance = kinematics.forward(speeds, angles)
+    _, slipping_covariance = kinematics.forward(slipping_speeds, angles)
+    assert np.all(np.diag(slipping_covariance) > np.diag(covariance))
+
+
+def test_cosine_scaling():
+    kinematics = SwerveKinematics(MODULE_POSITIONS, cosine_scaling=True)
+    speeds, _ = kinematics.inverse([0.5, 0.0, 0.0], np.zeros(4), [0.0, 60.0, 90.0, -120.0])
+    np.testing.assert_allclose(speeds, [0.5, 0.25, 0.0, 0.0], atol=1e-9)
+    # Without the measured module angles there is nothing to scale by
+    speeds, _ = kinematics.inverse([0.5, 0.0, 0.0], np.zeros(4))
+    np.testing.assert_allclose(speeds, 0.5)
+
+
+def wrap_degrees(angles):
+    """Wrap angle differences into [-180, 180) degrees."""
+    return (np.asarray(angles) + 180) % 360 - 180
+
+
+def measure_settle_time(kinematics, start_command, new_command, steering_rate=360.0, dt=0.02):
+    """Simulate a direction change and measure how long it takes to reach full tractive effort.
+
+    The turning motors are modelled like their PID controllers in motor_control (with continuous input): rate limited
+    position controllers that take the shortest way around to the target. Returns (settle time in seconds, sideways
+    effort integrated over the manoeuvre).
+    """
+    _, current_angles = kinematics.inverse(start_command)
+    prev_angles = current_angles.copy()
+    sideways_effort = 0.0
+    for tick in range(1000):
+        # The requested speeds (with any flips) as if the modules were already at their target angles
+        requested_speeds, _ = kinematics.inverse(new_command, prev_angles)
+        speeds, targets = kinematics.inverse(new_command, prev_angles, current_angles)
+        prev_angles = targets
+        # How hard each module is pushing in the direction it is supposed to (and sideways to it)
+        steering_error = wrap_degrees(targets - current_angles)
+        effort = speeds * np.cos(np.radians(steering_error)) * np.sign(requested_speeds)
+        sideways_effort += np.sum(np.abs(speeds * np.sin(np.radians(steering_error)))) * dt
+        if np.sum(effort) >= 0.99 * np.sum(np.abs(requested_speeds)):
+            return tick * dt, sideways_effort
+        current_angles = current_angles + np.clip(steering_error, -steering_rate * dt, steering_rate * dt)
+    raise AssertionError("The modules never settled")
+
+
+def test_settle_time_after_direction_change():
+    wrapped = SwerveKinematics(MODULE_POSITIONS)
+    scaled = SwerveKinematics(MODULE_POSITIONS, cosine_scaling=True)
+    crab_left = [0.5, math.tan(math.radians(-10)) * 0.5, 0.0]  # modules at 350 degrees
+    crab_right = [0.5, math.tan(math.radians(10)) * 0.5, 0.0]  # modules at 10 degrees
+    reverse = [-0.5, 0.0, 0.0]
+    strafe = [0.0, 0.5, 0.0]
+
+    # Crossing 0 degrees: the turning PIDs take the short way around, so wrapped angles don't slow this down
+    assert measure_settle_time(wrapped, crab_left, crab_right)[0] == pytest.approx(0.04)
+
+    # Reversing direction (e.g. during a digging pass) flips the wheels instead of steering them around
+    assert measure_settle_time(wrapped, [0.5, 0.0, 0.0], reverse)[0] == 0.0
+
+    # A 90 degree direction change is limited by the steering rate, but cosine scaling spends far less effort pushing
+    # sideways while the modules turn
+    wrapped_time, wrapped_sideways = measure_settle_time(wrapped, [0.5, 0.0, 0.0], strafe)
+    scaled_time, scaled_sideways = measure_settle_time(scaled, [0.5, 0.0, 0.0], strafe)
+    assert scaled_time == wrapped_time == pytest.approx(0.24)
+    assert scaled_sideways < 0.5 * wrapped_sideways
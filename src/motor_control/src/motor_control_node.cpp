@@ -13,13 +13,19 @@
 #include "std_msgs/msg/string.hpp"
 
 // Import custom ROS 2 interfaces
+#include "rovr_interfaces/msg/motor_telemetry.hpp"
 #include "rovr_interfaces/srv/motor_command_get.hpp"
 #include "rovr_interfaces/srv/motor_command_set.hpp"
+#include "rovr_interfaces/srv/motor_command_set_batch.hpp"
 
 // Import Native C++ Libraries
+#include <algorithm>
+#include <array>
 #include <chrono>
+#include <cmath>
 #include <map>
 #include <memory>
+#include <optional>
 #include <stdint.h>
 #include <string>
 #include <tuple> // for tuples
@@ -46,14 +52,96 @@ double inputModulus(double input, double minimumInput, double maximumInput) {
   return input;
 }
 
-// Define a struct to store motor data
+// Read a big-endian signed 32-bit integer from the data of a CAN frame
+int32_t readInt32(const can_msgs::msg::Frame &frame, size_t offset) {
+  return static_cast<int32_t>((static_cast<uint32_t>(frame.data[offset]) << 24) | (static_cast<uint32_t>(frame.data[offset + 1]) << 16) |
+                              (static_cast<uint32_t>(frame.data[offset + 2]) << 8) | static_cast<uint32_t>(frame.data[offset + 3]));
+}
+
+// Read a big-endian signed 16-bit integer from the data of a CAN frame
+int16_t readInt16(const can_msgs::msg::Frame &frame, size_t offset) {
+  return static_cast<int16_t>((static_cast<uint16_t>(frame.data[offset]) << 8) | static_cast<uint16_t>(frame.data[offset + 1]));
+}
+
+// Define a struct to store motor data (decoded from every status frame a VESC broadcasts)
 struct MotorData {
-  float dutyCycle;
-  float velocity;
-  int tachometer;
+  bool received = false; // Has this VESC sent any status frames yet?
+  float dutyCycle = 0; // Status 1 (in percent)
+  float velocity = 0; // Status 1 (in RPM)
+  float current = 0; // Status 1 (motor current in amps)
+  float ampHours = 0, ampHoursCharged = 0; // Status 2
+  float wattHours = 0, wattHoursCharged = 0; // Status 3
+  float fetTemperature = 0, motorTemperature = 0; // Status 4 (in degrees Celsius)
+  float inputCurrent = 0; // Status 4 (battery current in amps)
+  int32_t tachometer = 0; // Status 5 (in encoder counts)
+  float inputVoltage = 0; // Status 5 (battery voltage in volts)
   std::chrono::time_point<std::chrono::steady_clock> timestamp;
 };
 
+// A trapezoidal motion profile from a start position to a goal position.
+// It accelerates at maxAcceleration up to maxVelocity, cruises, and then decelerates to stop exactly at the goal.
+// If the motion has an initial velocity (towards the goal), the profile continues from it instead of stopping first.
+class TrapezoidProfile {
+private:
+  float origin; // Where the profile would have started from rest (before the start position if already moving)
+  float direction; // 1 or -1
+  float acceleration, peakVelocity;
+  float startOffset; // How long the profile has already been running at the start position (in seconds)
+  float accelerationTime, cruiseTime, distance; // All measured from the origin
+
+public:
+  TrapezoidProfile(float start, float goal, float initialVelocity, float maxVelocity, float maxAcceleration) {
+    this->direction = (goal >= start) ? 1.0 : -1.0;
+    this->acceleration = maxAcceleration;
+    float startDistance = std::abs(goal - start);
+
+    // Only a velocity towards the goal is kept, and never more than we can still stop from before the goal
+    float startVelocity = std::clamp(this->direction * initialVelocity, 0.0f, maxVelocity);
+    startVelocity = std::min(startVelocity, std::sqrt(2 * maxAcceleration * startDistance));
+    this->startOffset = startVelocity / maxAcceleration;
+    float offsetDistance = startVelocity * startVelocity / (2 * maxAcceleration);
+    this->origin = start - this->direction * offsetDistance;
+    this->distance = startDistance + offsetDistance;
+
+    if (this->distance < maxVelocity * maxVelocity / maxAcceleration) {
+      // Triangular profile (the goal is too close to ever reach maxVelocity)
+      this->peakVelocity = std::sqrt(this->distance * maxAcceleration);
+      this->cruiseTime = 0;
+    } else {
+      this->peakVelocity = maxVelocity;
+      this->cruiseTime = (this->distance - maxVelocity * maxVelocity / maxAcceleration) / maxVelocity;
+    }
+    this->accelerationTime = this->peakVelocity / maxAcceleration;
+  }
+
+  // Returns the (position, velocity) setpoint the given number of seconds after the profile started
+  std::tuple<float, float> sample(float seconds) const {
+    float t = seconds + this->startOffset;
+    float decelerationStart = this->accelerationTime + this->cruiseTime;
+    float position, velocity;
+    if (t < this->accelerationTime) {
+      position = 0.5 * this->acceleration * t * t;
+      velocity = this->acceleration * t;
+    } else if (t < decelerationStart) {
+      position = 0.5 * this->acceleration * this->accelerationTime * this->accelerationTime + this->peakVelocity * (t - this->accelerationTime);
+      velocity = this->peakVelocity;
+    } else if (t < decelerationStart + this->accelerationTime) {
+      float timeLeft = decelerationStart + this->accelerationTime - t;
+      position = this->distance - 0.5 * this->acceleration * timeLeft * timeLeft;
+      velocity = this->acceleration * timeLeft;
+    } else {
+      position = this->distance;
+      velocity = 0;
+    }
+    return std::make_tuple(this->origin + this->direction * position, this->direction * velocity);
+  }
+
+  // How long the whole profile takes (in seconds)
+  float totalTime() const {
+    return 2 * this->accelerationTime + this->cruiseTime - this->startOffset;
+  }
+};
+
 class PIDController {
 private:
   int COUNTS_PER_REVOLUTION; // How many encoder counts for one 360 degree rotation
@@ -70,6 +158,12 @@ private:
 
   std::optional<int32_t> prevError;
 
+  // Motion profiling (only used if both limits are set and the input is not continuous)
+  float maxVelocity, maxAcceleration; // In encoder counts per second (and per second squared)
+  int32_t goalTach; // Where the profile ends (targTach follows the profile towards it)
+  std::optional<TrapezoidProfile> profile;
+  std::chrono::time_point<std::chrono::steady_clock> profileStartTime;
+
 public:
   bool isActive;
 
@@ -87,9 +181,19 @@ public:
     this->totalError = 0;
     this->isActive = false;
     this->prevError = std::nullopt;
+
+    this->maxVelocity = 0;
+    this->maxAcceleration = 0;
+    this->profile = std::nullopt;
   }
 
   float update(int32_t currTach) {
+    // Move the target along the motion profile (if there is one)
+    if (this->profile.has_value()) {
+      float position = std::get<0>(this->profile->sample(this->getProfileTime()));
+      this->targTach = static_cast<int32_t>(std::round(position));
+    }
+
     // Calculate the current error
     float currError;
     if (this->continuous) {
@@ -118,13 +222,54 @@ public:
     return PIDResult;
   }
 
-  void setRotation(float degrees) {
+  // Set the target rotation in degrees (currTach is the latest tachometer reading, where a profiled move starts)
+  void setRotation(float degrees, int32_t currTach) {
+    this->goalTach = static_cast<int32_t>((degrees / 360.0) * this->COUNTS_PER_REVOLUTION);
+    if (this->isMotionProfiled()) {
+      // Continue smoothly from the current setpoint if a profiled move is already in progress
+      float startPosition = currTach, startVelocity = 0;
+      if (this->isActive && this->profile.has_value()) {
+        std::tie(startPosition, startVelocity) = this->profile->sample(this->getProfileTime());
+      }
+      this->profile.emplace(startPosition, this->goalTach, startVelocity, this->maxVelocity, this->maxAcceleration);
+      this->profileStartTime = std::chrono::steady_clock::now();
+      this->targTach = static_cast<int32_t>(std::round(startPosition));
+    } else {
+      this->profile = std::nullopt;
+      this->targTach = this->goalTach;
+    }
     this->isActive = true;
-    this->targTach = static_cast<int32_t>((degrees / 360.0) * this->COUNTS_PER_REVOLUTION);
     this->totalError = 0;
     this->prevError = std::nullopt;
   }
 
+  // Limit the velocity (in degrees per second) and acceleration (in degrees per second squared) of position moves
+  // Set either limit to 0 to jump straight to the target instead
+  void setMotionConstraints(float maxVelocity, float maxAcceleration) {
+    this->maxVelocity = (maxVelocity / 360.0) * this->COUNTS_PER_REVOLUTION;
+    this->maxAcceleration = (maxAcceleration / 360.0) * this->COUNTS_PER_REVOLUTION;
+  }
+  bool isMotionProfiled() {
+    return this->maxVelocity > 0 && this->maxAcceleration > 0 && !this->continuous;
+  }
+
+  // How long until the profiled move reaches its goal (in seconds), 0 if there is no move in progress
+  // Returns NaN for an unprofiled move (it jumps straight to the target, so the time is unknown)
+  float getTimeRemaining() {
+    if (!this->isActive) {
+      return 0;
+    }
+    if (!this->profile.has_value()) {
+      return NAN;
+    }
+    return std::max(this->profile->totalTime() - this->getProfileTime(), 0.0f);
+  }
+
+  // How long the current motion profile has been running (in seconds)
+  float getProfileTime() {
+    return std::chrono::duration<float>(std::chrono::steady_clock::now() - this->profileStartTime).count();
+  }
+
   int getCountsPerRevolution() {
     return this->COUNTS_PER_REVOLUTION;
   }
@@ -194,36 +339,51 @@ class MotorControlNode : public rclcpp::Node {
   // Set the position of the motor in degrees
   void vesc_set_position(uint32_t id, int position) {
     if (this->pid_controllers[id]) {
-      this->pid_controllers[id]->setRotation(position);
+      int32_t tachometer = (id < this->can_data.size()) ? this->can_data[id].tachometer : 0;
+      this->pid_controllers[id]->setRotation(position, tachometer);
     }
     RCLCPP_DEBUG(this->get_logger(), "Setting the position of CAN ID: %u to %d degrees", id, position); // Print Statement
   }
 
-  // Get the motor controller's current duty cycle command
-  std::optional<float> vesc_get_duty_cycle(uint32_t id) {
-    if (std::chrono::steady_clock::now() - this->can_data[id].timestamp < this->threshold) {
-      return this->can_data[id].dutyCycle;
-    } else {
-      return std::nullopt; // The data is too stale
+  // Get the most recent data of a motor controller, or nullptr if it is unknown or too stale
+  const MotorData *vesc_get_data(uint32_t id) const {
+    if (id >= this->can_data.size() || !this->can_data[id].received ||
+        std::chrono::steady_clock::now() - this->can_data[id].timestamp >= this->threshold) {
+      return nullptr;
     }
+    return &this->can_data[id];
   }
-  // Get the current velocity of the motor in RPM (Rotations Per Minute)
-  std::optional<float> vesc_get_velocity(uint32_t id) {
-    if (std::chrono::steady_clock::now() - this->can_data[id].timestamp < this->threshold) {
-      return this->can_data[id].velocity;
+  // Get any decoded status value of the motor controller (e.g. duty cycle, velocity in RPM, current, or temperature)
+  std::optional<float> vesc_get_status(uint32_t id, float MotorData::*field) const {
+    const MotorData *data = vesc_get_data(id);
+    if (data) {
+      return data->*field;
     } else {
       return std::nullopt; // The data is too stale
     }
   }
   // Get the current position (tachometer reading) of the motor
   std::optional<float> vesc_get_position(uint32_t id) {
-    if (std::chrono::steady_clock::now() - this->can_data[id].timestamp < this->threshold) {
-      return (static_cast<float>(this->can_data[id].tachometer) / static_cast<float>(this->pid_controllers[id]->getCountsPerRevolution())) * 360.0;
+    const MotorData *data = vesc_get_data(id);
+    if (data && this->pid_controllers[id]) {
+      return (static_cast<float>(data->tachometer) / static_cast<float>(this->pid_controllers[id]->getCountsPerRevolution())) * 360.0;
     } else {
-      return std::nullopt; // The data is too stale
+      return std::nullopt; // The data is too stale (or the counts per revolution of this motor are unknown)
     }
   }
 
+  // Get how long until the motor reaches its target position (in seconds)
+  std::optional<float> vesc_get_time_remaining(uint32_t id) {
+    if (!this->pid_controllers[id]) {
+      return 0.0; // There is no position control for this motor, so it is never moving to a position
+    }
+    float timeRemaining = this->pid_controllers[id]->getTimeRemaining();
+    if (std::isnan(timeRemaining)) {
+      return std::nullopt; // Unprofiled moves don't know when they will arrive
+    }
+    return timeRemaining;
+  }
+
 public:
   MotorControlNode() : Node("MotorControlNode") {
     // Define default values for our ROS parameters below #
@@ -235,6 +395,9 @@ public:
     this->declare_parameter("FRONT_RIGHT_TURN", 5);
     this->declare_parameter("SKIMMER_LIFT_MOTOR", 1);
     this->declare_parameter("STEERING_MOTOR_GEAR_RATIO", 40);
+    this->declare_parameter("TELEMETRY_RATE", 50.0); // Set to 0 to disable the motor/telemetry topic
+    this->declare_parameter("LIFT_MAX_VELOCITY", 3600.0); // Set to 0 to disable motion profiling of the lift
+    this->declare_parameter("LIFT_MAX_ACCELERATION", 7200.0); // Set to 0 to disable motion profiling of the lift
 
     // Print the ROS Parameters to the terminal below #
     RCLCPP_INFO(this->get_logger(), "CAN_INTERFACE_TRANSMIT parameter set to: %s", this->get_parameter("CAN_INTERFACE_TRANSMIT").as_string().c_str());
@@ -245,12 +408,17 @@ public:
     RCLCPP_INFO(this->get_logger(), "FRONT_RIGHT_TURN parameter set to: %ld", this->get_parameter("FRONT_RIGHT_TURN").as_int());
     RCLCPP_INFO(this->get_logger(), "SKIMMER_LIFT_MOTOR parameter set to: %ld", this->get_parameter("SKIMMER_LIFT_MOTOR").as_int());
     RCLCPP_INFO(this->get_logger(), "STEERING_MOTOR_GEAR_RATIO parameter set to: %ld", this->get_parameter("STEERING_MOTOR_GEAR_RATIO").as_int());
+    RCLCPP_INFO(this->get_logger(), "TELEMETRY_RATE parameter set to: %f", this->get_parameter("TELEMETRY_RATE").as_double());
+    RCLCPP_INFO(this->get_logger(), "LIFT_MAX_VELOCITY parameter set to: %f", this->get_parameter("LIFT_MAX_VELOCITY").as_double());
+    RCLCPP_INFO(this->get_logger(), "LIFT_MAX_ACCELERATION parameter set to: %f", this->get_parameter("LIFT_MAX_ACCELERATION").as_double());
 
     // Initialize services below //
     srv_motor_set = this->create_service<rovr_interfaces::srv::MotorCommandSet>(
         "motor/set", std::bind(&MotorControlNode::set_callback, this, _1, _2));
     srv_motor_get = this->create_service<rovr_interfaces::srv::MotorCommandGet>(
         "motor/get", std::bind(&MotorControlNode::get_callback, this, _1, _2));
+    srv_motor_set_batch = this->create_service<rovr_interfaces::srv::MotorCommandSetBatch>(
+        "motor/set_batch", std::bind(&MotorControlNode::set_batch_callback, this, _1, _2));
 
     // Instantiate all of our PIDControllers here
     this->pid_controllers[this->get_parameter("BACK_LEFT_TURN").as_int()] = new PIDController(42, 0.005, 0.0, 0.0, 0.0, 10, 0.4);
@@ -265,14 +433,23 @@ public:
     this->pid_controllers[this->get_parameter("BACK_RIGHT_TURN").as_int()]->enableContinuousInput(0, 360 * this->get_parameter("STEERING_MOTOR_GEAR_RATIO").as_int());
     this->pid_controllers[this->get_parameter("FRONT_RIGHT_TURN").as_int()]->enableContinuousInput(0, 360 * this->get_parameter("STEERING_MOTOR_GEAR_RATIO").as_int());
 
+    // Profile the position moves of the lift (instead of jumping to the target at full power)
+    this->pid_controllers[this->get_parameter("SKIMMER_LIFT_MOTOR").as_int()]->setMotionConstraints(this->get_parameter("LIFT_MAX_VELOCITY").as_double(), this->get_parameter("LIFT_MAX_ACCELERATION").as_double());
+
     // Initialize timers below //
     timer = this->create_wall_timer(500ms, std::bind(&MotorControlNode::timer_callback, this));
+    if (this->get_parameter("TELEMETRY_RATE").as_double() > 0) {
+      telemetry_timer = this->create_wall_timer(std::chrono::duration<double>(1.0 / this->get_parameter("TELEMETRY_RATE").as_double()),
+                                                std::bind(&MotorControlNode::telemetry_callback, this));
+    }
 
     // Initialize publishers and subscribers below //
     // The name of this topic is determined by ros2socketcan_bridge
     can_pub = this->create_publisher<can_msgs::msg::Frame>("CAN/" + this->get_parameter("CAN_INTERFACE_TRANSMIT").as_string() + "/transmit", 100);
     // The name of this topic is determined by ros2socketcan_bridge
     can_sub = this->create_subscription<can_msgs::msg::Frame>("CAN/" + this->get_parameter("CAN_INTERFACE_RECEIVE").as_string() + "/receive", 10, std::bind(&MotorControlNode::CAN_callback, this, _1));
+    // The latest status of every motor at once (so that other nodes don't have to poll motor/get)
+    telemetry_pub = this->create_publisher<rovr_interfaces::msg::MotorTelemetry>("motor/telemetry", 10);
   }
 
 private:
@@ -288,31 +465,89 @@ private:
     }
   }
 
+  // Publish the most recent status of every motor controller in a single message
+  void telemetry_callback() {
+    rovr_interfaces::msg::MotorTelemetry msg;
+    msg.header.stamp = this->get_clock()->now();
+    size_t count = this->received_ids.size();
+    msg.can_id.reserve(count);
+    msg.duty_cycle.reserve(count);
+    msg.velocity.reserve(count);
+    msg.tachometer.reserve(count);
+    msg.position.reserve(count);
+    msg.current.reserve(count);
+    msg.input_current.reserve(count);
+    msg.input_voltage.reserve(count);
+    msg.fet_temperature.reserve(count);
+    msg.motor_temperature.reserve(count);
+    msg.time_remaining.reserve(count);
+    msg.age.reserve(count);
+
+    auto now = std::chrono::steady_clock::now();
+    for (uint32_t motorId : this->received_ids) {
+      const MotorData &data = this->can_data[motorId];
+      msg.can_id.push_back(motorId);
+      msg.duty_cycle.push_back(data.dutyCycle);
+      msg.velocity.push_back(data.velocity);
+      msg.tachometer.push_back(data.tachometer);
+      // The position is only known for motors with a PIDController (which knows the counts per revolution)
+      auto pid = this->pid_controllers.find(motorId);
+      if (pid != this->pid_controllers.end() && pid->second) {
+        msg.position.push_back((static_cast<float>(data.tachometer) / static_cast<float>(pid->second->getCountsPerRevolution())) * 360.0);
+        msg.time_remaining.push_back(pid->second->getTimeRemaining());
+      } else {
+        msg.position.push_back(NAN);
+        msg.time_remaining.push_back(0);
+      }
+      msg.current.push_back(data.current);
+      msg.input_current.push_back(data.inputCurrent);
+      msg.input_voltage.push_back(data.inputVoltage);
+      msg.fet_temperature.push_back(data.fetTemperature);
+      msg.motor_temperature.push_back(data.motorTemperature);
+      msg.age.push_back(std::chrono::duration<float>(now - data.timestamp).count());
+    }
+
+    telemetry_pub->publish(msg);
+  }
+
   // Listen for CAN status frames sent by our VESC motor controllers
   void CAN_callback(const can_msgs::msg::Frame::SharedPtr can_msg) {
     uint32_t motorId = can_msg->id & 0xFF;
     uint32_t statusId = (can_msg->id >> 8) & 0xFF; // Packet Status, not frame ID
 
-    // If 'motorId' is not found in the 'can_data' hashmap, add it.
-    if (this->can_data.count(motorId) == 0) {
-      this->can_data[motorId] = {0, 0, 0, std::chrono::steady_clock::now()};
+    // The motor data is updated in place (every CAN ID has a fixed slot in the table)
+    MotorData &motorData = this->can_data[motorId];
+    if (!motorData.received) {
+      motorData.received = true;
+      this->received_ids.push_back(motorId);
     }
 
-    float dutyCycleNow = this->can_data[motorId].dutyCycle;
-    float RPM = this->can_data[motorId].velocity;
-    int32_t tachometer = this->can_data[motorId].tachometer;
-
     switch (statusId) {
-    case 9: // Packet Status 9 (RPM & Duty Cycle)
-      RPM = static_cast<float>((can_msg->data[0] << 24) + (can_msg->data[1] << 16) + (can_msg->data[2] << 8) + can_msg->data[3]);
-      dutyCycleNow = static_cast<float>(((can_msg->data[6] << 8) + can_msg->data[7]) / 10.0);
+    case 9: // Packet Status 9 (RPM, Current & Duty Cycle)
+      motorData.velocity = static_cast<float>(readInt32(*can_msg, 0));
+      motorData.current = readInt16(*can_msg, 4) / 10.0;
+      motorData.dutyCycle = readInt16(*can_msg, 6) / 10.0;
       break;
-    case 27: // Packet Status 27 (Tachometer)
-      tachometer = static_cast<int32_t>((can_msg->data[0] << 24) + (can_msg->data[1] << 16) + (can_msg->data[2] << 8) + can_msg->data[3]);
-      
+    case 14: // Packet Status 14 (Amp Hours)
+      motorData.ampHours = readInt32(*can_msg, 0) / 10000.0;
+      motorData.ampHoursCharged = readInt32(*can_msg, 4) / 10000.0;
+      break;
+    case 15: // Packet Status 15 (Watt Hours)
+      motorData.wattHours = readInt32(*can_msg, 0) / 10000.0;
+      motorData.wattHoursCharged = readInt32(*can_msg, 4) / 10000.0;
+      break;
+    case 16: // Packet Status 16 (Temperatures & Input Current)
+      motorData.fetTemperature = readInt16(*can_msg, 0) / 10.0;
+      motorData.motorTemperature = readInt16(*can_msg, 2) / 10.0;
+      motorData.inputCurrent = readInt16(*can_msg, 4) / 10.0;
+      break;
+    case 27: // Packet Status 27 (Tachometer & Input Voltage)
+      motorData.tachometer = readInt32(*can_msg, 0);
+      motorData.inputVoltage = readInt16(*can_msg, 4) / 10.0;
+
       // Runs the PID controller for this motor if its active
       if (this->pid_controllers[motorId] && this->pid_controllers[motorId]->isActive) {
-        float PIDResult = this->pid_controllers[motorId]->update(tachometer);
+        float PIDResult = this->pid_controllers[motorId]->update(motorData.tachometer);
 
         int32_t data = PIDResult * 100000; // Convert from percent power to a signed 32-bit integer
         send_can(motorId + 0x00000000, data); // ID does NOT need to be modified to signify this is a duty cycle command
@@ -321,15 +556,18 @@ private:
       break;
     }
 
-    // Store the most recent motor data in the hashmap
-    this->can_data[motorId] = {dutyCycleNow, RPM, tachometer, std::chrono::steady_clock::now()};
+    // Store when the most recent motor data was received
+    motorData.timestamp = std::chrono::steady_clock::now();
 
     RCLCPP_DEBUG(this->get_logger(), "Received status frame %u from CAN ID %u with the following data:", statusId, motorId);
-    RCLCPP_DEBUG(this->get_logger(), "RPM: %.2f, Duty Cycle: %.2f%%, Tachometer: %d", RPM, dutyCycleNow, tachometer);
+    RCLCPP_DEBUG(this->get_logger(), "RPM: %.2f, Duty Cycle: %.2f%%, Current: %.1f A, Tachometer: %d, Input Voltage: %.1f V, FET Temperature: %.1f C, Motor Temperature: %.1f C",
+                 motorData.velocity, motorData.dutyCycle, motorData.current, motorData.tachometer, motorData.inputVoltage, motorData.fetTemperature, motorData.motorTemperature);
   }
 
-  // Initialize a hashmap to store the most recent motor data for each CAN ID
-  std::map<uint32_t, MotorData> can_data;
+  // Initialize a table to store the most recent motor data for each CAN ID (VESC CAN IDs are 8 bits)
+  std::array<MotorData, 256> can_data;
+  // The CAN IDs in can_data that have received status frames (in the order they were first received)
+  std::vector<uint32_t> received_ids;
   std::map<uint32_t, PIDController*> pid_controllers;
   // Adjust this data retention threshold as needed
   const std::chrono::seconds threshold = std::chrono::seconds(1);
@@ -337,36 +575,81 @@ private:
   // Initialize a hashmap to store the most recent msg for each CAN ID
   std::map<uint32_t, std::tuple<uint32_t, int32_t>> current_msg;
 
+  // Execute a single motor SET command. Returns true if the command type was recognized.
+  bool execute_set_command(const std::string &type, uint32_t can_id, float value) {
+    if (strcmp(type.c_str(), "velocity") == 0) {
+      vesc_set_velocity(can_id, value);
+    } else if (strcmp(type.c_str(), "duty_cycle") == 0) {
+      vesc_set_duty_cycle(can_id, value);
+    } else if (strcmp(type.c_str(), "position") == 0) {
+      vesc_set_position(can_id, value);
+    } else {
+      RCLCPP_ERROR(this->get_logger(), "Unknown motor SET command type: '%s'", type.c_str());
+      return false;
+    }
+    return true;
+  }
+
   // Callback method for the MotorCommandSet service
   void set_callback(const std::shared_ptr<rovr_interfaces::srv::MotorCommandSet::Request> request,
                     std::shared_ptr<rovr_interfaces::srv::MotorCommandSet::Response> response) {
-
-    if (strcmp(request->type.c_str(), "velocity") == 0) {
-      vesc_set_velocity(request->can_id, request->value);
-      response->success = 0; // indicates success
-    } else if (strcmp(request->type.c_str(), "duty_cycle") == 0) {
-      vesc_set_duty_cycle(request->can_id, request->value);
-      response->success = 0; // indicates success
-    } else if (strcmp(request->type.c_str(), "position") == 0) {
-      vesc_set_position(request->can_id, request->value);
+    if (execute_set_command(request->type, request->can_id, request->value)) {
       response->success = 0; // indicates success
     } else {
-      RCLCPP_ERROR(this->get_logger(), "Unknown motor SET command type: '%s'", request->type.c_str());
       response->success = 1; // indicates failure
     }
   }
 
+  // Callback method for the MotorCommandSetBatch service (applies every command in the batch at once)
+  void set_batch_callback(const std::shared_ptr<rovr_interfaces::srv::MotorCommandSetBatch::Request> request,
+                          std::shared_ptr<rovr_interfaces::srv::MotorCommandSetBatch::Response> response) {
+    size_t count = request->type.size();
+    if (request->can_id.size() != count || request->value.size() != count) {
+      RCLCPP_ERROR(this->get_logger(), "Malformed motor SET batch: %zu types, %zu CAN IDs, and %zu values",
+                   count, request->can_id.size(), request->value.size());
+      response->success = 1; // indicates failure
+      return;
+    }
+
+    response->success = 0; // indicates success
+    for (size_t i = 0; i < count; i++) {
+      if (!execute_set_command(request->type[i], request->can_id[i], request->value[i])) {
+        response->success = 1; // indicates failure
+      }
+    }
+  }
+
   // Callback method for the MotorCommandGet service
   void get_callback(const std::shared_ptr<rovr_interfaces::srv::MotorCommandGet::Request> request,
                     std::shared_ptr<rovr_interfaces::srv::MotorCommandGet::Response> response) {
     std::optional<float> data = std::nullopt;
 
     if (strcmp(request->type.c_str(), "velocity") == 0) {
-      data = vesc_get_velocity(request->can_id);
+      data = vesc_get_status(request->can_id, &MotorData::velocity);
     } else if (strcmp(request->type.c_str(), "duty_cycle") == 0) {
-      data = vesc_get_duty_cycle(request->can_id);
+      data = vesc_get_status(request->can_id, &MotorData::dutyCycle);
     } else if (strcmp(request->type.c_str(), "position") == 0) {
       data = vesc_get_position(request->can_id);
+    } else if (strcmp(request->type.c_str(), "time_remaining") == 0) {
+      data = vesc_get_time_remaining(request->can_id);
+    } else if (strcmp(request->type.c_str(), "current") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::current);
+    } else if (strcmp(request->type.c_str(), "input_current") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::inputCurrent);
+    } else if (strcmp(request->type.c_str(), "input_voltage") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::inputVoltage);
+    } else if (strcmp(request->type.c_str(), "fet_temperature") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::fetTemperature);
+    } else if (strcmp(request->type.c_str(), "motor_temperature") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::motorTemperature);
+    } else if (strcmp(request->type.c_str(), "amp_hours") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::ampHours);
+    } else if (strcmp(request->type.c_str(), "amp_hours_charged") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::ampHoursCharged);
+    } else if (strcmp(request->type.c_str(), "watt_hours") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::wattHours);
+    } else if (strcmp(request->type.c_str(), "watt_hours_charged") == 0) {
+      data = vesc_get_status(request->can_id, &MotorData::wattHoursCharged);
     } else {
       RCLCPP_ERROR(this->get_logger(), "Unknown motor GET command type: '%s'", request->type.c_str());
     }
@@ -381,10 +664,13 @@ private:
   }
 
   rclcpp::TimerBase::SharedPtr timer;
+  rclcpp::TimerBase::SharedPtr telemetry_timer;
+  rclcpp::Publisher<rovr_interfaces::msg::MotorTelemetry>::SharedPtr telemetry_pub;
   rclcpp::Publisher<can_msgs::msg::Frame>::SharedPtr can_pub;
   rclcpp::Subscription<can_msgs::msg::Frame>::SharedPtr can_sub;
   rclcpp::Service<rovr_interfaces::srv::MotorCommandSet>::SharedPtr srv_motor_set;
   rclcpp::Service<rovr_interfaces::srv::MotorCommandGet>::SharedPtr srv_motor_get;
+  rclcpp::Service<rovr_interfaces::srv::MotorCommandSetBatch>::SharedPtr srv_motor_set_batch;
 };
 
 // Main method for the node
@@ -24,7 +24,18 @@ and handling semantics found in the costmap 2d C++ API.
 """
 
 import numpy as np
-from typing import Tuple
+from collections import namedtuple
+from scipy import ndimage
+from typing import List, Tuple
+
+# Special costs of the costmap 2d C++ API
+LETHAL_OBSTACLE = 254
+NO_INFORMATION = 255
+
+# A dig lane found by PyCostmap2D.findDigSites: the world coordinate X of its center [m] and the highest cost in it
+DigSite = namedtuple("DigSite", ["x", "cost"])
+# A pose found by PyCostmap2D.getMaxClearancePose: its world coordinates XY [m] and its clearance [m]
+ClearancePose = namedtuple("ClearancePose", ["x", "y", "clearance"])
 
 
 class PyCostmap2D:
@@ -54,8 +65,59 @@ class PyCostmap2D:
         self.origin_y = costmap.metadata.origin.position.y
         self.global_frame_id = costmap.header.frame_id
         self.costmap_timestamp = costmap.header.stamp
-        # Extract costmap
-        self.costmap = np.array(costmap.data, dtype=np.uint8).reshape(self.size_x, self.size_y)
+        # Extract costmap (as a view of the message's data when it supports the buffer protocol)
+        try:
+            self.costmap = np.frombuffer(costmap.data, dtype=np.uint8)
+        except TypeError:
+            self.costmap = np.array(costmap.data, dtype=np.uint8)
+        # The same cells as a 2D array indexed by [my, mx] (sharing the same memory)
+        self.grid = self.costmap.reshape(self.size_y, self.size_x)
+        # Which version of a costmap this is, if there are several with the same timestamp (see CostmapMirror)
+        self.version = None
+        # Results computed from this costmap (see _cached), by method and parameters
+        self._cache = {}
+
+    @classmethod
+    def fromArray(
+        cls,
+        grid: np.ndarray,
+        resolution: float,
+        origin_x: float,
+        origin_y: float,
+        frame_id: str,
+        timestamp,
+        version: int = None,
+    ) -> "PyCostmap2D":
+        """
+        Initialize costmap2D from a 2D array of costs (without copying it).
+
+        Args
+        ----
+            grid (np.ndarray of np.uint8): costs of the cells, indexed by [my, mx]
+            resolution (float) [m/cell]: map resolution
+            origin_x (float) [m]: origin x axis of the map
+            origin_y (float) [m]: origin y axis of the map
+            frame_id (str): global frame_id
+            timestamp (builtin_interfaces.msg.Time): costmap timestamp
+            version (int): which version of the costmap this is (optional)
+
+        Returns
+        -------
+            PyCostmap2D: a costmap sharing the memory of grid
+
+        """
+        costmap = cls.__new__(cls)
+        costmap.size_y, costmap.size_x = grid.shape
+        costmap.resolution = resolution
+        costmap.origin_x = origin_x
+        costmap.origin_y = origin_y
+        costmap.global_frame_id = frame_id
+        costmap.costmap_timestamp = timestamp
+        costmap.grid = grid
+        costmap.costmap = grid.reshape(-1)
+        costmap.version = version
+        costmap._cache = {}
+        return costmap
 
     def getSizeInCellsX(self):
         """Get map width in cells."""
@@ -140,6 +202,7 @@ class PyCostmap2D:
 
         """
         self.costmap[self.getIndex(mx, my)] = cost
+        self._cache.clear()  # The cached results are stale now
 
     def mapToWorld(self, mx: int, my: int) -> Tuple[float, float]:
         """
@@ -202,6 +265,301 @@ class PyCostmap2D:
         """
         return my * self.size_x + mx
 
+    def mapToWorldArray(self, mx, my) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the world coordinates XY of arrays of map coordinates XY.
+
+        Args
+        ----
+            mx (array_like of int): map coordinates X to get world coordinates
+            my (array_like of int): map coordinates Y to get world coordinates
+
+        Returns
+        -------
+            tuple of np.ndarray: wx, wy
+            wx (np.ndarray of float) [m]: world coordinates X
+            wy (np.ndarray of float) [m]: world coordinates Y
+
+        """
+        wx = self.origin_x + (np.asarray(mx) + 0.5) * self.resolution
+        wy = self.origin_y + (np.asarray(my) + 0.5) * self.resolution
+        return (wx, wy)
+
+    def worldToMapArray(self, wx, wy) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the map coordinates XY of arrays of world coordinates XY.
+
+        Args
+        ----
+            wx (array_like of float) [m]: world coordinates X to get map coordinates
+            wy (array_like of float) [m]: world coordinates Y to get map coordinates
+
+        Returns
+        -------
+            tuple of np.ndarray: mx, my, valid
+            mx (np.ndarray of int): map coordinates X (0 where they are invalid)
+            my (np.ndarray of int): map coordinates Y (0 where they are invalid)
+            valid (np.ndarray of bool): whether each coordinate is inside the map
+
+        """
+        mx = np.floor((np.asarray(wx, dtype=np.float64) - self.origin_x) / self.resolution)
+        my = np.floor((np.asarray(wy, dtype=np.float64) - self.origin_y) / self.resolution)
+        valid = (mx >= 0) & (my >= 0) & (mx < self.size_x) & (my < self.size_y)
+        mx = np.where(valid, mx, 0).astype(np.intp)
+        my = np.where(valid, my, 0).astype(np.intp)
+        return (mx, my, valid)
+
+    def getCostArrayXY(self, mx, my) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the costs of arrays of cells in the costmap using map coordinates XY.
+
+        Args
+        ----
+            mx (array_like of int): map coordinates X to get costs
+            my (array_like of int): map coordinates Y to get costs
+
+        Returns
+        -------
+            tuple of np.ndarray: costs, valid
+            costs (np.ndarray of np.uint8): costs of the cells (NO_INFORMATION where they are invalid)
+            valid (np.ndarray of bool): whether each cell is inside the map
+
+        """
+        mx = np.asarray(mx, dtype=np.intp)
+        my = np.asarray(my, dtype=np.intp)
+        valid = (mx >= 0) & (my >= 0) & (mx < self.size_x) & (my < self.size_y)
+        costs = np.where(valid, self.grid[np.where(valid, my, 0), np.where(valid, mx, 0)], NO_INFORMATION)
+        return (costs.astype(np.uint8), valid)
+
+    def getCostArrayWorld(self, wx, wy) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the costs of the cells at arrays of world coordinates XY.
+
+        Args
+        ----
+            wx (array_like of float) [m]: world coordinates X to get costs
+            wy (array_like of float) [m]: world coordinates Y to get costs
+
+        Returns
+        -------
+            tuple of np.ndarray: costs, valid
+            costs (np.ndarray of np.uint8): costs of the cells (NO_INFORMATION where they are outside the map)
+            valid (np.ndarray of bool): whether each coordinate is inside the map
+
+        """
+        mx, my, valid = self.worldToMapArray(wx, wy)
+        costs = np.where(valid, self.grid[my, mx], NO_INFORMATION)
+        return (costs.astype(np.uint8), valid)
+
+    def getWindow(self, wx: float, wy: float, half_size_x: float, half_size_y: float) -> Tuple[np.ndarray, int, int]:
+        """
+        Get a view of the cells around a world coordinate XY (clipped to the map).
+
+        The view shares the costmap's memory, so it is not copied (and setting its costs sets them in the costmap).
+
+        Args
+        ----
+            wx (float) [m]: world coordinate X of the center of the window
+            wy (float) [m]: world coordinate Y of the center of the window
+            half_size_x (float) [m]: half the size of the window along the X axis
+            half_size_y (float) [m]: half the size of the window along the Y axis
+
+        Returns
+        -------
+            tuple: window, mx, my
+            window (np.ndarray of np.uint8): the cells of the window, indexed by [my, mx] (may be empty)
+            mx (int): map coordinate X of the first column of the window
+            my (int): map coordinate Y of the first row of the window
+
+        """
+        min_mx = int(np.floor((wx - half_size_x - self.origin_x) / self.resolution))
+        min_my = int(np.floor((wy - half_size_y - self.origin_y) / self.resolution))
+        max_mx = int(np.floor((wx + half_size_x - self.origin_x) / self.resolution))
+        max_my = int(np.floor((wy + half_size_y - self.origin_y) / self.resolution))
+        min_mx, min_my = max(min_mx, 0), max(min_my, 0)
+        max_mx, max_my = min(max_mx, self.size_x - 1), min(max_my, self.size_y - 1)
+        return (self.grid[min_my : max_my + 1, min_mx : max_mx + 1], min_mx, min_my)
+
+    def getFootprintCosts(self, wx, wy, yaw, footprint) -> np.ndarray:
+        """
+        Get the highest cost under a footprint at arrays of poses (e.g. along a path).
+
+        Args
+        ----
+            wx (array_like of float) [m]: world coordinates X of the poses
+            wy (array_like of float) [m]: world coordinates Y of the poses
+            yaw (array_like of float) [rad]: headings of the poses
+            footprint (array_like of float) [m]: (N x 2) points of the footprint relative to the pose
+
+        Returns
+        -------
+            np.ndarray of np.uint8: the highest cost under the footprint at every pose
+            (NO_INFORMATION if any point is outside the map)
+
+        """
+        wx, wy, yaw = np.broadcast_arrays(np.asarray(wx), np.asarray(wy), np.asarray(yaw))
+        footprint = np.asarray(footprint, dtype=np.float64)
+        cos_yaw = np.cos(yaw)[..., np.newaxis]
+        sin_yaw = np.sin(yaw)[..., np.newaxis]
+        # Rotate and translate every footprint point to every pose (poses x points)
+        points_x = wx[..., np.newaxis] + cos_yaw * footprint[:, 0] - sin_yaw * footprint[:, 1]
+        points_y = wy[..., np.newaxis] + sin_yaw * footprint[:, 0] + cos_yaw * footprint[:, 1]
+        costs, _ = self.getCostArrayWorld(points_x, points_y)
+        return costs.max(axis=-1)
+
+    def getRectangleFootprint(self, length: float, width: float) -> np.ndarray:
+        """
+        Get the points of a filled rectangular footprint centered on the pose, spaced by the map resolution.
+
+        Args
+        ----
+            length (float) [m]: size of the footprint along the X axis of the pose
+            width (float) [m]: size of the footprint along the Y axis of the pose
+
+        Returns
+        -------
+            np.ndarray of float: (N x 2) points of the footprint relative to the pose [m]
+
+        """
+        x = np.linspace(-length / 2, length / 2, max(int(np.ceil(length / self.resolution)) + 1, 2))
+        y = np.linspace(-width / 2, width / 2, max(int(np.ceil(width / self.resolution)) + 1, 2))
+        return np.stack(np.meshgrid(x, y), axis=-1).reshape(-1, 2)
+
+    def findDigSites(self, min_x: float, max_x: float, min_y: float, max_y: float, lane_width: float) -> List[DigSite]:
+        """
+        Find the safest non-overlapping dig lanes in a dig zone.
+
+        A lane is lane_width wide along the X axis and spans the whole dig zone along the Y axis.
+        Every lane position is scored in one pass (the highest cost in each column of the zone, then a sliding maximum
+        over lane_width columns). The results are cached for this costmap.
+
+        Args
+        ----
+            min_x, max_x (float) [m]: world coordinates X of the dig zone (clipped to the map)
+            min_y, max_y (float) [m]: world coordinates Y of the dig zone (clipped to the map)
+            lane_width (float) [m]: width of a dig lane
+
+        Returns
+        -------
+            list of DigSite: non-overlapping lanes, from the lowest to the highest cost (empty if none fit in the zone)
+
+        """
+        return list(self._cached(("findDigSites", min_x, max_x, min_y, max_y, lane_width), self._findDigSites))
+
+    def _findDigSites(self, min_x, max_x, min_y, max_y, lane_width) -> List[DigSite]:
+        """Find the dig sites (see findDigSites) without caching them."""
+        sites = []
+        min_mx, max_mx, min_my, max_my = self._regionToMap(min_x, max_x, min_y, max_y)
+        lane_cells = max(int(round(lane_width / self.resolution)), 1)
+        if max_my >= min_my and max_mx - min_mx + 1 >= lane_cells:
+            column_costs = self.grid[min_my : max_my + 1, min_mx : max_mx + 1].max(axis=0)
+            # The highest cost of the lane starting at each column
+            lane_costs = np.lib.stride_tricks.sliding_window_view(column_costs, lane_cells).max(axis=1)
+            taken = np.zeros(len(lane_costs), dtype=bool)
+            for start in np.argsort(lane_costs, kind="stable"):
+                if taken[start]:
+                    continue
+                # Lanes starting less than lane_cells columns from this one would overlap it
+                taken[max(start - lane_cells + 1, 0) : start + lane_cells] = True
+                center_x = self.origin_x + (min_mx + start + lane_cells / 2) * self.resolution
+                sites.append(DigSite(float(center_x), int(lane_costs[start])))
+        return sites
+
+    def getClearanceLayer(self, lethal_cost: int = LETHAL_OBSTACLE) -> np.ndarray:
+        """
+        Get the distance between every cell and the nearest lethal cell (a Euclidean distance transform of the costmap).
+
+        The layer is computed once and cached for this costmap. Cells outside the map are not considered lethal.
+
+        Args
+        ----
+            lethal_cost (int): the lowest cost of a lethal cell (NO_INFORMATION cells are lethal by default)
+
+        Returns
+        -------
+            np.ndarray of float (read-only) [m]: clearance of every cell, indexed by [my, mx] (inf if nothing is lethal)
+
+        """
+        return self._cached(("getClearanceLayer", lethal_cost), self._computeClearanceLayer)
+
+    def _computeClearanceLayer(self, lethal_cost) -> np.ndarray:
+        """Compute the clearance layer (see getClearanceLayer) without caching it."""
+        free = self.grid < lethal_cost
+        if free.all():
+            clearance = np.full(free.shape, np.inf)
+        else:
+            clearance = ndimage.distance_transform_edt(free, sampling=self.resolution)
+        clearance.flags.writeable = False
+        return clearance
+
+    def getClearanceArrayWorld(self, wx, wy, lethal_cost: int = LETHAL_OBSTACLE) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get the distances from arrays of world coordinates XY to the nearest lethal cell.
+
+        Args
+        ----
+            wx (array_like of float) [m]: world coordinates X to get clearances
+            wy (array_like of float) [m]: world coordinates Y to get clearances
+            lethal_cost (int): the lowest cost of a lethal cell
+
+        Returns
+        -------
+            tuple of np.ndarray: clearance, valid
+            clearance (np.ndarray of float) [m]: clearance of the cells (0 where they are outside the map)
+            valid (np.ndarray of bool): whether each coordinate is inside the map
+
+        """
+        mx, my, valid = self.worldToMapArray(wx, wy)
+        clearance = np.where(valid, self.getClearanceLayer(lethal_cost)[my, mx], 0.0)
+        return (clearance, valid)
+
+    def getMaxClearancePose(
+        self, min_x: float, max_x: float, min_y: float, max_y: float, lethal_cost: int = LETHAL_OBSTACLE
+    ) -> ClearancePose:
+        """
+        Get the cell furthest from any lethal cell within a region.
+
+        Args
+        ----
+            min_x, max_x (float) [m]: world coordinates X of the region (clipped to the map)
+            min_y, max_y (float) [m]: world coordinates Y of the region (clipped to the map)
+            lethal_cost (int): the lowest cost of a lethal cell
+
+        Returns
+        -------
+            ClearancePose: world coordinates XY of the center of the cell and its clearance
+            (None if the region is outside the map)
+
+        """
+        min_mx, max_mx, min_my, max_my = self._regionToMap(min_x, max_x, min_y, max_y)
+        if max_mx < min_mx or max_my < min_my:
+            return None
+        region = self.getClearanceLayer(lethal_cost)[min_my : max_my + 1, min_mx : max_mx + 1]
+        my, mx = np.unravel_index(np.argmax(region), region.shape)
+        wx, wy = self.mapToWorld(min_mx + mx, min_my + my)
+        return ClearancePose(float(wx), float(wy), float(region[my, mx]))
+
+    def _regionToMap(self, min_x, max_x, min_y, max_y) -> Tuple[int, int, int, int]:
+        """Get the (inclusive) map coordinates min_mx, max_mx, min_my, max_my of the cells in a world region."""
+        min_mx = max(int(np.floor((min_x - self.origin_x) / self.resolution)), 0)
+        min_my = max(int(np.floor((min_y - self.origin_y) / self.resolution)), 0)
+        max_mx = min(int(np.ceil((max_x - self.origin_x) / self.resolution)) - 1, self.size_x - 1)
+        max_my = min(int(np.ceil((max_y - self.origin_y) / self.resolution)) - 1, self.size_y - 1)
+        return (min_mx, max_mx, min_my, max_my)
+
+    def _cached(self, key: tuple, compute):
+        """
+        Get the result of compute(*key[1:]), computing it only once for this costmap.
+
+        setCost() clears the cached results, but modifying costmap or grid directly does not. A new costmap (e.g. from
+        a new message or CostmapMirror.snapshot()) starts with an empty cache.
+        """
+        result = self._cache.get(key)
+        if result is None:
+            result = compute(*key[1:])
+            self._cache[key] = result
+        return result
+
     def getDigCost(self, wx, wy, robot_width, dig_length):
         mx, my = self.worldToMapValidated(wx, wy)
-        return np.amax(self.costmap[int(mx - robot_width) : int(mx + robot_width), int(my) : int(my + dig_length)])
+        return np.amax(self.grid[int(my) : int(my + dig_length), int(mx - robot_width) : int(mx + robot_width)])
@@ -0,0 +1,132 @@
+# This module keeps a local copy of a Nav2 costmap up to date from its published messages, so that reading the
+# costmap never needs a service call (like BasicNavigator.getGlobalCostmap()) or a full rebuild.
+#
+# Nav2 publishes the costmap as a nav_msgs/OccupancyGrid on <costmap>/costmap, and then only the changed rectangles
+# as map_msgs/OccupancyGridUpdate messages on <costmap>/costmap_updates (unless always_send_full_costmap is True).
+# OccupancyGrid costs go from 0 to 100 (lethal) and -1 (unknown), so they are translated back to the 0 to 255 costs
+# of nav2_msgs/Costmap (the ones getGlobalCostmap() returns) to keep the thresholds used with PyCostmap2D the same.
+#
+# Both topics are transient local with a depth of 1, so a subscriber that starts late only gets the first full costmap
+# and the latest update (and any update dropped on the way is gone for good). The mirror can't tell which patches it
+# missed, so it starts out (and goes back to) needing a resync: a whole nav2_msgs/Costmap from Nav2's get_costmap
+# service. Messages older than the costmap the mirror already has are ignored, so they can't roll it back.
+
+import threading
+
+import numpy as np
+
+from rovr_control.costmap_2d import LETHAL_OBSTACLE, NO_INFORMATION, PyCostmap2D
+
+
+def occupancy_to_cost_table() -> np.ndarray:
+    """Get the table translating OccupancyGrid values (read as uint8, so -1 is 255) to costmap 2d costs.
+
+    This inverts the cost translation table of the Nav2 costmap publisher (as closely as its rounding allows, so
+    every value comes back as the highest cost Nav2 would translate to it, erring on the side of caution).
+    """
+    table = np.full(256, NO_INFORMATION, dtype=np.uint8)
+    table[0] = 0
+    # Nav2 translates costs 1-252 to 1 + (97 * (cost - 1)) // 251, so value v covers costs up to 1 + (251 * v - 1) // 97
+    table[1:99] = np.minimum(1 + (251 * np.arange(1, 99) - 1) // 97, LETHAL_OBSTACLE - 2)
+    table[99] = LETHAL_OBSTACLE - 1  # INSCRIBED_INFLATED_OBSTACLE
+    table[100] = LETHAL_OBSTACLE
+    return table
+
+
+OCCUPANCY_TO_COST = occupancy_to_cost_table()
+
+
+class CostmapMirror:
+    """A costmap patched in place from OccupancyGrid and OccupancyGridUpdate messages.
+
+    Every change increments version. snapshot() returns a read-only PyCostmap2D of the latest version, which is only
+    copied the first time it is requested after a change. The message callbacks and snapshot() may run on different
+    threads. needs_resync is True until a whole costmap is received with handle_nav2_costmap(), and again whenever an
+    update doesn't fit the costmap (so some patches may be missing).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.grid = None  # The live costs, indexed by [my, mx] (None until the first full costmap is received)
+        self.resolution = None
+        self.origin_x = None
+        self.origin_y = None
+        self.frame_id = None
+        self.timestamp = None
+        self.needs_resync = True
+        self._snapshot = None
+
+    def handle_costmap(self, msg) -> None:
+        """Replace the costmap with a nav_msgs/OccupancyGrid message (unless it is older than the current costmap)."""
+        data = np.frombuffer(msg.data, dtype=np.uint8).reshape(msg.info.height, msg.info.width)
+        with self.lock:
+            if self._is_older(msg.header.stamp):
+                return
+            if self.grid is None or self.grid.shape != data.shape:
+                self.grid = np.empty(data.shape, dtype=np.uint8)
+            np.take(OCCUPANCY_TO_COST, data, out=self.grid)
+            self._set_info(msg.info.resolution, msg.info.origin, msg.header)
+
+    def handle_nav2_costmap(self, msg) -> None:
+        """Replace the costmap with a whole nav2_msgs/Costmap (e.g. from getGlobalCostmap()), which resyncs it."""
+        grid = PyCostmap2D(msg).grid  # Already in costmap 2d costs
+        with self.lock:
+            if self._is_older(msg.header.stamp):
+                return
+            self.grid = grid.copy()
+            self._set_info(msg.metadata.resolution, msg.metadata.origin, msg.header)
+            self.needs_resync = False
+
+    def handle_update(self, msg) -> bool:
+        """Patch the costmap with a map_msgs/OccupancyGridUpdate message.
+
+        Returns False (and ignores the update) if it is older than the costmap, or if there is no costmap yet or the
+        update doesn't fit in it (which also means the costmap needs a resync).
+        """
+        data = np.frombuffer(msg.data, dtype=np.uint8).reshape(msg.height, msg.width)
+        with self.lock:
+            if self._is_older(msg.header.stamp):
+                return False
+            if (
+                self.grid is None
+                or msg.header.frame_id != self.frame_id
+                or msg.x < 0
+                or msg.y < 0
+                or msg.y + msg.height > self.grid.shape[0]
+                or msg.x + msg.width > self.grid.shape[1]
+            ):
+                self.needs_resync = True
+                return False
+            self.grid[msg.y : msg.y + msg.height, msg.x : msg.x + msg.width] = OCCUPANCY_TO_COST[data]
+            self.timestamp = msg.header.stamp
+            self.version += 1
+        return True
+
+    def _is_older(self, stamp) -> bool:
+        """Whether a message timestamp is older than the current costmap's."""
+        if self.timestamp is None:
+            return False
+        return (stamp.sec, stamp.nanosec) < (self.timestamp.sec, self.timestamp.nanosec)
+
+    def _set_info(self, resolution, origin, header) -> None:
+        """Set the metadata of a new costmap (with the lock held)."""
+        self.resolution = resolution
+        self.origin_x = origin.position.x
+        self.origin_y = origin.position.y
+        self.frame_id = header.frame_id
+        self.timestamp = header.stamp
+        self.version += 1
+
+    def snapshot(self) -> PyCostmap2D:
+        """Get a read-only PyCostmap2D of the latest version of the costmap (None if none was received yet)."""
+        with self.lock:
+            if self.grid is None:
+                return None
+            if self._snapshot is None or self._snapshot.version != self.version:
+                grid = self.grid.copy()
+                grid.flags.writeable = False
+                self._snapshot = PyCostmap2D.fromArray(
+                    grid, self.resolution, self.origin_x, self.origin_y, self.frame_id, self.timestamp, self.version
+                )
+            return self._snapshot
@@ -10,6 +10,7 @@ from rclpy.action import ActionClient
 from rclpy.action.client import ClientGoalHandle
 from rclpy.client import Future
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, DurabilityPolicy
 from rclpy.executors import MultiThreadedExecutor
 
 # Provides a “navigation as a library” capability
@@ -21,12 +22,15 @@ from nav2_simple_commander.robot_navigator import (
 # Import ROS 2 formatted message types
 from geometry_msgs.msg import Twist, Vector3, PoseStamped
 from sensor_msgs.msg import Joy
-from std_msgs.msg import Bool
+from nav_msgs.msg import OccupancyGrid
+from map_msgs.msg import OccupancyGridUpdate
 from action_msgs.msg import GoalStatus
+from nav2_msgs.srv import GetCostmap
 
 # Import custom ROS 2 interfaces
-from rovr_interfaces.srv import Stop, Drive, MotorCommandGet, SetPower, SetPosition
-from rovr_interfaces.action import CalibrateFieldCoordinates
+from rovr_interfaces.srv import Stop, Drive, MotorCommandGet, SetPower, SetPosition, CalibrateDrivetrain
+from rovr_interfaces.action import CalibrateFieldCoordinates, MoveLift
+from rovr_interfaces.msg import SkimmerFill
 
 # Import Python Modules
 import asyncio  # Allows the use of asynchronous methods!
@@ -35,6 +39,9 @@ from scipy.spatial.transform import Rotation as R
 # Import our logitech gamepad button mappings
 from rovr_control import gamepad_constants as bindings
 
+# Import our costmap mirror
+from rovr_control.costmap_mirror import CostmapMirror
+
 # Uncomment the line below to use the Xbox controller mappings instead
 # from rovr_control import xbox_controller_constants as bindings
 
@@ -73,6 +80,8 @@ class MainControlNode(Node):
         self.declare_parameter("lift_dumping_position", -1000)  # Measured in encoder counts
         self.declare_parameter("lift_digging_start_position", -3050)  # Measured in encoder counts
         self.declare_parameter("lift_digging_end_position", -3150)  # Measured in encoder counts
+        self.declare_parameter("autonomous_dig_fill_percentage", 90.0)  # Stop digging once the skimmer is this full
+        self.declare_parameter("skimmer_fill_min_confidence", 0.5)  # Ignore fill estimates less confident than this
 
         # Assign the ROS Parameters to member variables below #
         self.autonomous_driving_power = self.get_parameter("autonomous_driving_power").value
@@ -90,6 +99,8 @@ class MainControlNode(Node):
         self.lift_digging_end_position = (
             self.get_parameter("lift_digging_end_position").value * 360 / 42
         )  # Convert encoder counts to degrees
+        self.autonomous_dig_fill_percentage = self.get_parameter("autonomous_dig_fill_percentage").value
+        self.skimmer_fill_min_confidence = self.get_parameter("skimmer_fill_min_confidence").value
 
         # Print the ROS Parameters to the terminal below #
         self.get_logger().info("autonomous_driving_power has been set to: " + str(self.autonomous_driving_power))
@@ -101,6 +112,10 @@ class MainControlNode(Node):
         self.get_logger().info("lift_dumping_position has been set to: " + str(self.lift_dumping_position))
         self.get_logger().info("lift_digging_start_position has been set to: " + str(self.lift_digging_start_position))
         self.get_logger().info("lift_digging_end_position has been set to: " + str(self.lift_digging_end_position))
+        self.get_logger().info(
+            "autonomous_dig_fill_percentage has been set to: " + str(self.autonomous_dig_fill_percentage)
+        )
+        self.get_logger().info("skimmer_fill_min_confidence has been set to: " + str(self.skimmer_fill_min_confidence))
 
         # Define some initial states here
         self.state = states["Teleop"]
@@ -110,10 +125,13 @@ class MainControlNode(Node):
         self.autonomous_digging_process = None
         self.autonomous_offload_process = None
         self.autonomous_cycle_process = None
-        self.skimmer_goal_reached = True
+        self.skimmer_fill = None  # The latest SkimmerFill estimate (None if check_load isn't running)
+        self.skimmer_fill_received = None  # When the latest SkimmerFill estimate was received (by our clock)
 
         self.DANGER_THRESHOLD = 1
         self.REAL_DANGER_THRESHOLD = 100
+        self.ROBOT_WIDTH = 1.749  # Measured in meters
+        self.BERM_SEARCH_DISTANCE = 0.5  # How far to move the berm location to get it clear of obstacles (in meters)
 
         # Define important map locations
         if self.autonomous_field_type == "top":
@@ -135,22 +153,44 @@ class MainControlNode(Node):
         self.cli_lift_setPosition = self.create_client(SetPosition, "lift/setPosition")
         self.cli_drivetrain_stop = self.create_client(Stop, "drivetrain/stop")
         self.cli_drivetrain = self.create_client(Drive, "drivetrain/drive")
-        self.cli_drivetrain_calibrate = self.create_client(Stop, "drivetrain/calibrate")
+        self.cli_drivetrain_calibrate = self.create_client(CalibrateDrivetrain, "drivetrain/calibrate")
         self.cli_motor_get = self.create_client(MotorCommandGet, "motor/get")
         self.cli_lift_stop = self.create_client(Stop, "lift/stop")
         self.cli_lift_zero = self.create_client(Stop, "lift/zero")
         self.cli_lift_set_power = self.create_client(SetPower, "lift/setPower")
+        self.cli_get_global_costmap = self.create_client(GetCostmap, "global_costmap/get_costmap")
 
         # Define publishers and subscribers here
         self.drive_power_publisher = self.create_publisher(Twist, "cmd_vel", 10)
         self.joy_subscription = self.create_subscription(Joy, "joy", self.joystick_callback, 10)
-        self.skimmer_goal_subscription = self.create_subscription(
-            Bool, "/skimmer/goal_reached", self.skimmer_goal_callback, 10
+        self.skimmer_fill_subscription = self.create_subscription(
+            SkimmerFill, "skimmer/fill", self.skimmer_fill_callback, 10
+        )
+        # Keep a copy of the global costmap up to date from its updates (instead of requesting it from Nav2)
+        self.costmap_mirror = CostmapMirror()
+        costmap_qos = QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL)  # The same as Nav2 uses
+        # A deeper queue for the updates, so that a burst of them isn't dropped (every one of them is needed)
+        costmap_updates_qos = QoSProfile(depth=10, durability=DurabilityPolicy.TRANSIENT_LOCAL)
+        self.costmap_subscription = self.create_subscription(
+            OccupancyGrid, "global_costmap/costmap", self.costmap_mirror.handle_costmap, costmap_qos
+        )
+        self.costmap_updates_subscription = self.create_subscription(
+            OccupancyGridUpdate,
+            "global_costmap/costmap_updates",
+            self.costmap_mirror.handle_update,
+            costmap_updates_qos,
         )
+        self.costmap_resync_future = None  # The get_costmap request in flight, if any
+        self.costmap_resync_requested = None  # When the get_costmap request in flight was sent
+        self.COSTMAP_RESYNC_TIMEOUT = 5.0  # Give up on a get_costmap request after this long (in seconds)
+
+        # Define timers here
+        self.costmap_resync_timer = self.create_timer(1.0, self.costmap_resync_callback)
 
         self.act_calibrate_field_coordinates = ActionClient(
             self, CalibrateFieldCoordinates, "calibrate_field_coordinates"
         )
+        self.act_move_lift = ActionClient(self, MoveLift, "lift/move")
 
         self.field_calibrated_handle: ClientGoalHandle = ClientGoalHandle(None, None, None)
         self.nav2 = BasicNavigator()  # Instantiate the BasicNavigator class
@@ -160,39 +200,57 @@ class MainControlNode(Node):
             self.get_logger().warn("Waiting for the lift/zero service to be available (BLOCKING)")
         self.cli_lift_zero.call_async(Stop.Request())  # Zero the lift by slowly raising it up
 
+    def global_costmap(self):
+        """Returns the latest global costmap (None if none was received yet), warning if it may be out of date."""
+        costmap = self.costmap_mirror.snapshot()
+        if costmap is None:
+            self.get_logger().warn("No global costmap has been received yet.")
+        elif self.costmap_mirror.needs_resync:
+            self.get_logger().warn("The global costmap may be missing updates, it has not been resynced with Nav2 yet.")
+        return costmap
+
     # NOTE: This method is meant to find a safe digging location on the field, but it has not been tested enough yet.
-    # def optimal_dig_location(self) -> list:
-    #     available_dig_spots = []
-    #     try:
-    #         costmap = PyCostmap2D(self.nav2.getGlobalCostmap())
-    #         resolution = costmap.getResolution()
-    #         print(resolution)
-    #         # NEEDED MEASUREMENTS:
-    #         robot_width = 1.749 / 2
-    #         robot_width_pixels = robot_width // resolution
-    #         danger_threshold, real_danger_threshold = 50, 150
-    #         dig_zone_depth, dig_zone_start, dig_zone_end = 2.57, 4.07, 8.14
-    #         dig_zone_border_y = 2.0
-    #         while len(available_dig_spots) == 0:
-    #             if danger_threshold > real_danger_threshold:
-    #                 self.get_logger().warn("No safe digging spots available. Switch to manual control.")
-    #                 return None
-    #             i = dig_zone_start + robot_width
-    #             while i <= dig_zone_end - robot_width:
-    #                 if (
-    #                     costmap.getDigCost(i, dig_zone_border_y, robot_width_pixels, dig_zone_depth)
-    #                     <= self.DANGER_THRESHOLD
-    #                 ):
-    #                     available_dig_spots.append(create_pose_stamped(i, -dig_zone_border_y, 270))
-    #                     i += robot_width
-    #                 else:
-    #                     i += resolution
-    #             if len(available_dig_spots) > 0:
-    #                 return available_dig_spots
-    #             danger_threshold += 5
-    #     except Exception as e:
-    #         self.get_logger().error(f"Error in optimal_dig_location: {e} on line {sys.exc_info()[-1].tb_lineno}")
-    #         return None
+    def optimal_dig_location(self) -> list:
+        """Returns the poses of the safe dig lanes on the field (safest first), or an empty list if there are none."""
+        costmap = self.global_costmap()
+        if costmap is None:
+            return []
+        # NEEDED MEASUREMENTS:
+        dig_zone_depth, dig_zone_start, dig_zone_end = 2.57, 4.07, 8.14
+        dig_zone_border_y = 2.0
+        # Every lane is scored in one pass over the dig zone (and reused until the costmap is updated)
+        dig_sites = costmap.findDigSites(
+            dig_zone_start, dig_zone_end, -dig_zone_border_y - dig_zone_depth, -dig_zone_border_y, self.ROBOT_WIDTH
+        )
+        dig_sites = [site for site in dig_sites if site.cost <= self.REAL_DANGER_THRESHOLD]
+        # Between equally safe lanes, prefer the ones starting furthest from any obstacle
+        clearance, _ = costmap.getClearanceArrayWorld(
+            [site.x for site in dig_sites], [-dig_zone_border_y] * len(dig_sites)
+        )
+        dig_sites = [site for _, _, site in sorted(zip([site.cost for site in dig_sites], -clearance, dig_sites))]
+        available_dig_spots = [create_pose_stamped(site.x, -dig_zone_border_y, 270) for site in dig_sites]
+        if len(available_dig_spots) == 0:
+            self.get_logger().warn("No safe digging spots available.")
+        return available_dig_spots
+
+    def clear_berm_location(self) -> PoseStamped:
+        """Returns the berm location, moved to the clearest spot nearby if it is too close to an obstacle."""
+        costmap = self.global_costmap()
+        if costmap is None:
+            return self.autonomous_berm_location
+        x = self.autonomous_berm_location.pose.position.x
+        y = self.autonomous_berm_location.pose.position.y
+        clearance, _ = costmap.getClearanceArrayWorld([x], [y])
+        if clearance[0] >= self.ROBOT_WIDTH / 2:
+            return self.autonomous_berm_location
+        distance = self.BERM_SEARCH_DISTANCE
+        clearest = costmap.getMaxClearancePose(x - distance, x + distance, y - distance, y + distance)
+        if clearest is None or clearest.clearance <= clearance[0]:
+            return self.autonomous_berm_location
+        self.get_logger().warn(f"The berm location is too close to an obstacle, using ({clearest.x}, {clearest.y})")
+        berm_location = create_pose_stamped(clearest.x, clearest.y, 0)
+        berm_location.pose.orientation = self.autonomous_berm_location.pose.orientation
+        return berm_location
 
     def stop_all_subsystems(self) -> None:
         """This method stops all subsystems on the robot."""
@@ -205,20 +263,46 @@ class MainControlNode(Node):
         self.stop_all_subsystems()  # Stop all subsystems
         self.state = states["Teleop"]  # Return to Teleop mode
 
+    def skimmer_full(self) -> bool:
+        """Returns whether a recent, confident fill estimate says the skimmer is full enough to stop digging."""
+        if self.skimmer_fill is None:
+            return False
+        # The header stamp comes from the camera's clock, so measure the age from when the estimate was received
+        age = self.get_clock().now() - self.skimmer_fill_received
+        return (
+            age.nanoseconds < 1e9
+            and self.skimmer_fill.confidence >= self.skimmer_fill_min_confidence
+            and self.skimmer_fill.percentage >= self.autonomous_dig_fill_percentage
+        )
+
+    async def move_lift(self, position: float) -> bool:
+        """Move the lift to a position and wait until it gets there. Returns whether the goal was reached."""
+        goal = MoveLift.Goal(position=float(position))
+        goal_handle: ClientGoalHandle = await self.act_move_lift.send_goal_async(goal)
+        if not goal_handle.accepted:
+            self.get_logger().error("The lift/move goal was rejected!")
+            return False
+        try:
+            result = await goal_handle.get_result_async()
+        except asyncio.CancelledError:
+            goal_handle.cancel_goal_async()  # Stop the lift if the autonomous procedure is terminated
+            raise
+        if result.status != GoalStatus.STATUS_SUCCEEDED:
+            self.get_logger().error(f"The lift did not reach its goal position of {position} degrees!")
+            return False
+        return True
+
     # TODO: This autonomous routine has not been tested yet!
     async def auto_dig_procedure(self) -> None:
         """This method lays out the procedure for autonomously digging!"""
         self.get_logger().info("\nStarting Autonomous Digging Procedure!")
         try:  # Wrap the autonomous procedure in a try-except
             await self.cli_lift_zero.call_async(Stop.Request())
-            await self.cli_lift_setPosition.call_async(
-                SetPosition.Request(position=self.lift_digging_start_position)
-            )  # Lower the skimmer onto the ground
-            self.skimmer_goal_reached = False
-            # Wait for the goal height to be reached
-            while not self.skimmer_goal_reached:
-                self.get_logger().info("Moving skimmer to starting dig position")
-                await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
+            # Lower the skimmer onto the ground
+            self.get_logger().info("Moving skimmer to starting dig position")
+            if not await self.move_lift(self.lift_digging_start_position):
+                self.end_autonomous()  # Return to Teleop mode
+                return
             await self.cli_skimmer_setPower.call_async(SetPower.Request(power=self.skimmer_belt_power))
             # Drive forward while digging
             start_time = self.get_clock().now().nanoseconds
@@ -232,20 +316,20 @@ class MainControlNode(Node):
                 self.get_logger().info("Accelerating lift and drive train")
                 elapsed = self.get_clock().now().nanoseconds - start_time
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
-            # keep digging at full speed for the remaining 10 seconds
+            # keep digging at full speed for the remaining 10 seconds (or until the skimmer is full)
             while self.get_clock().now().nanoseconds - start_time < 12e9:
+                if self.skimmer_full():
+                    self.get_logger().info(f"Skimmer is {self.skimmer_fill.percentage:.0f}% full, done digging")
+                    break
                 self.get_logger().info("Auto Driving")
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
             await self.cli_drivetrain_stop.call_async(Stop.Request())
             await self.cli_skimmer_stop.call_async(Stop.Request())
-            await self.cli_lift_setPosition.call_async(
-                SetPosition.Request(position=self.lift_dumping_position)
-            )  # Raise the skimmer back up
-            self.skimmer_goal_reached = False
-            # Wait for the lift goal to be reached
-            while not self.skimmer_goal_reached:
-                self.get_logger().info("Moving skimmer to dumping position")
-                await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
+            # Raise the skimmer back up
+            self.get_logger().info("Moving skimmer to dumping position")
+            if not await self.move_lift(self.lift_dumping_position):
+                self.end_autonomous()  # Return to Teleop mode
+                return
             self.get_logger().info("Autonomous Digging Procedure Complete!\n")
             self.end_autonomous()  # Return to Teleop mode
         except asyncio.CancelledError:  # Put termination code here
@@ -267,12 +351,10 @@ class MainControlNode(Node):
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
             await self.cli_drivetrain_stop.call_async(Stop.Request())
             # Raise up the skimmer in preparation for dumping
-            await self.cli_lift_setPosition.call_async(SetPosition.Request(position=self.lift_dumping_position))
-            self.skimmer_goal_reached = False
-            # Wait for the lift goal to be reached
-            while not self.skimmer_goal_reached:
-                self.get_logger().info("Moving skimmer to the goal")
-                await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
+            self.get_logger().info("Moving skimmer to the goal")
+            if not await self.move_lift(self.lift_dumping_position):
+                self.end_autonomous()  # Return to Teleop mode
+                return
             self.get_logger().info("Commence Offloading!")
             await self.cli_skimmer_setPower.call_async(SetPower.Request(power=self.skimmer_belt_power))
             await asyncio.sleep(8 / abs(self.skimmer_belt_power))  # How long to offload for
@@ -295,7 +377,9 @@ class MainControlNode(Node):
                 self.get_logger().error("Field coordinates must be calibrated first!")
                 self.end_autonomous()  # Return to Teleop mode
                 return
-            self.nav2.goToPose(self.dig_location)  # Navigate to the dig location
+            dig_locations = self.optimal_dig_location()  # Find the safest dig lane
+            dig_location = dig_locations[0] if dig_locations else self.dig_location
+            self.nav2.goToPose(dig_location)  # Navigate to the dig location
             while not self.nav2.isTaskComplete():  # Wait for the dig location to be reached
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
             if self.nav2.getResult() == TaskResult.FAILED:
@@ -307,7 +391,7 @@ class MainControlNode(Node):
             )  # Start the auto dig process
             while not self.autonomous_digging_process.done():  # Wait for the dig process to complete
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
-            self.nav2.goToPose(self.autonomous_berm_location)  # Navigate to the berm zone
+            self.nav2.goToPose(self.clear_berm_location())  # Navigate to the berm zone
             while not self.nav2.isTaskComplete():  # Wait for the berm zone to be reached
                 await asyncio.sleep(0.1)  # Allows other async tasks to continue running (this is non-blocking)
             if self.nav2.getResult() == TaskResult.FAILED:
@@ -325,10 +409,6 @@ class MainControlNode(Node):
             self.get_logger().info("Autonomous Cycle Terminated\n")
             self.end_autonomous()  # Return to Teleop mode
 
-    def skimmer_goal_callback(self, msg: Bool) -> None:
-        """Update the member variable accordingly."""
-        self.skimmer_goal_reached = msg.data
-
     def calibrate_goal_reponse_callback(self, future: Future):
         self.field_calibrated_handle: ClientGoalHandle = future.result()
         if not self.field_calibrated_handle.accepted:
@@ -344,6 +424,41 @@ class MainControlNode(Node):
             self.get_logger().info("Field calibration succeeded!")
             self.end_autonomous()
 
+    def costmap_resync_callback(self) -> None:
+        """Requests the whole global costmap from Nav2 whenever the costmap mirror may be missing updates."""
+        if self.costmap_resync_future is not None:
+            age = self.get_clock().now() - self.costmap_resync_requested
+            if age.nanoseconds < self.COSTMAP_RESYNC_TIMEOUT * 1e9:
+                return
+            # Nav2 never answered, so drop the request and send a new one
+            self.get_logger().warn("Timed out waiting for the global costmap from Nav2")
+            self.cli_get_global_costmap.remove_pending_request(self.costmap_resync_future)
+            self.costmap_resync_future.cancel()
+            self.costmap_resync_future = None
+        if not self.costmap_mirror.needs_resync:
+            return
+        if not self.cli_get_global_costmap.service_is_ready():
+            return  # Nav2 isn't running (yet), try again later
+        self.costmap_resync_requested = self.get_clock().now()
+        self.costmap_resync_future = self.cli_get_global_costmap.call_async(GetCostmap.Request())
+        self.costmap_resync_future.add_done_callback(self.costmap_resync_done_callback)
+
+    def costmap_resync_done_callback(self, future: Future) -> None:
+        if future.cancelled():
+            return  # The request timed out (see costmap_resync_callback)
+        self.costmap_resync_future = None
+        response = future.result()
+        if response is None:
+            self.get_logger().warn("Failed to get the global costmap from Nav2")
+            return
+        self.costmap_mirror.handle_nav2_costmap(response.map)
+        self.get_logger().info("Resynced the global costmap with Nav2")
+
+    def skimmer_fill_callback(self, msg: SkimmerFill) -> None:
+        """This method is called whenever a skimmer fill estimate is received."""
+        self.skimmer_fill = msg
+        self.skimmer_fill_received = self.get_clock().now()
+
     def joystick_callback(self, msg: Joy) -> None:
         """This method is called whenever a joystick message is received."""
 
@@ -388,7 +503,7 @@ class MainControlNode(Node):
 
             # Check if the calibration button is pressed
             if msg.buttons[bindings.RIGHT_BUMPER] == 1 and buttons[bindings.RIGHT_BUMPER] == 0:
-                self.cli_drivetrain_calibrate.call_async(Stop.Request())
+                self.cli_drivetrain_calibrate.call_async(CalibrateDrivetrain.Request())
 
         # THE CONTROLS BELOW ALWAYS WORK #
 
@@ -0,0 +1,216 @@
+import array
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from rovr_control.costmap_2d import LETHAL_OBSTACLE, NO_INFORMATION, PyCostmap2D
+
+SIZE_X, SIZE_Y = 160, 80  # An 8 m x 4 m field at 0.05 m per cell
+RESOLUTION = 0.05
+ORIGIN = (-1.0, -2.0)
+
+
+def costmap_msg(data=None):
+    """A nav2_msgs/Costmap message with random costs (data is an array.array, like rclpy gives us)."""
+    if data is None:
+        rng = np.random.default_rng(0)
+        data = array.array("B", rng.integers(0, 254, size=SIZE_X * SIZE_Y, dtype=np.uint8).tobytes())
+    return SimpleNamespace(
+        header=SimpleNamespace(frame_id="map", stamp=None),
+        metadata=SimpleNamespace(
+            size_x=SIZE_X,
+            size_y=SIZE_Y,
+            resolution=RESOLUTION,
+            origin=SimpleNamespace(position=SimpleNamespace(x=ORIGIN[0], y=ORIGIN[1])),
+        ),
+        data=data,
+    )
+
+
+@pytest.fixture
+def msg():
+    return costmap_msg()
+
+
+@pytest.fixture
+def costmap(msg):
+    return PyCostmap2D(msg)
+
+
+def test_costmap_is_a_view_of_the_message(msg, costmap):
+    assert np.shares_memory(costmap.costmap, np.frombuffer(msg.data, dtype=np.uint8))
+    assert np.shares_memory(costmap.grid, costmap.costmap)
+    costmap.setCost(3, 2, 7)
+    assert msg.data[2 * SIZE_X + 3] == 7
+    assert costmap.grid[2, 3] == 7
+
+
+def test_lists_are_copied():
+    costmap = PyCostmap2D(costmap_msg(data=[5] * (SIZE_X * SIZE_Y)))
+    assert costmap.getCostXY(10, 10) == 5
+
+
+def test_world_to_map_array_matches_scalar(costmap):
+    rng = np.random.default_rng(1)
+    wx = rng.uniform(ORIGIN[0] - 1, ORIGIN[0] + SIZE_X * RESOLUTION + 1, size=500)
+    wy = rng.uniform(ORIGIN[1] - 1, ORIGIN[1] + SIZE_Y * RESOLUTION + 1, size=500)
+    mx, my, valid = costmap.worldToMapArray(wx, wy)
+    for index in range(len(wx)):
+        expected = costmap.worldToMapValidated(wx[index], wy[index])
+        if expected == (None, None):
+            assert not valid[index]
+        else:
+            assert valid[index]
+            assert (mx[index], my[index]) == expected
+
+
+def test_map_to_world_array_matches_scalar(costmap):
+    wx, wy = costmap.mapToWorldArray([0, 5, 159], [0, 79, 40])
+    for index, (mx, my) in enumerate([(0, 0), (5, 79), (159, 40)]):
+        assert (wx[index], wy[index]) == pytest.approx(costmap.mapToWorld(mx, my))
+
+
+def test_cost_arrays_match_scalar(costmap):
+    mx = np.array([0, 10, 159, -1, 160, 20])
+    my = np.array([0, 70, 79, 5, 5, 80])
+    costs, valid = costmap.getCostArrayXY(mx, my)
+    np.testing.assert_array_equal(valid, [True, True, True, False, False, False])
+    for index in range(3):
+        assert costs[index] == costmap.getCostXY(mx[index], my[index])
+    assert (costs[~valid] == NO_INFORMATION).all()
+
+    wx, wy = costmap.mapToWorldArray(mx[:3], my[:3])
+    world_costs, world_valid = costmap.getCostArrayWorld(wx, wy)
+    np.testing.assert_array_equal(world_costs, costs[:3])
+    assert world_valid.all()
+
+
+def test_window_is_a_clipped_view(costmap):
+    wx, wy = costmap.mapToWorld(50, 40)
+    window, mx, my = costmap.getWindow(wx, wy, 0.5, 0.25)
+    assert (mx, my) == (40, 35)
+    assert window.shape == (11, 21)
+    assert np.shares_memory(window, costmap.costmap)
+    np.testing.assert_array_equal(window, costmap.grid[35:46, 40:61])
+
+    window, mx, my = costmap.getWindow(*costmap.mapToWorld(0, 0), 0.5, 0.5)  # At the corner of the map
+    assert (mx, my) == (0, 0)
+    assert window.shape == (11, 11)
+
+
+def test_footprint_costs(costmap):
+    costmap.grid[:] = 0
+    costmap.grid[40, 100] = 200  # An obstacle
+    footprint = costmap.getRectangleFootprint(0.6, 0.3)
+    assert footprint.min(axis=0) == pytest.approx([-0.3, -0.15])
+    assert footprint.max(axis=0) == pytest.approx([0.3, 0.15])
+
+    obstacle_x, obstacle_y = costmap.mapToWorld(100, 40)
+    path_x = obstacle_x + np.array([0.0, 0.2, 0.0, -1.0])
+    path_y = obstacle_y + np.array([0.0, 0.0, 0.2, 0.0])
+    yaw = np.array([0.0, 0.0, 0.0, np.pi / 2])
+    costs = costmap.getFootprintCosts(path_x, path_y, yaw, footprint)
+    # Centered on it, still under the footprint, just beside the footprint, and far from it
+    np.testing.assert_array_equal(costs, [200, 200, 0, 0])
+
+    # Off the map
+    assert costmap.getFootprintCosts(ORIGIN[0], ORIGIN[1], 0.0, footprint) == NO_INFORMATION
+
+
+def naive_lane_costs(costmap, min_mx, max_mx, min_my, max_my, lane_cells):
+    """The highest cost of the lane starting at every column, one np.amax per lane (like getDigCost)."""
+    return [
+        int(np.amax(costmap.grid[min_my : max_my + 1, start : start + lane_cells]))
+        for start in range(min_mx, max_mx - lane_cells + 2)
+    ]
+
+
+def test_dig_sites_are_ranked_and_do_not_overlap(costmap):
+    zone = (1.0, 6.0, -1.5, 0.5)  # Columns 40 to 139, rows 10 to 49
+    sites = costmap.findDigSites(*zone, lane_width=0.5)
+    lane_costs = naive_lane_costs(costmap, 40, 139, 10, 49, 10)
+
+    assert [site.cost for site in sites] == sorted(site.cost for site in sites)
+    assert sites[0].cost == min(lane_costs)
+    centers = sorted(site.x for site in sites)
+    assert all(right - left >= 0.5 - 1e-9 for left, right in zip(centers, centers[1:]))
+    for site in sites:
+        start = int(round((site.x - 0.25 - ORIGIN[0]) / RESOLUTION))
+        assert site.cost == lane_costs[start - 40]
+        assert 1.0 <= site.x - 0.25 and site.x + 0.25 <= 6.0 + RESOLUTION
+
+
+def test_dig_sites_find_the_clear_lane(costmap):
+    costmap.grid[:] = 100
+    costmap.grid[10:50, 90:100] = 0  # A clear 0.5 m lane from x = 3.5 to 4.0
+    sites = costmap.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5)
+    assert sites[0] == (pytest.approx(3.75), 0)
+    assert all(site.cost == 100 for site in sites[1:])
+
+
+def test_dig_sites_outside_the_map(costmap):
+    assert costmap.findDigSites(10.0, 12.0, 0.0, 1.0, lane_width=0.5) == []
+    assert costmap.findDigSites(1.0, 1.2, 0.0, 1.0, lane_width=0.5) == []  # The zone is narrower than a lane
+
+
+def test_dig_sites_are_cached_per_costmap(msg, costmap):
+    sites = costmap.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5)
+    assert costmap.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5) == sites
+
+    # Another costmap with the same frame and timestamp (but different costs) doesn't share the results
+    other = PyCostmap2D(costmap_msg(data=[0] * (SIZE_X * SIZE_Y)))
+    assert all(site.cost == 0 for site in other.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5))
+    assert costmap.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5) == sites
+
+    # Changing a cost invalidates the results
+    mx = int(round((sites[0].x - ORIGIN[0]) / RESOLUTION))
+    costmap.setCost(mx, 20, LETHAL_OBSTACLE)
+    assert costmap.findDigSites(1.0, 6.0, -1.5, 0.5, lane_width=0.5) != sites
+
+
+def test_clearance_matches_brute_force(costmap):
+    lethal_my, lethal_mx = np.nonzero(costmap.grid >= 250)
+    clearance = costmap.getClearanceLayer(250)
+    rng = np.random.default_rng(2)
+    for mx, my in zip(rng.integers(0, SIZE_X, size=50), rng.integers(0, SIZE_Y, size=50)):
+        expected = np.hypot(lethal_mx - mx, lethal_my - my).min() * RESOLUTION
+        assert clearance[my, mx] == pytest.approx(expected)
+
+
+def test_clearance_without_lethal_cells(costmap):
+    costmap.grid[:] = 0
+    assert np.isinf(costmap.getClearanceLayer()).all()
+
+
+def test_clearance_is_cached_per_costmap(msg, costmap):
+    clearance = costmap.getClearanceLayer()
+    assert not clearance.flags.writeable
+    assert costmap.getClearanceLayer() is clearance
+
+    assert np.isinf(PyCostmap2D(costmap_msg(data=[0] * (SIZE_X * SIZE_Y))).getClearanceLayer()).all()
+
+    costmap.setCost(3, 2, LETHAL_OBSTACLE)
+    assert costmap.getClearanceLayer() is not clearance
+    assert costmap.getClearanceLayer()[2, 3] == 0.0
+
+
+def test_clearance_array_world(costmap):
+    costmap.grid[:] = 0
+    costmap.grid[40, 100] = LETHAL_OBSTACLE
+    obstacle_x, obstacle_y = costmap.mapToWorld(100, 40)
+    wx = [obstacle_x, obstacle_x + 0.5, obstacle_x + 0.3, ORIGIN[0] - 1.0]
+    wy = [obstacle_y, obstacle_y, obstacle_y + 0.4, 0.0]
+    clearance, valid = costmap.getClearanceArrayWorld(wx, wy)
+    np.testing.assert_array_equal(valid, [True, True, True, False])
+    assert clearance == pytest.approx([0.0, 0.5, 0.5, 0.0])
+
+
+def test_max_clearance_pose(costmap):
+    costmap.grid[:] = LETHAL_OBSTACLE
+    costmap.grid[20:41, 60:81] = 0  # A clear 1 m square centered on cell (70, 30)
+    pose = costmap.getMaxClearancePose(1.0, 4.0, -1.5, 0.5)
+    assert (pose.x, pose.y) == pytest.approx(costmap.mapToWorld(70, 30))
+    assert pose.clearance == pytest.approx(11 * RESOLUTION)
+
+    assert costmap.getMaxClearancePose(10.0, 12.0, 0.0, 1.0) is None  # Outside the map
@@ -0,0 +1,180 @@
+import array
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from rovr_control.costmap_2d import LETHAL_OBSTACLE, NO_INFORMATION
+from rovr_control.costmap_mirror import OCCUPANCY_TO_COST, CostmapMirror
+
+WIDTH, HEIGHT = 40, 20
+
+
+def header(sec, frame_id="map"):
+    return SimpleNamespace(frame_id=frame_id, stamp=SimpleNamespace(sec=sec, nanosec=0))
+
+
+def occupancy_grid(values, sec=1):
+    """A nav_msgs/OccupancyGrid message (data is an array.array of int8, like rclpy gives us)."""
+    return SimpleNamespace(
+        header=header(sec),
+        info=SimpleNamespace(
+            width=WIDTH,
+            height=HEIGHT,
+            resolution=0.1,
+            origin=SimpleNamespace(position=SimpleNamespace(x=-1.0, y=-2.0)),
+        ),
+        data=array.array("b", np.asarray(values, dtype=np.int8).ravel().tobytes()),
+    )
+
+
+def occupancy_grid_update(x, y, values, sec=2, frame_id="map"):
+    """A map_msgs/OccupancyGridUpdate message."""
+    values = np.asarray(values, dtype=np.int8)
+    return SimpleNamespace(
+        header=header(sec, frame_id),
+        x=x,
+        y=y,
+        width=values.shape[1],
+        height=values.shape[0],
+        data=array.array("b", values.ravel().tobytes()),
+    )
+
+
+def nav2_occupancy(cost):
+    """The cost translation of the Nav2 costmap publisher (nav2_msgs/Costmap cost -> OccupancyGrid value)."""
+    if cost == 0:
+        return 0
+    if cost == NO_INFORMATION:
+        return -1
+    if cost == LETHAL_OBSTACLE:
+        return 100
+    if cost == LETHAL_OBSTACLE - 1:
+        return 99
+    return 1 + (97 * (cost - 1)) // 251
+
+
+def test_occupancy_to_cost_inverts_the_nav2_translation():
+    for cost in range(256):
+        occupancy = nav2_occupancy(cost)
+        assert nav2_occupancy(int(OCCUPANCY_TO_COST[np.uint8(np.int8(occupancy))])) == occupancy
+    # Every value comes back as the highest cost Nav2 would translate to it
+    for occupancy in range(1, 99):
+        cost = int(OCCUPANCY_TO_COST[occupancy])
+        assert cost == LETHAL_OBSTACLE - 2 or nav2_occupancy(cost + 1) != occupancy
+
+
+def test_no_snapshot_before_the_first_costmap():
+    mirror = CostmapMirror()
+    assert mirror.snapshot() is None
+    assert not mirror.handle_update(occupancy_grid_update(0, 0, [[100]]))
+
+
+def test_snapshot_of_the_full_costmap():
+    mirror = CostmapMirror()
+    values = np.zeros((HEIGHT, WIDTH), dtype=np.int8)
+    values[5, 10] = 100
+    values[6, 11] = -1
+    mirror.handle_costmap(occupancy_grid(values))
+    snapshot = mirror.snapshot()
+    assert (snapshot.getSizeInCellsX(), snapshot.getSizeInCellsY()) == (WIDTH, HEIGHT)
+    assert (snapshot.getOriginX(), snapshot.getOriginY(), snapshot.getResolution()) == (-1.0, -2.0, 0.1)
+    assert snapshot.getCostXY(10, 5) == LETHAL_OBSTACLE
+    assert snapshot.getCostXY(11, 6) == NO_INFORMATION
+    assert snapshot.getCostXY(0, 0) == 0
+    assert mirror.snapshot() is snapshot  # Nothing changed, so nothing is copied
+
+
+def test_updates_are_patched_in_place():
+    mirror = CostmapMirror()
+    mirror.handle_costmap(occupancy_grid(np.zeros((HEIGHT, WIDTH))))
+    grid = mirror.grid
+    before = mirror.snapshot()
+
+    assert mirror.handle_update(occupancy_grid_update(30, 15, np.full((5, 10), 100)))
+    assert mirror.grid is grid
+    after = mirror.snapshot()
+    assert after.version == before.version + 1
+    assert after.getCostmapTimestamp().sec == 2
+    assert (after.grid[15:, 30:] == LETHAL_OBSTACLE).all()
+    assert after.grid[:15].max() == 0 and after.grid[:, :30].max() == 0
+    # Older snapshots don't change
+    assert before.grid.max() == 0
+
+
+def test_snapshots_are_read_only():
+    mirror = CostmapMirror()
+    mirror.handle_costmap(occupancy_grid(np.zeros((HEIGHT, WIDTH))))
+    with pytest.raises(ValueError):
+        mirror.snapshot().setCost(0, 0, 100)
+
+
+def test_invalid_updates_are_ignored():
+    mirror = CostmapMirror()
+    mirror.handle_costmap(occupancy_grid(np.zeros((HEIGHT, WIDTH))))
+    version = mirror.version
+    assert not mirror.handle_update(occupancy_grid_update(35, 0, np.full((2, 10), 100)))  # Past the edge
+    assert not mirror.handle_update(occupancy_grid_update(0, 0, [[100]], frame_id="odom"))
+    assert mirror.version == version
+    assert mirror.grid.max() == 0
+
+
+def test_snapshot_dig_sites_follow_updates():
+    mirror = CostmapMirror()
+    mirror.handle_costmap(occupancy_grid(np.zeros((HEIGHT, WIDTH))))
+    sites = mirror.snapshot().findDigSites(-1.0, 3.0, -2.0, 0.0, lane_width=1.0)
+    assert all(site.cost == 0 for site in sites)
+    # An obstacle appears without the timestamp changing (the version still does)
+    mirror.handle_update(occupancy_grid_update(0, 0, np.full((HEIGHT, 10), 100), sec=1))
+    sites = mirror.snapshot().findDigSites(-1.0, 3.0, -2.0, 0.0, lane_width=1.0)
+    assert sorted(site.cost for site in sites) == [0, 0, 0, LETHAL_OBSTACLE]
+
+
+def nav2_costmap(costs, sec=3):
+    """A nav2_msgs/Costmap message, like the get_costmap service (getGlobalCostmap()) returns."""
+    return SimpleNamespace(
+        header=header(sec),
+        metadata=SimpleNamespace(
+            size_x=WIDTH,
+            size_y=HEIGHT,
+            resolution=0.1,
+            origin=SimpleNamespace(position=SimpleNamespace(x=-1.0, y=-2.0)),
+        ),
+        data=array.array("B", np.asarray(costs, dtype=np.uint8).ravel().tobytes()),
+    )
+
+
+def test_resync_with_a_nav2_costmap():
+    mirror = CostmapMirror()
+    mirror.handle_costmap(occupancy_grid(np.zeros((HEIGHT, WIDTH))))
+    assert mirror.needs_resync  # The costmap may have been published long before this node started
+
+    costs = np.zeros((HEIGHT, WIDTH), dtype=np.uint8)
+    costs[5, 10] = 200
+    mirror.handle_nav2_costmap(nav2_costmap(costs))
+    assert not mirror.needs_resync
+    assert mirror.snapshot().getCostXY(10, 5) == 200  # The costs are not translated
+
+
+def test_older_messages_are_ignored_after_a_resync():
+    mirror = CostmapMirror()
+    mirror.handle_nav2_costmap(nav2_costmap(np.zeros((HEIGHT, WIDTH)), sec=3))
+    version = mirror.version
+    # The transient local messages published before the resync arrive late
+    mirror.handle_costmap(occupancy_grid(np.full((HEIGHT, WIDTH), 100), sec=1))
+    assert not mirror.handle_update(occupancy_grid_update(0, 0, [[100]], sec=2))
+    assert mirror.version == version
+    assert mirror.grid.max() == 0
+    assert not mirror.needs_resync
+
+    assert mirror.handle_update(occupancy_grid_update(0, 0, [[100]], sec=4))
+    assert mirror.grid[0, 0] == LETHAL_OBSTACLE
+
+
+def test_rejected_updates_need_a_resync():
+    mirror = CostmapMirror()
+    assert not mirror.handle_update(occupancy_grid_update(0, 0, [[100]]))  # Before any costmap
+    assert mirror.needs_resync
+    mirror.handle_nav2_costmap(nav2_costmap(np.zeros((HEIGHT, WIDTH))))
+    assert not mirror.handle_update(occupancy_grid_update(35, 0, np.full((2, 10), 100), sec=4))  # Past the edge
+    assert mirror.needs_resync
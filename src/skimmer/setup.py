@@ -24,6 +24,7 @@ setup(
         "console_scripts": [
             "skimmer_node = skimmer.skimmer_node:main",
             "ros_check_load = skimmer.ros_check_load:main",
+            "check_load_replay = skimmer.check_load_replay:main",
         ],
     },
 )
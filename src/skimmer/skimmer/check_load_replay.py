@@ -0,0 +1,105 @@
+# This script replays a depth recording (see depth_recording.py) through the analysis code of ros_check_load
+# as fast as possible, without ROS 2 or a camera. It reports how many frames per second the analysis keeps up with,
+# how long each stage of it takes, and how its readyDump decisions compare to the recording's labels.
+#
+# Run with: ros2 run skimmer check_load_replay <recording directory> [--timeline]
+
+import argparse
+import json
+import statistics
+import time
+from collections import namedtuple
+
+from skimmer.depth_recording import DepthRecording
+from skimmer.load_check import STAGES, LoadChecker
+
+# The result of analyzing one frame (ready is None until LoadChecker has enough frames, label is None if unlabelled)
+Decision = namedtuple("Decision", ["timestamp", "ready", "label", "fill_percentage"])
+
+
+def replay(recording: DepthRecording, checker: LoadChecker = None) -> tuple:
+    """Run every frame of a recording through a LoadChecker, back to back.
+
+    Returns (a report that can be saved as JSON, the Decision made for every frame).
+    """
+    if checker is None:
+        checker = LoadChecker()
+    stage_times = {stage: [] for stage in STAGES}
+    frame_times = []
+    timeline = []
+
+    start = time.perf_counter_ns()
+    for image, info in recording:
+        ready, fill = checker.check(image, info.skimmer_height)
+        for stage in STAGES:
+            stage_times[stage].append(checker.stage_times[stage])
+        frame_times.append(sum(checker.stage_times.values()))
+        timeline.append(Decision(info.timestamp, ready, info.ready, fill.percentage))
+    elapsed = (time.perf_counter_ns() - start) / 1e9
+
+    report = {
+        "frames": len(timeline),
+        "fps": len(timeline) / elapsed if elapsed > 0 else float("inf"),
+        "frame": latency_summary(frame_times),
+        "stages": {stage: latency_summary(times) for stage, times in stage_times.items()},
+        "decisions": score_decisions(timeline),
+    }
+    return report, timeline
+
+
+def latency_summary(times_ns: list) -> dict:
+    """Summarizes a list of latencies in nanoseconds (in microseconds)."""
+    times_us = [time_ns / 1000 for time_ns in times_ns]
+    if not times_us:
+        return {"median_us": None, "p99_us": None, "max_us": None}
+    return {
+        "median_us": statistics.median(times_us),
+        "p99_us": statistics.quantiles(times_us, n=100)[98] if len(times_us) > 1 else times_us[0],
+        "max_us": max(times_us),
+    }
+
+
+def score_decisions(timeline: list) -> dict:
+    """Compares the readyDump decisions of a timeline to its labels.
+
+    false_ready counts the frames decided ready while the skimmer was labelled not ready (it would offload too early),
+    and missed_ready the opposite. ready_delays are how long (in seconds) each labelled change from not ready to ready
+    took to be decided ready, or None if it never was.
+    """
+    scored = [decision for decision in timeline if decision.ready is not None and decision.label is not None]
+    false_ready = sum(1 for decision in scored if decision.ready and not decision.label)
+    missed_ready = sum(1 for decision in scored if not decision.ready and decision.label)
+
+    ready_delays = []
+    for index in range(1, len(timeline)):
+        if timeline[index].label and timeline[index - 1].label is False:
+            decided = next((decision for decision in timeline[index:] if decision.ready), None)
+            ready_delays.append(None if decided is None else decided.timestamp - timeline[index].timestamp)
+
+    return {
+        "labelled_frames": len(scored),
+        "accuracy": (len(scored) - false_ready - missed_ready) / len(scored) if scored else None,
+        "false_ready": false_ready,
+        "missed_ready": missed_ready,
+        "ready_delays": ready_delays,
+    }
+
+
+def main(args=None):
+    """The main function."""
+    parser = argparse.ArgumentParser(description="Replay a depth recording through the check_load analysis.")
+    parser.add_argument("recording", help="The recording directory (with depth.npy and frames.csv)")
+    parser.add_argument("--timeline", action="store_true", help="Also print the decision made for every frame")
+    parsed_args = parser.parse_args(args)
+
+    report, timeline = replay(DepthRecording(parsed_args.recording))
+    print(json.dumps(report, indent=2))
+    if parsed_args.timeline:
+        print(",".join(Decision._fields))
+        for decision in timeline:
+            print(",".join("" if value is None else str(value) for value in decision))
+
+
+# This code does NOT run if this file is imported as a module
+if __name__ == "__main__":
+    main()
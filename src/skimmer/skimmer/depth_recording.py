@@ -0,0 +1,93 @@
+# This module reads and writes recordings of the depth images analyzed by ros_check_load.
+#
+# A recording is a directory with two files:
+#   depth.npy: every depth frame in one (frames x height x width) array, memory-mapped when it is read
+#   frames.csv: one row per frame with its timestamp (in seconds), the skimmer height (in meters) and optionally
+#               whether the skimmer was ready to offload (the labelled ground truth, 1 or 0, empty if unlabelled)
+
+import csv
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+DEPTH_FILE = "depth.npy"
+FRAMES_FILE = "frames.csv"
+FRAMES_HEADER = ["timestamp", "skimmer_height", "ready"]
+
+# The encoding of the depth images with each type of pixels
+ENCODINGS = {np.dtype(np.uint16): "16UC1", np.dtype(np.float32): "32FC1"}
+
+# The information about a recorded frame (ready is None if the frame isn't labelled)
+FrameInfo = namedtuple("FrameInfo", ["timestamp", "skimmer_height", "ready"])
+# The fields of a sensor_msgs/Image message that ros_check_load reads
+RecordedImage = namedtuple("RecordedImage", ["encoding", "is_bigendian", "height", "width", "step", "data"])
+
+
+def save_recording(path, frames, infos: list) -> None:
+    """Save a recording of depth frames (any iterable of 2D arrays, with one FrameInfo per frame) to a directory.
+
+    The frames are written straight to the memory-mapped depth.npy, so they don't all have to fit in memory at once.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    depth = None
+    count = 0
+    for index, frame in enumerate(frames):
+        frame = np.asarray(frame)
+        if depth is None:
+            if frame.dtype not in ENCODINGS:
+                raise ValueError(f"Unsupported depth frame type: {frame.dtype}")
+            depth = np.lib.format.open_memmap(
+                path / DEPTH_FILE, mode="w+", dtype=frame.dtype, shape=(len(infos),) + frame.shape
+            )
+        depth[index] = frame
+        count += 1
+    if count != len(infos):
+        raise ValueError(f"Got {count} depth frames for {len(infos)} frame infos")
+    if depth is not None:
+        depth.flush()
+
+    with open(path / FRAMES_FILE, "w", newline="") as frames_file:
+        writer = csv.writer(frames_file)
+        writer.writerow(FRAMES_HEADER)
+        for info in infos:
+            writer.writerow([info.timestamp, info.skimmer_height, "" if info.ready is None else int(info.ready)])
+
+
+class DepthRecording:
+    """A recording of depth frames, read from disk only when each frame is used."""
+
+    def __init__(self, path):
+        path = Path(path)
+        self.depth = np.load(path / DEPTH_FILE, mmap_mode="r")
+        self.infos = []
+        with open(path / FRAMES_FILE, newline="") as frames_file:
+            for row in csv.DictReader(frames_file):
+                ready = None if row["ready"] == "" else bool(int(row["ready"]))
+                self.infos.append(FrameInfo(float(row["timestamp"]), float(row["skimmer_height"]), ready))
+        if len(self.infos) != len(self.depth):
+            raise ValueError(f"{path} has {len(self.depth)} depth frames but {len(self.infos)} frame infos")
+        if self.depth.dtype not in ENCODINGS:
+            raise ValueError(f"Unsupported depth frame type: {self.depth.dtype}")
+
+    def __len__(self) -> int:
+        return len(self.infos)
+
+    def image(self, index: int) -> RecordedImage:
+        """Returns a frame in the same format as a sensor_msgs/Image message (its data is a view of the file)."""
+        frame = self.depth[index]
+        return RecordedImage(
+            encoding=ENCODINGS[frame.dtype],
+            is_bigendian=int(sys.byteorder == "big"),  # Only native frames are supported
+            height=frame.shape[0],
+            width=frame.shape[1],
+            step=frame.strides[0],
+            data=memoryview(frame).cast("B"),
+        )
+
+    def __iter__(self):
+        """Yields the (RecordedImage, FrameInfo) of every frame in order."""
+        for index, info in enumerate(self.infos):
+            yield self.image(index), info
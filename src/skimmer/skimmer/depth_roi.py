@@ -0,0 +1,88 @@
+# This module finds the skimmer belt's region of interest (ROI) in the depth images used by ros_check_load.
+
+import functools
+import math
+
+import numpy as np
+
+CAMERA_FOV_X = 86  # Horizontal field of view of the RealSense depth camera (in degrees)
+CAMERA_FOV_Y = 57  # Vertical field of view of the RealSense depth camera (in degrees)
+HEIGHT_RESOLUTION = 0.005  # Skimmer heights are rounded to this (in meters), so that the ROI table stays small
+
+# Depth image encodings we can read (and the numpy type of their pixels)
+DEPTH_ENCODINGS = {"16UC1": np.uint16, "mono16": np.uint16, "32FC1": np.float32}
+# Meters per unit of the pixels of each depth image encoding (16 bit depth images are in millimeters)
+DEPTH_SCALES = {"16UC1": 0.001, "mono16": 0.001, "32FC1": 1.0}
+
+
+def roi_half_size(
+    skimmer_height: float,
+    img_width: int,
+    img_height: int,
+    skimmer_size_x: float,
+    skimmer_size_y: float,
+    skimmer_to_cam: float,
+) -> tuple:
+    """Returns half the (width, height) in pixels that the skimmer belt occupies in the depth image.
+
+    The results are memoized per HEIGHT_RESOLUTION step of the skimmer height, so the trigonometry only runs when the
+    skimmer moves to a new height.
+    """
+    height_steps = round(skimmer_height / HEIGHT_RESOLUTION)
+    return _roi_half_size(height_steps, img_width, img_height, skimmer_size_x, skimmer_size_y, skimmer_to_cam)
+
+
+@functools.lru_cache(maxsize=1024)
+def _roi_half_size(height_steps, img_width, img_height, skimmer_size_x, skimmer_size_y, skimmer_to_cam) -> tuple:
+    distance = height_steps * HEIGHT_RESOLUTION + skimmer_to_cam
+    # Find the degrees of vision occupied by the skimmer belt
+    perception_change_x = math.degrees(2 * math.atan((0.5 * skimmer_size_x) / distance))
+    perception_change_y = math.degrees(2 * math.atan((0.5 * skimmer_size_y) / distance))
+    # Compare the degrees of vision it would occupy to the FOV of the camera
+    percent_fov_x = min(perception_change_x / CAMERA_FOV_X, 1)
+    percent_fov_y = min(perception_change_y / CAMERA_FOV_Y, 1)
+    # Get the number of pixels that it's occupying (divided by 2 so it's a +- situation)
+    return int(img_width * percent_fov_x / 2), int((img_height * percent_fov_y) / 2)
+
+
+def crop_roi(depth: np.ndarray, half_x: int, half_y: int, padding: int = 0) -> tuple:
+    """Crop the centered ROI out of a depth image, with extra padding pixels around it (where the image has them).
+
+    Returns (padded crop, (row slice, column slice) of the ROI within the padded crop). The crop is a view, not a copy.
+    Filtering the padded crop gives the same ROI as filtering the whole image with a kernel of radius <= padding.
+    """
+    height, width = depth.shape[:2]
+    center_y, center_x = height // 2, width // 2
+    top, bottom = center_y - half_y, center_y + half_y
+    left, right = center_x - half_x, center_x + half_x
+    padded_top, padded_bottom = max(top - padding, 0), min(bottom + padding, height)
+    padded_left, padded_right = max(left - padding, 0), min(right + padding, width)
+    roi = (slice(top - padded_top, bottom - padded_top), slice(left - padded_left, right - padded_left))
+    return depth[padded_top:padded_bottom, padded_left:padded_right], roi
+
+
+def valid_depth_mean(depth: np.ndarray) -> float:
+    """Mean of the valid pixels of a depth image, or NaN if there are none.
+
+    Depth cameras report 0 (or NaN for floating point images) where they have no reading. Averaging those in would make
+    the skimmer look fuller than it is.
+    """
+    if depth.dtype.kind == "f":
+        depth = np.where(np.isfinite(depth), depth, 0)
+    count = np.count_nonzero(depth)
+    if count == 0:
+        return math.nan
+    return float(depth.sum(dtype=np.float64) / count)
+
+
+def depth_image_view(msg) -> np.ndarray:
+    """Returns the pixels of a sensor_msgs/Image depth image as a numpy array, without copying them."""
+    if msg.encoding not in DEPTH_ENCODINGS:
+        raise ValueError(f"Unsupported depth image encoding: {msg.encoding}")
+    dtype = np.dtype(DEPTH_ENCODINGS[msg.encoding]).newbyteorder(">" if msg.is_bigendian else "<")
+    # Rows may be padded (step can be larger than width * bytes per pixel)
+    rows = np.frombuffer(msg.data, dtype=np.uint8).reshape(msg.height, msg.step)
+    depth = rows[:, : msg.width * dtype.itemsize].view(dtype)
+    if not dtype.isnative:
+        depth = depth.astype(dtype.newbyteorder("="))  # OpenCV needs native byte order
+    return depth
@@ -0,0 +1,94 @@
+# This module estimates how much regolith is in the skimmer from the depth images used by ros_check_load.
+#
+# The depth camera looks straight down into the skimmer. Every depth pixel is back-projected with the camera
+# intrinsics, and its height above the empty skimmer's floor (at the current skimmer height) is the fill height there.
+
+import functools
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from skimmer.depth_roi import CAMERA_FOV_X, CAMERA_FOV_Y
+
+# Focal lengths and principal point of a pinhole camera (in pixels)
+CameraIntrinsics = namedtuple("CameraIntrinsics", ["fx", "fy", "cx", "cy"])
+# Estimated volume (in cubic meters), percentage of the skimmer's capacity, and fraction of valid depth readings
+FillEstimate = namedtuple("FillEstimate", ["volume", "percentage", "confidence"])
+
+
+def intrinsics_from_fov(
+    img_width: int, img_height: int, fov_x: float = CAMERA_FOV_X, fov_y: float = CAMERA_FOV_Y
+) -> CameraIntrinsics:
+    """Approximate intrinsics of a camera from its field of view (in degrees), for when no CameraInfo is available."""
+    return CameraIntrinsics(
+        fx=img_width / (2 * math.tan(math.radians(fov_x) / 2)),
+        fy=img_height / (2 * math.tan(math.radians(fov_y) / 2)),
+        cx=(img_width - 1) / 2,
+        cy=(img_height - 1) / 2,
+    )
+
+
+def intrinsics_from_camera_info(k) -> CameraIntrinsics:
+    """Intrinsics from the row-major 3x3 camera matrix (K) of a sensor_msgs/CameraInfo message."""
+    return CameraIntrinsics(fx=float(k[0]), fy=float(k[4]), cx=float(k[2]), cy=float(k[5]))
+
+
+@functools.lru_cache(maxsize=32)
+def _ray_slopes(intrinsics: CameraIntrinsics, img_width: int, img_height: int, decimation: int) -> tuple:
+    """Returns the x / z slopes of the rays through every decimated column, and the y / z slopes of every row."""
+    rows = np.arange(0, img_height, decimation, dtype=np.float32)
+    cols = np.arange(0, img_width, decimation, dtype=np.float32)
+    return (cols - intrinsics.cx) / intrinsics.fx, (rows - intrinsics.cy) / intrinsics.fy
+
+
+def estimate_fill(
+    depth: np.ndarray,
+    intrinsics: CameraIntrinsics,
+    top_distance: float,
+    skimmer_size_x: float,
+    skimmer_size_y: float,
+    skimmer_depth: float,
+    depth_scale: float = 0.001,
+    decimation: int = 4,
+) -> FillEstimate:
+    """Estimate how full the skimmer is from a depth image looking down into it.
+
+    top_distance is the distance from the camera to the top of the skimmer (in meters) and skimmer_depth is how deep
+    the skimmer is, so its empty floor is top_distance + skimmer_depth away. Depth pixels are multiplied by depth_scale
+    to get meters (0.001 for 16UC1 images), and only every decimation-th row and column is used.
+    Pixels are weighted by the floor area they cover (which grows with the square of their depth), and their mean fill
+    height is extrapolated over the whole skimmer, so missing readings lower the confidence instead of the volume.
+    """
+    img_height, img_width = depth.shape[:2]
+    slope_x, slope_y = _ray_slopes(intrinsics, img_width, img_height, decimation)
+
+    # Only the pixels whose rays pass through the top of the skimmer look into it
+    half_x = 0.5 * skimmer_size_x / top_distance
+    half_y = 0.5 * skimmer_size_y / top_distance
+    inside_x = np.abs(slope_x) <= half_x
+    inside_y = np.abs(slope_y) <= half_y
+    if not inside_x.any() or not inside_y.any():
+        return FillEstimate(math.nan, math.nan, 0.0)
+    cols = np.flatnonzero(inside_x)
+    rows = np.flatnonzero(inside_y)
+
+    # The rays inside the skimmer form a rectangle in the decimated grid, so this is a strided view of the image
+    samples = depth[
+        rows[0] * decimation : rows[-1] * decimation + 1 : decimation,
+        cols[0] * decimation : cols[-1] * decimation + 1 : decimation,
+    ]
+    distance = samples.astype(np.float32) * np.float32(depth_scale)
+    valid = np.isfinite(distance) & (distance > 0)
+    valid_count = np.count_nonzero(valid)
+    confidence = float(valid_count / valid.size)
+    if valid_count == 0:
+        return FillEstimate(math.nan, math.nan, 0.0)
+
+    distance = distance[valid]
+    fill_height = np.clip(top_distance + skimmer_depth - distance, 0.0, skimmer_depth)
+    area = distance * distance  # Proportional to the floor area each pixel covers
+    mean_fill_height = float(np.dot(fill_height, area) / area.sum(dtype=np.float64))
+
+    volume = mean_fill_height * skimmer_size_x * skimmer_size_y
+    return FillEstimate(volume, 100 * mean_fill_height / skimmer_depth, confidence)
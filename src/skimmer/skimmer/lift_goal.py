@@ -0,0 +1,78 @@
+# This module tracks the state of the skimmer lift's position goal (idle, moving, reached, or stalled).
+
+# Goal states (the same values as the constants in rovr_interfaces/msg/LiftGoalState.msg)
+IDLE = 0
+MOVING = 1
+REACHED = 2
+STALLED = 3
+
+
+class LiftGoalTracker:
+    """A state machine for a position goal of the lift.
+
+    set_goal() starts a move and cancel() ends it. While a move is active, every update() with a new lift position
+    checks whether the goal was reached (within goal_threshold degrees) or whether the lift stalled (it has not moved
+    more than stall_tolerance degrees for stall_timeout seconds). A stalled lift goes back to moving if it starts
+    making progress again. Every method returns True if the state changed.
+    """
+
+    def __init__(self, goal_threshold: float, stall_timeout: float, stall_tolerance: float):
+        self.goal_threshold = goal_threshold
+        self.stall_timeout = stall_timeout
+        self.stall_tolerance = stall_tolerance
+
+        self.state = IDLE
+        self.goal = None  # in degrees
+        self.position = None  # Latest lift position (in degrees)
+        # Where and when the lift last made progress (for stall detection)
+        self.progress_position = None
+        self.progress_time = None
+
+    @property
+    def active(self) -> bool:
+        """Whether a move is in progress (so that new lift positions need to be checked)."""
+        return self.state in (MOVING, STALLED)
+
+    def set_goal(self, goal: float, now: float) -> bool:
+        """Start moving to a new goal position (in degrees). now is the current time in seconds."""
+        self.goal = goal
+        self.progress_position = self.position
+        self.progress_time = now
+        if self.position is not None and abs(goal - self.position) <= self.goal_threshold:
+            self._transition(REACHED)
+        else:
+            self._transition(MOVING)
+        return True  # The goal itself changed
+
+    def cancel(self) -> bool:
+        """Abandon the current goal (e.g. when the lift is stopped or driven manually)."""
+        return self._transition(IDLE)
+
+    def stop(self) -> bool:
+        """The lift was stopped (e.g. by a limit switch), so the goal is either reached or can't be reached."""
+        if not self.active:
+            return False
+        if self.position is not None and abs(self.goal - self.position) <= self.goal_threshold:
+            return self._transition(REACHED)
+        return self._transition(STALLED)
+
+    def update(self, position: float, now: float) -> bool:
+        """Check a new lift position (in degrees) measured at time now (in seconds)."""
+        self.position = position
+        if not self.active:
+            return False
+
+        if abs(self.goal - position) <= self.goal_threshold:
+            return self._transition(REACHED)
+        if self.progress_position is None or abs(position - self.progress_position) > self.stall_tolerance:
+            self.progress_position = position
+            self.progress_time = now
+            return self._transition(MOVING)
+        if now - self.progress_time > self.stall_timeout:
+            return self._transition(STALLED)
+        return False
+
+    def _transition(self, state: int) -> bool:
+        changed = state != self.state
+        self.state = state
+        return changed
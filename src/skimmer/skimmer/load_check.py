@@ -0,0 +1,88 @@
+# This module contains the per-frame depth image analysis of ros_check_load.
+
+import time
+
+import cv2
+
+from skimmer.depth_roi import DEPTH_SCALES, roi_half_size, crop_roi, valid_depth_mean, depth_image_view
+from skimmer.fill_estimator import estimate_fill, intrinsics_from_fov
+
+# TODO: NEED TO UPDATE SKIMMER SIZE, DISTANCE, DISTANCE THRESHOLD
+# TODO: Should probably update consecutive cycles
+
+SKIMMERSIZEY = 0.7112  # width of the skimmer in meters
+SKIMMERSIZEX = 0.623  # length of the skimmer in meters
+SKIMMERTOCAM = 0.3  # distance from camera to top of skimmer in meters.
+SKIMMERDEPTH = 0.2  # depth of the skimmer (from its top to its floor) in meters
+DISTANCETHRESH = 200  # how small should the distance between top and skimmer be before offload (in meters)?
+CONSECUTIVECYCLES = 4  # Make sure the reading is consistent
+BLURKERNEL = 5  # Size of the Gaussian blur kernel used to denoise the depth image (in pixels)
+FILLDECIMATION = 4  # Only every FILLDECIMATION-th row and column of the depth image is used to estimate the fill
+
+# The stages of LoadChecker.check(), in the order they run
+STAGES = ["conversion", "crop", "blur", "reduction", "fill"]
+
+
+class LoadChecker:
+    """Decides whether the skimmer is ready to offload (and how full it is) from a stream of depth images.
+
+    intrinsics are the depth camera's intrinsics (estimated from its FOV if None).
+    Every call to check() records how long each of its STAGES took (in nanoseconds) in stage_times.
+    """
+
+    def __init__(self, intrinsics=None):
+        self.intrinsics = intrinsics
+        self.prior_checks = []
+        self.stage_times = dict.fromkeys(STAGES, 0)
+
+    def check(self, image, skimmer_height: float) -> tuple:
+        """Analyze a sensor_msgs/Image depth image taken at the given skimmer height (in meters).
+
+        Returns (whether the skimmer is ready to offload, or None until CONSECUTIVECYCLES images were checked,
+        FillEstimate of the image).
+        """
+        start = time.perf_counter_ns()
+        # View the pixels of the image message in place (without cv_bridge copying them)
+        depth = depth_image_view(image)
+        converted = time.perf_counter_ns()
+
+        # find the number of pixels occupied by the skimmer belt (memoized per skimmer height)
+        change_x, change_y = roi_half_size(
+            skimmer_height, image.width, image.height, SKIMMERSIZEX, SKIMMERSIZEY, SKIMMERTOCAM
+        )
+        # Only blur the skimmer ROI (padded by the kernel radius, so the result is the same as blurring everything)
+        padded_img, roi = crop_roi(depth, change_x, change_y, padding=BLURKERNEL // 2)
+        cropped = time.perf_counter_ns()
+
+        denoised_image = cv2.GaussianBlur(padded_img, (BLURKERNEL, BLURKERNEL), 0)
+        blurred = time.perf_counter_ns()
+
+        # Pixels without a depth reading are ignored (a NaN mean is never ready to dump)
+        self.prior_checks.append(bool(valid_depth_mean(denoised_image[roi]) <= DISTANCETHRESH + skimmer_height))
+        ready = None
+        if len(self.prior_checks) >= CONSECUTIVECYCLES:
+            self.prior_checks.pop(0)
+            ready = False not in self.prior_checks
+        reduced = time.perf_counter_ns()
+
+        intrinsics = self.intrinsics
+        if intrinsics is None:
+            intrinsics = intrinsics_from_fov(image.width, image.height)
+        fill = estimate_fill(
+            depth,
+            intrinsics,
+            skimmer_height + SKIMMERTOCAM,
+            SKIMMERSIZEX,
+            SKIMMERSIZEY,
+            SKIMMERDEPTH,
+            depth_scale=DEPTH_SCALES[image.encoding],
+            decimation=FILLDECIMATION,
+        )
+        done = time.perf_counter_ns()
+
+        self.stage_times["conversion"] = converted - start
+        self.stage_times["crop"] = cropped - converted
+        self.stage_times["blur"] = blurred - cropped
+        self.stage_times["reduction"] = reduced - blurred
+        self.stage_times["fill"] = done - reduced
+        return ready, fill
@@ -1,111 +1,135 @@
+import threading
+import time
+
 import rclpy
 from rclpy.node import Node
 from std_msgs.msg import Bool, Float32
-from sensor_msgs.msg import Image
-import cv2
-from cv_bridge import CvBridge
-import math
+from sensor_msgs.msg import CameraInfo, Image
+
+from rovr_interfaces.msg import SkimmerFill
+
+from skimmer.fill_estimator import intrinsics_from_camera_info
+from skimmer.load_check import LoadChecker
 
 # NOTE: We decided not to use this node for 2024 as we didn't have the time to test it.
 
-# TODO: NEED TO UPDATE SKIMMER SIZE, DISTANCE, DISTANCE THRESHOLD
-# TODO: Should probably update pollrate/ consecutive cycles
+# TODO: Should probably update pollrate (the skimmer dimensions are in load_check.py)
 # TODO: make sure hte topic names are all correct
 
-SKIMMERSIZEY = 0.7112  # width of the skimmer in meters
-SKIMMERSIZEX = 0.623  # length of the skimmer in meters
-SKIMMERTOCAM = 0.3  # distance from camera to top of skimmer in meters.
-DISTANCETHRESH = 200  # how small should the distance between top and skimmer be before offload (in meters)?
 POLLRATE = 0.2  # Wait time between each distance check (in seconds)
-CONSECUTIVECYCLES = 4  # Make sure the reading is consistent
 skimmer_height_topic = "/skimmer/height"  # should be meters (displacement from the skimmer starting position)
 
 
 class ros_check_load(Node):
     def __init__(self):
         self.skimmer_height = 0.5
-        self.img_height = 640
         self.errorCount = 0
-        self.img_width = 848
+        # Analyzes the depth images (estimates the camera's intrinsics from its FOV until CameraInfo is received)
+        self.load_checker = LoadChecker()
         super().__init__("check_load")
-        self.bridge = CvBridge()
+
+        # Define default values for our ROS parameters below #
+        self.declare_parameter("PROCESS_IN_WORKER_THREAD", True)
+        # Assign the ROS Parameters to member variables below #
+        self.PROCESS_IN_WORKER_THREAD = self.get_parameter("PROCESS_IN_WORKER_THREAD").value
+        # Print the ROS Parameters to the terminal below #
+        self.get_logger().info("PROCESS_IN_WORKER_THREAD has been set to: " + str(self.PROCESS_IN_WORKER_THREAD))
+
         self.pub = self.create_publisher(Bool, "readyDump", 10)
-        self.prior_checks = []
+        # How long each analyzed frame took from being received to being analyzed (in seconds)
+        self.latency_pub = self.create_publisher(Float32, "check_load/latency", 10)
+        self.fill_pub = self.create_publisher(SkimmerFill, "skimmer/fill", 10)
         # The launch file should remap so the realsense publishes to this topic
         depth_image_topic = "/skimmer/camera/depth/image_rect_raw"
         self.getSkimmerHeight = self.create_subscription(Float32, skimmer_height_topic, self.setHeight, 10)
-        self.oneTimeSub = self.create_subscription(Image, depth_image_topic, self.setParamCallback, 10)
         self.subscriber = self.create_subscription(Image, depth_image_topic, self.depth_image_callback, 10)
+        self.cameraInfoSub = self.create_subscription(
+            CameraInfo, "/skimmer/camera/depth/camera_info", self.cameraInfoCallback, 10
+        )
         self.timer = self.create_timer(POLLRATE, self.publish_distance)
+        # The latest depth Image message and when it was received (it is only converted if the timer uses it)
         self.depth_image = None
+        self.depth_image_lock = threading.Lock()
+
+        # The worker thread analyzes the frame handed to it by the timer (newer frames replace one it hasn't started)
+        self.worker_frame = None
+        self.worker_stopped = False
+        self.worker_condition = threading.Condition()
+        self.worker_thread = None
+        if self.PROCESS_IN_WORKER_THREAD:
+            self.worker_thread = threading.Thread(target=self.worker_loop, daemon=True)
+            self.worker_thread.start()
 
     def setHeight(self, msg):
         """Sets the height of the skimmer belt to a variable."""
         self.skimmer_height = msg.data
 
-    def setParamCallback(self, msg):
-        """Sets the image height and width parameters for the camera.
+    def cameraInfoCallback(self, msg):
+        """Sets the intrinsics of the depth camera.
         One time callback, kills itself after it's done."""
-        self.img_height = msg.height
-        self.img_width = msg.width
-        self.destroy_subscription(self.oneTimeSub)
+        self.load_checker.intrinsics = intrinsics_from_camera_info(msg.k)
+        self.destroy_subscription(self.cameraInfoSub)
 
     def depth_image_callback(self, msg):
-        """Callback for the depth image. Sets the depth image to the class variable, as a cv2 image."""
-        self.depth_image = self.bridge.imgmsg_to_cv2(msg, msg.encoding)
+        """Callback for the depth image. Stores a reference to the latest depth image message (older ones are dropped).
+        The camera publishes much faster than POLLRATE, so the pixels are only read for the frames that get analyzed."""
+        with self.depth_image_lock:
+            self.depth_image = (msg, time.monotonic())
 
     def publish_distance(self):
-        """does the actual math to determine if the skimmer is ready to offload.
-        Publishes a bool to the readyDump topic. Called every POLLRATE seconds.
-        Will kill the node after 5 seconds of not receiving a depth image / throwing consecutive errors."""
-        if self.depth_image is None:
+        """Hands the latest depth image to the worker thread (or analyzes it right away). Called every POLLRATE seconds.
+        Will kill the node if no new depth image was received since the last call."""
+        with self.depth_image_lock:
+            frame, self.depth_image = self.depth_image, None
+        if frame is None:
             self.get_logger().fatal("Camera not working")
             self.get_logger().fatal("Killing check_load node")
             self.destroy_node()
             return
 
-        """Cropping the image"""
-        depth = self.depth_image
+        if self.PROCESS_IN_WORKER_THREAD:
+            with self.worker_condition:
+                self.worker_frame = frame  # Replaces a frame the worker hasn't started on (it is stale now)
+                self.worker_condition.notify()
+        else:
+            self.analyze_depth_image(*frame)
+
+    def worker_loop(self):
+        """Analyzes the frames handed over by publish_distance until the node is destroyed."""
+        while True:
+            with self.worker_condition:
+                while self.worker_frame is None and not self.worker_stopped:
+                    self.worker_condition.wait()
+                if self.worker_stopped:
+                    return
+                frame, self.worker_frame = self.worker_frame, None
+            try:
+                self.analyze_depth_image(*frame)
+            except Exception as error:  # Don't let a bad frame (or an OpenCV error) kill the worker thread
+                self.get_logger().error(f"Failed to analyze a depth image: {error!r}")
+
+    def destroy_node(self):
+        """Stops the worker thread before destroying the node."""
+        with self.worker_condition:
+            self.worker_stopped = True
+            self.worker_condition.notify()
+        if self.worker_thread is not None and self.worker_thread is not threading.current_thread():
+            self.worker_thread.join()
+        return super().destroy_node()
+
+    def analyze_depth_image(self, image, received_time):
+        """does the actual math to determine if the skimmer is ready to offload (see load_check.py).
+        Publishes a bool to the readyDump topic, the fill estimate, and how long it took since it was received."""
+        ready, fill = self.load_checker.check(image, self.skimmer_height)
+        if ready is not None:
+            self.errorCount = 0
+            self.pub.publish(Bool(data=ready))
 
-        # find the degrees of vision occupied by the skimmer belt
-        perceptionChangeX = (2 * (math.atan((0.5 * SKIMMERSIZEX) / (self.skimmer_height + SKIMMERTOCAM)))) * (
-            180 / math.pi
-        )
-        perceptionChangeY = (2 * (math.atan((0.5 * SKIMMERSIZEY) / (self.skimmer_height + SKIMMERTOCAM)))) * (
-            180 / math.pi
+        self.fill_pub.publish(
+            SkimmerFill(header=image.header, volume=fill.volume, percentage=fill.percentage, confidence=fill.confidence)
         )
 
-        percentFOVx = min(perceptionChangeX / 86, 1)
-        # compare the degrees of vision it would occupy to the FOV of the realsense
-        percentFOVy = min(perceptionChangeY / 57, 1)
-
-        change_x = int(
-            self.img_width * percentFOVx / 2
-        )  # get the number of pixels that it's occupying. divide by 2 so it's a +- situation
-        change_y = int((self.img_height * percentFOVy) / 2)
-
-        center_x, center_y = self.img_width // 2, self.img_height // 2
-        denoised_image = cv2.GaussianBlur(depth, (5, 5), 0)
-        resized_img = denoised_image[
-            center_y - change_y : center_y + change_y, center_x - change_x : center_x + change_x
-        ]
-
-        """Analyzing image, posting to topic"""
-        if resized_img.mean() <= DISTANCETHRESH + self.skimmer_height:
-            self.prior_checks.append(True)
-        else:
-            self.prior_checks.append(False)
-
-        if len(self.prior_checks) >= CONSECUTIVECYCLES:
-            self.prior_checks.pop(0)
-            msg = Bool()
-            if False not in self.prior_checks:
-                msg.data = True
-            else:
-                msg.data = False
-            self.errorCount = 0
-            self.pub.publish(msg)
-            self.depth_image = None
+        self.latency_pub.publish(Float32(data=time.monotonic() - received_time))
 
 
 def main(args=None):
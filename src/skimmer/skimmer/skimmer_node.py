@@ -5,15 +5,20 @@
 
 # Import the ROS 2 Python module
 import rclpy
+from rclpy.action import ActionServer, CancelResponse
+from rclpy.action.server import ServerGoalHandle
 from rclpy.node import Node
-
-# Import ROS 2 formatted message types
-from std_msgs.msg import Bool
+from rclpy.qos import QoSProfile, DurabilityPolicy
+from rclpy.task import Future
 
 # Import custom ROS 2 interfaces
-from rovr_interfaces.srv import MotorCommandSet, MotorCommandGet
+from rovr_interfaces.srv import MotorCommandSet
 from rovr_interfaces.srv import SetPower, Stop, SetPosition
-from rovr_interfaces.msg import LimitSwitches
+from rovr_interfaces.action import MoveLift
+from rovr_interfaces.msg import LimitSwitches, LiftGoalState, MotorTelemetry
+
+# Import our lift goal state machine
+from skimmer.lift_goal import LiftGoalTracker
 
 
 class SkimmerNode(Node):
@@ -23,7 +28,6 @@ class SkimmerNode(Node):
 
         # Define service clients here
         self.cli_motor_set = self.create_client(MotorCommandSet, "motor/set")
-        self.cli_motor_get = self.create_client(MotorCommandGet, "motor/get")
 
         # Define services (methods callable from the outside) here
         self.srv_toggle = self.create_service(SetPower, "skimmer/toggle", self.toggle_callback)
@@ -34,26 +38,40 @@ class SkimmerNode(Node):
         self.srv_lift_set_power = self.create_service(SetPower, "lift/setPower", self.lift_set_power_callback)
         self.srv_zero_lift = self.create_service(Stop, "lift/zero", self.zero_lift_callback)
 
+        # Define action servers here
+        self.act_move_lift = ActionServer(
+            self, MoveLift, "lift/move", self.move_lift_callback, cancel_callback=self.move_lift_cancel_callback
+        )
+
         # Define publishers here
-        self.publisher_goal_reached = self.create_publisher(Bool, "skimmer/goal_reached", 10)
+        # The goal state is only published when it changes, so it is latched for subscribers that join late
+        self.publisher_goal_state = self.create_publisher(
+            LiftGoalState, "skimmer/goal_state", QoSProfile(depth=1, durability=DurabilityPolicy.TRANSIENT_LOCAL)
+        )
 
         # Define subscribers here
         self.limit_switch_sub = self.create_subscription(LimitSwitches, "limitSwitches", self.limit_switch_callback, 10)
-
-        # Define timers here
-        self.timer = self.create_timer(0.1, self.timer_callback)
+        self.motor_telemetry_sub = self.create_subscription(
+            MotorTelemetry, "motor/telemetry", self.motor_telemetry_callback, 10
+        )
 
         # Define default values for our ROS parameters below #
         self.declare_parameter("SKIMMER_BELT_MOTOR", 2)
         self.declare_parameter("SKIMMER_LIFT_MOTOR", 1)
+        self.declare_parameter("LIFT_STALL_TIMEOUT", 1.0)  # in seconds
+        self.declare_parameter("LIFT_STALL_TOLERANCE", 20.0)  # in degrees of the motor
 
         # Assign the ROS Parameters to member variables below #
         self.SKIMMER_BELT_MOTOR = self.get_parameter("SKIMMER_BELT_MOTOR").value
         self.SKIMMER_LIFT_MOTOR = self.get_parameter("SKIMMER_LIFT_MOTOR").value
+        self.LIFT_STALL_TIMEOUT = self.get_parameter("LIFT_STALL_TIMEOUT").value
+        self.LIFT_STALL_TOLERANCE = self.get_parameter("LIFT_STALL_TOLERANCE").value
 
         # Print the ROS Parameters to the terminal below #
         self.get_logger().info("SKIMMER_BELT_MOTOR has been set to: " + str(self.SKIMMER_BELT_MOTOR))
         self.get_logger().info("SKIMMER_LIFT_MOTOR has been set to: " + str(self.SKIMMER_LIFT_MOTOR))
+        self.get_logger().info("LIFT_STALL_TIMEOUT has been set to: " + str(self.LIFT_STALL_TIMEOUT))
+        self.get_logger().info("LIFT_STALL_TOLERANCE has been set to: " + str(self.LIFT_STALL_TOLERANCE))
 
         self.lift_encoder_offset = 0  # measured in degrees
 
@@ -63,10 +81,17 @@ class SkimmerNode(Node):
         self.current_goal_position = 0
         # Current position of the lift motor in degrees
         self.current_position_degrees = 0  # Relative encoders always initialize to 0
+        # Lift positions older than this are ignored (the same threshold motor_control_node uses for motor/get)
+        self.max_telemetry_age = 1.0  # in seconds
         # Goal Threshold
         # if abs(self.current_goal_position - ACTUAL VALUE) <= self.goal_threshold,
-        # then we should publish True to /skimmer/goal_reached
+        # then the goal has been reached
         self.goal_threshold = 320  # in degrees of the motor # TODO: Tune this threshold if needed
+        # State of the current lift goal (published on /skimmer/goal_state whenever it changes)
+        self.lift_goal = LiftGoalTracker(self.goal_threshold, self.LIFT_STALL_TIMEOUT, self.LIFT_STALL_TOLERANCE)
+        # The lift/move action goal in progress (if any), and a future that is done when its move is over
+        self.move_lift_goal_handle = None
+        self.move_lift_done = Future()
         # Current state of the lift system
         self.lift_running = False
 
@@ -101,9 +126,32 @@ class SkimmerNode(Node):
         else:
             self.set_power(skimmer_belt_power)
 
+    def now(self) -> float:
+        """Returns the current ROS time in seconds."""
+        return self.get_clock().now().nanoseconds / 1e9
+
+    def publish_goal_state(self) -> None:
+        """This method publishes the state of the current lift goal."""
+        msg = LiftGoalState(state=self.lift_goal.state, goal_position=float(self.current_goal_position))
+        if self.lift_goal.position is not None:
+            msg.position = float(self.lift_goal.position)
+        self.publisher_goal_state.publish(msg)
+        if self.lift_goal.state == LiftGoalState.STALLED:
+            self.get_logger().warn(f"The lift stalled at {msg.position} degrees (goal: {msg.goal_position} degrees)")
+        if self.lift_goal.state != LiftGoalState.MOVING and not self.move_lift_done.done():
+            self.move_lift_done.set_result(self.lift_goal.state)  # Wake up the lift/move action
+
+    def finish_move_lift(self) -> None:
+        """This method ends the lift/move action in progress (if any) because the lift was given a new goal."""
+        if not self.move_lift_done.done():
+            self.move_lift_done.set_result(None)
+
     def set_position(self, position: int) -> None:
         """This method sets the position (in degrees) of the skimmer."""
+        self.finish_move_lift()
         self.current_goal_position = position  # goal position should be in degrees
+        if self.lift_goal.set_goal(position, self.now()):
+            self.publish_goal_state()
         self.cli_motor_set.call_async(
             MotorCommandSet.Request(
                 type="position",
@@ -112,9 +160,11 @@ class SkimmerNode(Node):
             )
         )
 
-    def stop_lift(self) -> None:
-        """This method stops the lift."""
+    def stop_lift(self, cancel_goal: bool = True) -> None:
+        """This method stops the lift (and abandons the current position goal, unless cancel_goal is False)."""
         self.lift_running = False
+        if cancel_goal and self.lift_goal.cancel():
+            self.publish_goal_state()
         self.cli_motor_set.call_async(
             MotorCommandSet.Request(type="duty_cycle", can_id=self.SKIMMER_LIFT_MOTOR, value=0.0)
         )
@@ -122,6 +172,8 @@ class SkimmerNode(Node):
     def lift_set_power(self, power: float) -> None:
         """This method sets power to the lift system."""
         self.lift_running = True
+        if self.lift_goal.cancel():  # Manual control overrides the position goal
+            self.publish_goal_state()
         if power > 0 and self.top_limit_pressed:
             self.get_logger().warn("WARNING: Top limit switch pressed!")
             self.stop_lift()  # Stop the lift system
@@ -181,28 +233,64 @@ class SkimmerNode(Node):
         response.success = 0  # indicates success
         return response
 
-    # Define timer callback methods here
-    def timer_callback(self):
-        """Publishes whether or not the current goal position has been reached."""
-        # This service call will return a future object, that will eventually contain the position in degrees
-        future = self.cli_motor_get.call_async(MotorCommandGet.Request(type="position", can_id=self.SKIMMER_LIFT_MOTOR))
-        future.add_done_callback(self.done_callback)
-
-    def done_callback(self, future):
-        self.current_position_degrees = future.result().data
-        goal_reached_msg = Bool(
-            data=abs(self.current_goal_position + self.lift_encoder_offset - self.current_position_degrees)
-            <= self.goal_threshold
-        )
-        self.publisher_goal_reached.publish(goal_reached_msg)
+    # Define action callback methods here
+    async def move_lift_callback(self, goal_handle: ServerGoalHandle):
+        """This action moves the lift to a position, with feedback until it gets there (or stalls)."""
+        self.set_position(goal_handle.request.position)
+        self.move_lift_goal_handle = goal_handle
+        self.move_lift_done = Future()
+        if not self.lift_goal.active:
+            self.move_lift_done.set_result(self.lift_goal.state)  # The lift is already there
+        final_state = await self.move_lift_done
+        if self.move_lift_goal_handle is goal_handle:
+            self.move_lift_goal_handle = None
+
+        result = MoveLift.Result(position=float(self.current_position_degrees - self.lift_encoder_offset))
+        if goal_handle.is_cancel_requested:
+            goal_handle.canceled()
+        elif final_state == LiftGoalState.REACHED:
+            goal_handle.succeed()
+        else:
+            self.get_logger().warn("The lift/move action was aborted")
+            goal_handle.abort()  # The lift stalled, was stopped, or was given a new goal
+        return result
+
+    def move_lift_cancel_callback(self, cancel_request):
+        """This method stops the lift when the lift/move action is canceled."""
+        self.stop_lift()
+        return CancelResponse.ACCEPT
 
     # Define subscriber callback methods here
+    def motor_telemetry_callback(self, msg: MotorTelemetry) -> None:
+        """Updates the lift position, and the lift goal state while a move is in progress."""
+        if self.SKIMMER_LIFT_MOTOR not in msg.can_id:
+            return
+        index = list(msg.can_id).index(self.SKIMMER_LIFT_MOTOR)
+        if msg.age[index] > self.max_telemetry_age:
+            return  # The lift position is too stale
+        self.current_position_degrees = msg.position[index]
+        # Every telemetry sample is checked while the lift is moving, and the state is only published when it changes
+        position = self.current_position_degrees - self.lift_encoder_offset
+        if self.lift_goal.update(position, self.now()):
+            self.publish_goal_state()
+        if self.move_lift_goal_handle is not None and self.lift_goal.active:
+            self.move_lift_goal_handle.publish_feedback(
+                MoveLift.Feedback(
+                    position=float(position),
+                    distance_remaining=float(abs(self.lift_goal.goal - position)),
+                    time_remaining=float(msg.time_remaining[index]),
+                )
+            )
+
     def limit_switch_callback(self, limit_switches_msg):
         """This subscriber callback method is called whenever a message is received on the limitSwitches topic."""
-        if not self.top_limit_pressed and limit_switches_msg.top_limit_switch:
-            self.stop_lift()  # Stop the lift system
-        if not self.bottom_limit_pressed and limit_switches_msg.bottom_limit_switch:
-            self.stop_lift()  # Stop the lift system
+        if (not self.top_limit_pressed and limit_switches_msg.top_limit_switch) or (
+            not self.bottom_limit_pressed and limit_switches_msg.bottom_limit_switch
+        ):
+            # The lift can't move any further, so the current goal has either been reached or it never will be
+            if self.lift_goal.stop():
+                self.publish_goal_state()
+            self.stop_lift(cancel_goal=False)  # Stop the lift system
         self.top_limit_pressed = limit_switches_msg.top_limit_switch
         self.bottom_limit_pressed = limit_switches_msg.bottom_limit_switch
         if self.top_limit_pressed:  # If the top limit switch is pressed
@@ -0,0 +1,128 @@
+# Benchmarks and regression tests for the depth image analysis of ros_check_load.
+# Depth recordings are replayed through LoadChecker (see check_load_replay.py), so no camera or ROS 2 is needed.
+#
+# Run with: python3 -m pytest -s test/test_check_load_benchmark.py
+# Set CHECK_LOAD_RECORDING=<directory> to also replay a real recording (its labels are reported, not asserted).
+# Set CHECK_LOAD_BENCHMARK_RESULTS=<file.json> to save the results of a run, and
+# CHECK_LOAD_BENCHMARK_BASELINE=<file.json> to fail if the analysis got much slower than a previously saved run.
+# Set CHECK_LOAD_BENCHMARK_FPS=1 to fail if the analysis can't keep up with the camera (off by default, since the
+# frame rate depends on the machine running the tests).
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+from skimmer import check_load_replay  # noqa: E402
+from skimmer.depth_recording import DepthRecording, FrameInfo, save_recording  # noqa: E402
+from skimmer.load_check import CONSECUTIVECYCLES, DISTANCETHRESH, STAGES  # noqa: E402
+
+BASELINE_TOLERANCE = 1.5  # How many times slower than the baseline a frame may get before failing
+CAMERA_FPS = 30.0  # The frame rate of the RealSense depth stream
+WIDTH, HEIGHT = 848, 480
+SKIMMER_HEIGHT = 0.5
+
+# Recording name -> report, saved to CHECK_LOAD_BENCHMARK_RESULTS at the end of the run
+RESULTS = {}
+
+
+def filling_frames(count):
+    """Depth frames of the skimmer filling up at a constant rate, with sensor noise and missing readings."""
+    rng = np.random.default_rng(0)
+    for index in range(count):
+        surface = 900 - 800 * index / (count - 1)  # Distance to the regolith (in millimeters)
+        frame = rng.normal(surface, 5, size=(HEIGHT, WIDTH)).clip(1, None).astype(np.uint16)
+        frame[rng.random(size=frame.shape) < 0.05] = 0
+        yield frame
+
+
+@pytest.fixture(scope="module")
+def results():
+    yield RESULTS
+    results_path = os.environ.get("CHECK_LOAD_BENCHMARK_RESULTS")
+    if results_path:
+        Path(results_path).write_text(json.dumps(RESULTS, indent=2))
+
+
+@pytest.fixture(scope="module")
+def filling_recording(tmp_path_factory):
+    count = 150
+    infos = []
+    for index in range(count):
+        surface = 900 - 800 * index / (count - 1)
+        infos.append(FrameInfo(index / CAMERA_FPS, SKIMMER_HEIGHT, surface <= DISTANCETHRESH))
+    path = tmp_path_factory.mktemp("filling")
+    save_recording(path, filling_frames(count), infos)
+    return DepthRecording(path)
+
+
+def check_report(name, report, results) -> None:
+    """Record a replay report, and check that the analysis keeps up with the camera (if CHECK_LOAD_BENCHMARK_FPS)."""
+    results[name] = report
+    print(f"\n{name}: {json.dumps(report)}")
+    if os.environ.get("CHECK_LOAD_BENCHMARK_FPS"):
+        assert report["fps"] >= CAMERA_FPS, f"{name} ran at {report['fps']:.1f} fps, slower than the camera"
+
+    baseline_path = os.environ.get("CHECK_LOAD_BENCHMARK_BASELINE")
+    if baseline_path:
+        baseline = json.loads(Path(baseline_path).read_text())
+        if name in baseline:
+            median, baseline_median = report["frame"]["median_us"], baseline[name]["frame"]["median_us"]
+            assert median <= BASELINE_TOLERANCE * baseline_median, (
+                f"{name} got slower: {median:.1f} us vs {baseline_median:.1f} us per frame"
+            )
+
+
+def test_replay_filling_skimmer(filling_recording, results):
+    report, timeline = check_load_replay.replay(filling_recording)
+    check_report("filling", report, results)
+
+    assert report["frames"] == len(timeline) == len(filling_recording)
+    assert set(report["stages"]) == set(STAGES)
+    assert all(decision.ready is None for decision in timeline[: CONSECUTIVECYCLES - 1])
+    decisions = report["decisions"]
+    assert decisions["false_ready"] == 0  # Never offload before the skimmer is full
+    assert decisions["missed_ready"] <= CONSECUTIVECYCLES  # Only while the consecutive checks catch up
+    assert len(decisions["ready_delays"]) == 1
+    assert decisions["ready_delays"][0] <= CONSECUTIVECYCLES / CAMERA_FPS
+
+    # The fill estimate rises as the skimmer fills up
+    percentages = [decision.fill_percentage for decision in timeline]
+    assert percentages[0] < percentages[len(percentages) // 2] < percentages[-1]
+
+
+def test_replay_recording(results):
+    recording_path = os.environ.get("CHECK_LOAD_RECORDING")
+    if not recording_path:
+        pytest.skip("Set CHECK_LOAD_RECORDING to replay a recording")
+    report, _ = check_load_replay.replay(DepthRecording(recording_path))
+    check_report(Path(recording_path).name, report, results)
+
+
+def test_score_decisions():
+    Decision = check_load_replay.Decision
+    timeline = [
+        Decision(0.0, None, False, 0.0),
+        Decision(0.1, False, False, 0.0),
+        Decision(0.2, True, False, 0.0),  # Too early
+        Decision(0.3, False, True, 0.0),  # Missed
+        Decision(0.4, True, True, 0.0),
+        Decision(0.5, True, None, 0.0),  # Not labelled
+    ]
+    decisions = check_load_replay.score_decisions(timeline)
+    assert decisions["labelled_frames"] == 4
+    assert decisions["accuracy"] == 0.5
+    assert decisions["false_ready"] == 1
+    assert decisions["missed_ready"] == 1
+    assert decisions["ready_delays"] == [pytest.approx(0.1)]
+
+
+def test_main_prints_the_report(filling_recording, capsys):
+    check_load_replay.main([str(Path(filling_recording.depth.filename).parent), "--timeline"])
+    output = capsys.readouterr().out
+    assert '"fps"' in output
+    assert len(output.splitlines()) > len(filling_recording)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from skimmer import depth_recording
+from skimmer.depth_roi import depth_image_view
+
+
+def frames(count=5, width=8, height=6, dtype=np.uint16):
+    return [np.full((height, width), 100 * (index + 1), dtype=dtype) for index in range(count)]
+
+
+def infos(count=5):
+    return [
+        depth_recording.FrameInfo(timestamp=index / 30, skimmer_height=0.5, ready=None if index == 0 else index > 2)
+        for index in range(count)
+    ]
+
+
+def test_round_trip(tmp_path):
+    depth_recording.save_recording(tmp_path, iter(frames()), infos())
+    recording = depth_recording.DepthRecording(tmp_path)
+    assert len(recording) == 5
+    assert isinstance(recording.depth, np.memmap)
+    for (image, info), frame, expected_info in zip(recording, frames(), infos()):
+        assert info.timestamp == pytest.approx(expected_info.timestamp)
+        assert info.skimmer_height == expected_info.skimmer_height
+        assert info.ready is expected_info.ready
+        np.testing.assert_array_equal(depth_image_view(image), frame)
+
+
+def test_images_are_views_of_the_file(tmp_path):
+    depth_recording.save_recording(tmp_path, frames(dtype=np.float32), infos())
+    recording = depth_recording.DepthRecording(tmp_path)
+    image = recording.image(3)
+    assert image.encoding == "32FC1"
+    assert (image.width, image.height, image.step) == (8, 6, 32)
+    assert np.shares_memory(depth_image_view(image), recording.depth)
+
+
+def test_unsupported_frames(tmp_path):
+    with pytest.raises(ValueError):
+        depth_recording.save_recording(tmp_path, frames(dtype=np.int64), infos())
+
+
+def test_frame_count_must_match(tmp_path):
+    with pytest.raises(ValueError):
+        depth_recording.save_recording(tmp_path, frames(count=4), infos())
+    depth_recording.save_recording(tmp_path, frames(count=5), infos())
+    (tmp_path / depth_recording.FRAMES_FILE).write_text("timestamp,skimmer_height,ready\n0.0,0.5,1\n")
+    with pytest.raises(ValueError):
+        depth_recording.DepthRecording(tmp_path)
@@ -0,0 +1,87 @@
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from skimmer import depth_roi
+
+SKIMMER_SIZE = (0.623, 0.7112, 0.3)  # The same skimmer dimensions as ros_check_load
+
+
+def naive_half_size(skimmer_height, img_width, img_height):
+    """The ROI math ros_check_load used to do every tick."""
+    perception_change_x = (2 * (math.atan((0.5 * 0.623) / (skimmer_height + 0.3)))) * (180 / math.pi)
+    perception_change_y = (2 * (math.atan((0.5 * 0.7112) / (skimmer_height + 0.3)))) * (180 / math.pi)
+    percent_fov_x = min(perception_change_x / 86, 1)
+    percent_fov_y = min(perception_change_y / 57, 1)
+    return int(img_width * percent_fov_x / 2), int((img_height * percent_fov_y) / 2)
+
+
+def depth_frame(width=848, height=640):
+    rng = np.random.default_rng(0)
+    return rng.integers(200, 2000, size=(height, width), dtype=np.uint16)
+
+
+@pytest.mark.parametrize("skimmer_height", [0.0, 0.25, 0.5, 1.2])
+def test_roi_half_size_matches_the_original_math(skimmer_height):
+    expected = naive_half_size(skimmer_height, 848, 640)
+    assert depth_roi.roi_half_size(skimmer_height, 848, 640, *SKIMMER_SIZE) == expected
+
+
+def test_roi_half_size_is_memoized():
+    depth_roi._roi_half_size.cache_clear()
+    for _ in range(10):
+        depth_roi.roi_half_size(0.5, 848, 640, *SKIMMER_SIZE)
+        depth_roi.roi_half_size(0.5001, 848, 640, *SKIMMER_SIZE)  # Rounds to the same height
+    assert depth_roi._roi_half_size.cache_info().misses == 1
+
+
+def test_crop_roi_is_a_padded_view():
+    depth = depth_frame()
+    padded, roi = depth_roi.crop_roi(depth, 100, 50, padding=2)
+    assert padded.shape == (104, 204)
+    assert np.shares_memory(padded, depth)
+    np.testing.assert_array_equal(padded[roi], depth[270:370, 324:524])
+
+
+def test_crop_roi_padding_stops_at_the_image_edge():
+    depth = depth_frame()
+    padded, roi = depth_roi.crop_roi(depth, 424, 320, padding=2)  # The whole image
+    assert padded.shape == depth.shape
+    np.testing.assert_array_equal(padded[roi], depth)
+
+
+@pytest.mark.parametrize("half_size", [(100, 50), (424, 320), (423, 10)])
+def test_blurring_the_padded_crop_matches_blurring_the_whole_image(half_size):
+    cv2 = pytest.importorskip("cv2")
+    depth = depth_frame()
+    half_x, half_y = half_size
+    expected = cv2.GaussianBlur(depth, (5, 5), 0)[320 - half_y : 320 + half_y, 424 - half_x : 424 + half_x]
+    padded, roi = depth_roi.crop_roi(depth, half_x, half_y, padding=2)
+    np.testing.assert_array_equal(cv2.GaussianBlur(padded, (5, 5), 0)[roi], expected)
+
+
+def test_valid_depth_mean_ignores_missing_readings():
+    assert depth_roi.valid_depth_mean(np.array([[0, 100], [300, 0]], dtype=np.uint16)) == 200.0
+    assert depth_roi.valid_depth_mean(np.array([[np.nan, 1.0], [3.0, 0.0]], dtype=np.float32)) == 2.0
+    assert math.isnan(depth_roi.valid_depth_mean(np.zeros((2, 2), dtype=np.uint16)))
+
+
+def test_depth_image_view_handles_row_padding():
+    depth = depth_frame(width=5, height=3)
+    # Each row is padded to 12 bytes, like some camera drivers do
+    data = np.zeros((3, 12), dtype=np.uint8)
+    data[:, :10] = depth.view(np.uint8).reshape(3, 10)
+    msg = SimpleNamespace(
+        encoding="16UC1", is_bigendian=0, height=3, width=5, step=12, data=bytearray(data.tobytes())
+    )
+    view = depth_roi.depth_image_view(msg)
+    np.testing.assert_array_equal(view, depth)
+    assert np.shares_memory(view, np.frombuffer(msg.data, dtype=np.uint8))
+
+
+def test_depth_image_view_rejects_color_images():
+    msg = SimpleNamespace(encoding="rgb8", is_bigendian=0, height=1, width=1, step=3, data=bytes(3))
+    with pytest.raises(ValueError):
+        depth_roi.depth_image_view(msg)
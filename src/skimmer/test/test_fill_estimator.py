@@ -0,0 +1,80 @@
+import math
+
+import numpy as np
+import pytest
+
+from skimmer import fill_estimator
+
+SKIMMER = (0.623, 0.7112, 0.2)  # Size x, size y and depth of the skimmer (in meters)
+TOP_DISTANCE = 0.8  # Distance from the camera to the top of the skimmer (in meters)
+INTRINSICS = fill_estimator.intrinsics_from_fov(848, 640)
+
+
+def flat_surface(fill_height, width=848, height=640):
+    """A 16UC1 depth image (in millimeters) of a level surface fill_height above the skimmer's floor."""
+    distance_mm = round((TOP_DISTANCE + SKIMMER[2] - fill_height) * 1000)
+    return np.full((height, width), distance_mm, dtype=np.uint16)
+
+
+def estimate(depth, **kwargs):
+    return fill_estimator.estimate_fill(depth, INTRINSICS, TOP_DISTANCE, *SKIMMER, **kwargs)
+
+
+@pytest.mark.parametrize("fill_height, percentage", [(0.0, 0.0), (0.05, 25.0), (0.1, 50.0), (0.2, 100.0)])
+def test_level_surface(fill_height, percentage):
+    result = estimate(flat_surface(fill_height))
+    assert result.percentage == pytest.approx(percentage, abs=0.5)
+    assert result.volume == pytest.approx(fill_height * SKIMMER[0] * SKIMMER[1], abs=1e-3)
+    assert result.confidence == 1.0
+
+
+def test_fill_is_clamped_to_the_skimmer():
+    assert estimate(flat_surface(0.5)).percentage == pytest.approx(100.0, abs=1e-3)  # Piled above the skimmer
+    assert estimate(flat_surface(-0.1)).percentage == pytest.approx(0.0, abs=1e-3)  # Something below the floor (noise)
+
+
+def test_missing_readings_lower_the_confidence_but_not_the_volume():
+    depth = flat_surface(0.1)
+    depth[:, :424] = 0
+    result = estimate(depth)
+    assert result.percentage == pytest.approx(50.0, abs=0.5)
+    assert 0.4 < result.confidence < 0.6
+
+
+def test_no_readings():
+    result = estimate(np.zeros((640, 848), dtype=np.uint16))
+    assert math.isnan(result.volume) and math.isnan(result.percentage)
+    assert result.confidence == 0.0
+
+
+def test_only_pixels_looking_into_the_skimmer_are_used():
+    depth = flat_surface(0.1)
+    # Fill everything outside the skimmer's opening (plus a few pixels of margin) with the floor of the skimmer
+    half_x = int(0.5 * SKIMMER[0] / TOP_DISTANCE * INTRINSICS.fx) + 4
+    half_y = int(0.5 * SKIMMER[1] / TOP_DISTANCE * INTRINSICS.fy) + 4
+    outside = np.ones(depth.shape, dtype=bool)
+    outside[320 - half_y : 320 + half_y, 424 - half_x : 424 + half_x] = False
+    depth[outside] = 0
+    assert estimate(depth).confidence == 1.0
+
+
+def test_float_depth_images_in_meters():
+    depth = flat_surface(0.1).astype(np.float32) / 1000
+    depth[0, :] = np.nan
+    result = estimate(depth, depth_scale=1.0)
+    assert result.percentage == pytest.approx(50.0, abs=0.5)
+
+
+def test_decimation_matches_the_full_resolution_estimate():
+    # A sloped pile of regolith (deeper at the front of the skimmer)
+    rows = np.linspace(0.0, SKIMMER[2], 640)[:, np.newaxis]
+    depth = np.broadcast_to(((TOP_DISTANCE + rows) * 1000).astype(np.uint16), (640, 848))
+    full_resolution = estimate(depth, decimation=1)
+    decimated = estimate(depth, decimation=4)
+    assert decimated.percentage == pytest.approx(full_resolution.percentage, abs=0.5)
+    assert 0.0 < decimated.percentage < 100.0
+
+
+def test_intrinsics_from_camera_info():
+    k = [421.0, 0.0, 424.5, 0.0, 420.0, 240.25, 0.0, 0.0, 1.0]
+    assert fill_estimator.intrinsics_from_camera_info(k) == fill_estimator.CameraIntrinsics(421.0, 420.0, 424.5, 240.25)
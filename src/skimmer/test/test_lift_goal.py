@@ -0,0 +1,86 @@
+from skimmer.lift_goal import LiftGoalTracker, IDLE, MOVING, REACHED, STALLED
+
+
+def make_tracker():
+    return LiftGoalTracker(goal_threshold=320, stall_timeout=1.0, stall_tolerance=20)
+
+
+def test_idle_positions_do_not_change_the_state():
+    tracker = make_tracker()
+    assert not tracker.update(0.0, 0.0)
+    assert not tracker.update(-5000.0, 10.0)
+    assert tracker.state == IDLE
+    assert tracker.position == -5000.0
+
+
+def test_move_reaches_the_goal():
+    tracker = make_tracker()
+    tracker.update(0.0, 0.0)
+    assert tracker.set_goal(-3000.0, 0.0)
+    assert tracker.state == MOVING
+    # Only transitions are reported
+    assert not tracker.update(-500.0, 0.1)
+    assert not tracker.update(-1500.0, 0.2)
+    assert tracker.update(-2700.0, 0.3)
+    assert tracker.state == REACHED
+    assert not tracker.update(-2990.0, 0.4)
+
+
+def test_goal_within_the_threshold_is_reached_immediately():
+    tracker = make_tracker()
+    tracker.update(-1000.0, 0.0)
+    assert tracker.set_goal(-1100.0, 0.0)
+    assert tracker.state == REACHED
+
+
+def test_new_goal_is_reported_even_while_moving():
+    tracker = make_tracker()
+    tracker.update(0.0, 0.0)
+    tracker.set_goal(-3000.0, 0.0)
+    assert tracker.set_goal(-6000.0, 0.1)
+    assert tracker.state == MOVING
+    assert tracker.goal == -6000.0
+
+
+def test_stall_is_reported_and_recovers():
+    tracker = make_tracker()
+    tracker.update(0.0, 0.0)
+    tracker.set_goal(-3000.0, 0.0)
+    assert not tracker.update(-1000.0, 0.5)
+    assert not tracker.update(-1010.0, 1.0)  # Within the stall tolerance
+    assert not tracker.update(-1005.0, 1.5)
+    assert tracker.update(-1010.0, 1.6)  # No progress for more than stall_timeout
+    assert tracker.state == STALLED
+    assert tracker.update(-1500.0, 2.0)  # Moving again
+    assert tracker.state == MOVING
+
+
+def test_no_telemetry_after_the_goal_counts_as_a_stall():
+    tracker = make_tracker()
+    tracker.set_goal(-3000.0, 0.0)
+    assert not tracker.update(0.0, 0.5)
+    assert tracker.update(0.0, 1.6)
+    assert tracker.state == STALLED
+
+
+def test_stop_at_a_limit_switch():
+    tracker = make_tracker()
+    tracker.update(0.0, 0.0)
+    tracker.set_goal(-3000.0, 0.0)
+    tracker.update(-2000.0, 1.0)
+    assert tracker.stop()
+    assert tracker.state == STALLED
+
+    tracker.set_goal(-2100.0, 2.0)
+    assert tracker.state == REACHED
+    assert not tracker.stop()  # Not moving anymore
+
+
+def test_cancel():
+    tracker = make_tracker()
+    tracker.set_goal(-3000.0, 0.0)
+    assert tracker.cancel()
+    assert tracker.state == IDLE
+    assert not tracker.cancel()
+    assert not tracker.update(-3000.0, 1.0)  # Reaching the old goal doesn't matter anymore
+    assert tracker.state == IDLE
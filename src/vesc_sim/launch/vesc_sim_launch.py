@@ -0,0 +1,30 @@
+from launch import LaunchDescription
+from launch_ros.actions import Node
+
+
+def generate_launch_description():
+    ld = LaunchDescription()
+
+    # Stands in for ros2socketcan_bridge and the VESCs
+    vesc_sim = Node(
+        package="vesc_sim",
+        executable="vesc_sim_node",
+        name="vesc_sim_node",
+        parameters=["config/motor_control.yaml"],
+        output="screen",
+        emulate_tty=True,
+    )
+
+    motor_control = Node(
+        package="motor_control",
+        executable="motor_control_node",
+        name="motor_control_node",
+        parameters=["config/motor_control.yaml"],
+        output="screen",
+        emulate_tty=True,
+    )
+
+    ld.add_action(vesc_sim)
+    ld.add_action(motor_control)
+
+    return ld
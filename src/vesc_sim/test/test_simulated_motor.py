@@ -0,0 +1,85 @@
+import pytest
+
+from vesc_sim import vesc_can
+from vesc_sim.simulated_motor import SimulatedMotor, SimulatedMotorBank
+
+
+def run(motor_or_bank, seconds, dt=0.005):
+    for _ in range(round(seconds / dt)):
+        motor_or_bank.step(dt)
+
+
+def test_duty_cycle_reaches_steady_state_speed():
+    motor = SimulatedMotor(1, max_erpm=20000.0, time_constant=0.1, command_timeout=10.0)
+    motor.set_duty_cycle(0.5)
+    run(motor, 0.1)
+    assert 0.5 * 10000 < motor.erpm < 0.7 * 10000  # About one time constant
+    run(motor, 1.0)
+    assert motor.erpm == pytest.approx(10000, rel=1e-3)
+    assert motor.current == pytest.approx(0.0, abs=0.1)
+
+
+def test_tachometer_integrates_speed():
+    motor = SimulatedMotor(1, time_constant=0.001)
+    motor.set_rpm(6000)
+    run(motor, 0.5)
+    # 6 counts per electrical revolution at 100 electrical revolutions per second
+    assert motor.tachometer == pytest.approx(300, rel=0.02)
+
+
+def test_gravity_loaded_lift_sags_until_the_end_stop():
+    lift = SimulatedMotor(1, gravity_duty=0.01, min_tachometer=-3600.0, max_tachometer=0.0)
+    run(lift, 0.5)
+    assert lift.tachometer < 0  # Falls with no power applied
+    lift.set_duty_cycle(0.01)
+    speed_before = lift.erpm
+    run(lift, 0.5)
+    assert abs(lift.erpm) < abs(speed_before)  # Holding power stops it
+    run(lift, 300.0, dt=0.05)  # The command times out and the lift falls to the bottom
+    assert lift.tachometer == -3600.0
+    assert lift.erpm == 0.0
+
+
+def test_loaded_motor_heats_up_and_draws_energy():
+    motor = SimulatedMotor(1, gravity_duty=0.5, min_tachometer=0.0, command_timeout=1e9, thermal_time_constant=10.0)
+    motor.set_duty_cycle(0.2)  # Not enough to lift the load, so the motor stalls
+    run(motor, 100.0, dt=0.05)
+    assert motor.current == pytest.approx(12.0)
+    assert motor.motor_temperature == pytest.approx(25.0 + 0.05 * 12.0**2, rel=1e-3)
+    assert 25.0 < motor.fet_temperature < motor.motor_temperature
+    assert motor.amp_hours == pytest.approx(12.0 * 0.2 * 100.0 / 3600, rel=1e-3)
+    assert motor.watt_hours == pytest.approx(motor.amp_hours * 24.0)
+
+    frames = dict(motor.status_frames())
+    fet_temperature, motor_temperature, input_current, _ = vesc_can.decode_status_4(
+        frames[vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_4, 1)]
+    )
+    assert motor_temperature == pytest.approx(motor.motor_temperature, abs=0.1)
+    assert input_current == pytest.approx(2.4)
+
+
+def test_command_timeout_releases_the_motor():
+    motor = SimulatedMotor(1, command_timeout=1.0)
+    motor.set_duty_cycle(0.3)
+    run(motor, 0.9)
+    assert motor.duty_cycle == 0.3
+    run(motor, 0.2)
+    assert motor.duty_cycle == 0.0
+
+
+def test_bank_handles_motor_control_frames():
+    bank = SimulatedMotorBank([SimulatedMotor(7), SimulatedMotor(10)])
+    assert bank.handle_frame(vesc_can.make_can_id(vesc_can.CAN_PACKET_SET_DUTY, 7), vesc_can.encode_set_duty(0.25))
+    assert bank.handle_frame(vesc_can.make_can_id(vesc_can.CAN_PACKET_SET_RPM, 10), vesc_can.encode_set_rpm(-5000))
+    assert not bank.handle_frame(vesc_can.make_can_id(vesc_can.CAN_PACKET_SET_DUTY, 3), vesc_can.encode_set_duty(1.0))
+    assert bank.frames_ignored == 1
+    run(bank, 0.9)
+
+    frames = dict(bank.status_frames())
+    erpm, _, duty_cycle = vesc_can.decode_status(frames[vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS, 7)])
+    assert erpm == pytest.approx(5000, abs=1)
+    assert duty_cycle == pytest.approx(0.25)
+    erpm, _, _ = vesc_can.decode_status(frames[vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS, 10)])
+    assert erpm == pytest.approx(-5000, abs=1)
+    tachometer, _ = vesc_can.decode_status_5(frames[vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_5, 10)])
+    assert tachometer < 0
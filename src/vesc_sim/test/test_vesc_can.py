@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from vesc_sim import vesc_can
+
+
+def test_can_id_round_trip():
+    can_id = vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_5, 10)
+    assert can_id == 0x1B0A
+    assert vesc_can.split_can_id(can_id) == (vesc_can.CAN_PACKET_STATUS_5, 10)
+
+
+def test_set_duty_matches_motor_control_node():
+    # motor_control_node sends int32(duty cycle * 100000) as 4 big-endian bytes
+    assert vesc_can.encode_set_duty(0.5) == bytes([0x00, 0x00, 0xC3, 0x50])
+    assert vesc_can.encode_set_duty(-0.25) == (-25000).to_bytes(4, "big", signed=True)
+    assert vesc_can.encode_set_duty(2.0) == vesc_can.encode_set_duty(1.0)  # Clamped
+    assert vesc_can.decode_set_duty(vesc_can.encode_set_duty(-0.3)) == pytest.approx(-0.3)
+
+
+def test_set_rpm_round_trip():
+    assert vesc_can.decode_set_rpm(vesc_can.encode_set_rpm(-1234)) == -1234
+
+
+def test_status_round_trip():
+    data = vesc_can.encode_status(-15000, 12.34, -0.456)
+    assert len(data) == 8
+    erpm, current, duty_cycle = vesc_can.decode_status(data)
+    assert erpm == -15000
+    assert current == pytest.approx(12.3)
+    assert duty_cycle == pytest.approx(-0.456)
+
+
+def test_energy_status_round_trip():
+    assert vesc_can.decode_status_2(vesc_can.encode_status_2(1.2345, 0.5)) == (pytest.approx(1.2345), 0.5)
+    assert vesc_can.decode_status_3(vesc_can.encode_status_3(29.6, 0.0)) == (pytest.approx(29.6), 0.0)
+
+
+def test_status_4_round_trip():
+    data = vesc_can.encode_status_4(45.3, 81.2, -3.4, 90.0)
+    assert len(data) == 8
+    fet_temperature, motor_temperature, input_current, pid_position = vesc_can.decode_status_4(data)
+    assert fet_temperature == pytest.approx(45.3)
+    assert motor_temperature == pytest.approx(81.2)
+    assert input_current == pytest.approx(-3.4)
+    assert pid_position == pytest.approx(90.0)
+    # The input current is read the same way as motor_control_node's CAN_callback
+    assert int.from_bytes(data[4:6], "big", signed=True) == -34
+
+
+def test_status_5_round_trip():
+    data = vesc_can.encode_status_5(-3600, 24.2)
+    assert len(data) == 8
+    assert vesc_can.decode_status_5(data) == (-3600, pytest.approx(24.2))
+    # The tachometer is read the same way as motor_control_node's CAN_callback
+    assert int.from_bytes(data[0:4], "big", signed=True) == -3600
+
+
+def test_decoders_read_frame_data_in_place():
+    # can_msgs/Frame data is a numpy uint8 array in rclpy
+    frame_data = np.frombuffer(vesc_can.encode_status_5(123456, 12.0), dtype=np.uint8)
+    assert vesc_can.decode_status_5(memoryview(frame_data)) == (123456, pytest.approx(12.0))
+
+
+def test_int16_fields_saturate():
+    _, current, _ = vesc_can.decode_status(vesc_can.encode_status(0, 10000.0, 0.0))
+    assert current == pytest.approx(3276.7)
@@ -0,0 +1,175 @@
+# This module simulates a bank of VESC motor controllers with simple motor dynamics.
+
+from vesc_sim import vesc_can
+
+TACHOMETER_COUNTS_PER_ELECTRICAL_REVOLUTION = 6  # The VESC counts every commutation step
+
+
+class SimulatedMotor:
+    """A brushless motor driven by a VESC, modelled as a first order system.
+
+    In duty cycle mode the motor accelerates towards (duty cycle - gravity_duty) * max_erpm with the given time
+    constant, so a nonzero gravity_duty makes it sag (e.g. a lift) unless enough duty cycle is applied to hold it.
+    In velocity mode the VESC's own speed controller tracks the commanded electrical RPM and cancels the load.
+    Like a real VESC, the motor is released if it doesn't receive a command for command_timeout seconds.
+    min_tachometer and max_tachometer (if given) are hard end stops.
+    The motor and FET temperatures rise towards ambient_temperature + heating * current^2 (degrees Celsius, with
+    current in amps) with the given thermal time constant, so a stalled or heavily loaded motor slowly heats up.
+    """
+
+    def __init__(
+        self,
+        controller_id: int,
+        max_erpm: float = 20000.0,
+        time_constant: float = 0.1,
+        gravity_duty: float = 0.0,
+        min_tachometer: float = None,
+        max_tachometer: float = None,
+        stall_current: float = 60.0,
+        input_voltage: float = 24.0,
+        command_timeout: float = 1.0,
+        ambient_temperature: float = 25.0,
+        heating: float = 0.05,
+        thermal_time_constant: float = 60.0,
+    ):
+        self.controller_id = controller_id
+        self.max_erpm = max_erpm
+        self.time_constant = time_constant
+        self.gravity_duty = gravity_duty
+        self.min_tachometer = min_tachometer
+        self.max_tachometer = max_tachometer
+        self.stall_current = stall_current
+        self.input_voltage = input_voltage
+        self.command_timeout = command_timeout
+        self.ambient_temperature = ambient_temperature
+        self.heating = heating
+        self.thermal_time_constant = thermal_time_constant
+
+        self.duty_cycle = 0.0  # Commanded duty cycle (or the equivalent duty cycle in velocity mode)
+        self.target_erpm = None  # Commanded electrical RPM, or None in duty cycle mode
+        self.erpm = 0.0
+        self.tachometer = 0.0
+        self.time_since_command = 0.0
+        self.motor_temperature = ambient_temperature
+        self.fet_temperature = ambient_temperature
+        self.amp_hours = 0.0
+        self.amp_hours_charged = 0.0
+        self.watt_hours = 0.0
+        self.watt_hours_charged = 0.0
+
+    def set_duty_cycle(self, duty_cycle: float) -> None:
+        self.duty_cycle = min(max(duty_cycle, -1.0), 1.0)
+        self.target_erpm = None
+        self.time_since_command = 0.0
+
+    def set_rpm(self, erpm: float) -> None:
+        self.target_erpm = min(max(erpm, -self.max_erpm), self.max_erpm)
+        self.duty_cycle = self.target_erpm / self.max_erpm
+        self.time_since_command = 0.0
+
+    def step(self, dt: float) -> None:
+        """Advance the simulation by dt seconds."""
+        self.time_since_command += dt
+        if self.time_since_command > self.command_timeout:
+            self.set_duty_cycle(0.0)  # The VESC releases the motor
+            self.time_since_command = self.command_timeout
+
+        if self.target_erpm is not None:
+            steady_state_erpm = self.target_erpm
+        else:
+            steady_state_erpm = (self.duty_cycle - self.gravity_duty) * self.max_erpm
+        self.erpm += (steady_state_erpm - self.erpm) * min(dt / self.time_constant, 1.0)
+        self.tachometer += self.erpm / 60 * TACHOMETER_COUNTS_PER_ELECTRICAL_REVOLUTION * dt
+
+        # Stop at the end stops
+        if self.min_tachometer is not None and self.tachometer <= self.min_tachometer:
+            self.tachometer = self.min_tachometer
+            self.erpm = max(self.erpm, 0.0)
+        if self.max_tachometer is not None and self.tachometer >= self.max_tachometer:
+            self.tachometer = self.max_tachometer
+            self.erpm = min(self.erpm, 0.0)
+
+        # The FETs only carry the motor current while they are switched on, so they heat up less than the motor
+        current = self.current
+        thermal_step = min(dt / self.thermal_time_constant, 1.0)
+        motor_temperature = self.ambient_temperature + self.heating * current**2
+        fet_temperature = self.ambient_temperature + self.heating * abs(self.duty_cycle) * current**2
+        self.motor_temperature += (motor_temperature - self.motor_temperature) * thermal_step
+        self.fet_temperature += (fet_temperature - self.fet_temperature) * thermal_step
+
+        # Energy drawn from (or regenerated into) the battery
+        input_current = self.input_current
+        amp_hours = abs(input_current) * dt / 3600
+        if input_current >= 0:
+            self.amp_hours += amp_hours
+            self.watt_hours += amp_hours * self.input_voltage
+        else:
+            self.amp_hours_charged += amp_hours
+            self.watt_hours_charged += amp_hours * self.input_voltage
+
+    @property
+    def current(self) -> float:
+        """Motor current in amps (proportional to the voltage not cancelled out by the back EMF)."""
+        return self.stall_current * (self.duty_cycle - self.erpm / self.max_erpm)
+
+    @property
+    def input_current(self) -> float:
+        """Battery current in amps (the motor current scaled down by the duty cycle, negative when regenerating)."""
+        return self.current * self.duty_cycle
+
+    def status_frames(self) -> list:
+        """Returns the (CAN ID, data) status frames this VESC broadcasts (the ones motor_control_node reads)."""
+        return [
+            (
+                vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS, self.controller_id),
+                vesc_can.encode_status(self.erpm, self.current, self.duty_cycle),
+            ),
+            (
+                vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_2, self.controller_id),
+                vesc_can.encode_status_2(self.amp_hours, self.amp_hours_charged),
+            ),
+            (
+                vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_3, self.controller_id),
+                vesc_can.encode_status_3(self.watt_hours, self.watt_hours_charged),
+            ),
+            (
+                vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_4, self.controller_id),
+                vesc_can.encode_status_4(self.fet_temperature, self.motor_temperature, self.input_current),
+            ),
+            (
+                vesc_can.make_can_id(vesc_can.CAN_PACKET_STATUS_5, self.controller_id),
+                vesc_can.encode_status_5(round(self.tachometer), self.input_voltage),
+            ),
+        ]
+
+
+class SimulatedMotorBank:
+    """Every VESC on a simulated CAN bus, indexed by controller (CAN) ID."""
+
+    def __init__(self, motors: list):
+        self.motors = {motor.controller_id: motor for motor in motors}
+        self.frames_received = 0
+        self.frames_ignored = 0
+
+    def handle_frame(self, can_id: int, data) -> bool:
+        """Apply a command frame sent to the bus. Returns False if no simulated VESC understood it."""
+        self.frames_received += 1
+        packet_id, controller_id = vesc_can.split_can_id(can_id)
+        motor = self.motors.get(controller_id)
+        if motor is not None and packet_id == vesc_can.CAN_PACKET_SET_DUTY:
+            motor.set_duty_cycle(vesc_can.decode_set_duty(data))
+        elif motor is not None and packet_id == vesc_can.CAN_PACKET_SET_RPM:
+            motor.set_rpm(vesc_can.decode_set_rpm(data))
+        else:
+            self.frames_ignored += 1
+            return False
+        return True
+
+    def step(self, dt: float) -> None:
+        """Advance every motor by dt seconds."""
+        for motor in self.motors.values():
+            motor.step(dt)
+
+    def status_frames(self) -> list:
+        """Returns the (CAN ID, data) status frames of every motor."""
+        return [frame for motor in self.motors.values() for frame in motor.status_frames()]
@@ -0,0 +1,126 @@
+# This module encodes and decodes the VESC CAN packets used by motor_control_node.
+#
+# VESC CAN frames use 29-bit extended IDs: the packet ID is in bits 8-15 and the controller (CAN) ID is in bits 0-7.
+# Every multi-byte field is big-endian. Decoders accept any bytes-like object (bytes, bytearray, memoryview,
+# or the numpy uint8 array of a can_msgs/Frame) and read it in place without copying.
+
+import struct
+
+# Command packets (sent to the VESCs)
+CAN_PACKET_SET_DUTY = 0  # int32 duty cycle * 100000
+CAN_PACKET_SET_RPM = 3  # int32 electrical RPM
+
+# Status packets (sent by the VESCs)
+CAN_PACKET_STATUS = 9  # int32 electrical RPM, int16 current * 10, int16 duty cycle * 1000
+CAN_PACKET_STATUS_2 = 14  # int32 amp hours * 10000, int32 amp hours charged * 10000
+CAN_PACKET_STATUS_3 = 15  # int32 watt hours * 10000, int32 watt hours charged * 10000
+CAN_PACKET_STATUS_4 = 16  # int16 FET temperature * 10, int16 motor temperature * 10, int16 input current * 10,
+# int16 PID position * 50
+CAN_PACKET_STATUS_5 = 27  # int32 tachometer, int16 input voltage * 10, 2 reserved bytes
+
+DUTY_CYCLE_SCALE = 100000.0
+ENERGY_SCALE = 10000.0
+
+_SET_COMMAND = struct.Struct(">i")
+_STATUS = struct.Struct(">ihh")
+_STATUS_COUNTERS = struct.Struct(">ii")  # Status 2 and 3
+_STATUS_4 = struct.Struct(">hhhh")
+_STATUS_5 = struct.Struct(">ihxx")
+
+
+def make_can_id(packet_id: int, controller_id: int) -> int:
+    """Combine a packet ID and a controller (CAN) ID into an extended CAN frame ID."""
+    return ((packet_id & 0xFF) << 8) | (controller_id & 0xFF)
+
+
+def split_can_id(can_id: int) -> tuple:
+    """Split an extended CAN frame ID into (packet ID, controller ID)."""
+    return (can_id >> 8) & 0xFF, can_id & 0xFF
+
+
+def encode_set_duty(duty_cycle: float) -> bytes:
+    """Encode a duty cycle command (clamped between -1.0 and 1.0) the same way as motor_control_node."""
+    duty_cycle = min(max(duty_cycle, -1.0), 1.0)
+    return _SET_COMMAND.pack(int(duty_cycle * DUTY_CYCLE_SCALE))
+
+
+def decode_set_duty(data) -> float:
+    """Decode a duty cycle command."""
+    return _SET_COMMAND.unpack_from(data)[0] / DUTY_CYCLE_SCALE
+
+
+def encode_set_rpm(erpm: int) -> bytes:
+    """Encode a velocity command (in electrical RPM)."""
+    return _SET_COMMAND.pack(int(erpm))
+
+
+def decode_set_rpm(data) -> int:
+    """Decode a velocity command (in electrical RPM)."""
+    return _SET_COMMAND.unpack_from(data)[0]
+
+
+def encode_status(erpm: float, current: float, duty_cycle: float) -> bytes:
+    """Encode a status packet (electrical RPM, motor current in amps, duty cycle between -1.0 and 1.0)."""
+    return _STATUS.pack(int(erpm), _to_int16(current * 10), _to_int16(duty_cycle * 1000))
+
+
+def decode_status(data) -> tuple:
+    """Decode a status packet into (electrical RPM, motor current in amps, duty cycle between -1.0 and 1.0)."""
+    erpm, current, duty_cycle = _STATUS.unpack_from(data)
+    return erpm, current / 10.0, duty_cycle / 1000.0
+
+
+def encode_status_2(amp_hours: float, amp_hours_charged: float) -> bytes:
+    """Encode a status 2 packet (amp hours drawn and charged since the VESC started)."""
+    return _STATUS_COUNTERS.pack(int(amp_hours * ENERGY_SCALE), int(amp_hours_charged * ENERGY_SCALE))
+
+
+def decode_status_2(data) -> tuple:
+    """Decode a status 2 packet into (amp hours, amp hours charged)."""
+    amp_hours, amp_hours_charged = _STATUS_COUNTERS.unpack_from(data)
+    return amp_hours / ENERGY_SCALE, amp_hours_charged / ENERGY_SCALE
+
+
+def encode_status_3(watt_hours: float, watt_hours_charged: float) -> bytes:
+    """Encode a status 3 packet (watt hours drawn and charged since the VESC started)."""
+    return _STATUS_COUNTERS.pack(int(watt_hours * ENERGY_SCALE), int(watt_hours_charged * ENERGY_SCALE))
+
+
+def decode_status_3(data) -> tuple:
+    """Decode a status 3 packet into (watt hours, watt hours charged)."""
+    watt_hours, watt_hours_charged = _STATUS_COUNTERS.unpack_from(data)
+    return watt_hours / ENERGY_SCALE, watt_hours_charged / ENERGY_SCALE
+
+
+def encode_status_4(
+    fet_temperature: float, motor_temperature: float, input_current: float, pid_position: float = 0.0
+) -> bytes:
+    """Encode a status 4 packet (temperatures in degrees Celsius, input current in amps, PID position in degrees)."""
+    return _STATUS_4.pack(
+        _to_int16(fet_temperature * 10),
+        _to_int16(motor_temperature * 10),
+        _to_int16(input_current * 10),
+        _to_int16(pid_position * 50),
+    )
+
+
+def decode_status_4(data) -> tuple:
+    """Decode a status 4 packet into (FET temperature, motor temperature, input current, PID position)."""
+    fet_temperature, motor_temperature, input_current, pid_position = _STATUS_4.unpack_from(data)
+    return fet_temperature / 10.0, motor_temperature / 10.0, input_current / 10.0, pid_position / 50.0
+
+
+def encode_status_5(tachometer: int, input_voltage: float) -> bytes:
+    """Encode a status 5 packet (tachometer in counts, input voltage in volts)."""
+    return _STATUS_5.pack(int(tachometer), _to_int16(input_voltage * 10))
+
+
+def decode_status_5(data) -> tuple:
+    """Decode a status 5 packet into (tachometer in counts, input voltage in volts)."""
+    tachometer, input_voltage = _STATUS_5.unpack_from(data)
+    return tachometer, input_voltage / 10.0
+
+
+def _to_int16(value: float) -> int:
+    """Round and saturate a value to the int16 range (the VESC firmware saturates instead of overflowing)."""
+    return min(max(int(round(value)), -32768), 32767)
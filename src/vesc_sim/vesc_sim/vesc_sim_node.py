@@ -0,0 +1,147 @@
+# This ROS 2 node simulates our VESC motor controllers on the CAN bus, so that motor_control_node
+# (and everything that uses it) can run without ros2socketcan_bridge or any hardware.
+# It listens to the same CAN/<iface>/transmit topic that ros2socketcan_bridge would forward to the bus,
+# and publishes the VESC status frames on CAN/<iface>/receive.
+
+# Import the ROS 2 module
+import rclpy
+from rclpy.node import Node
+
+import numpy as np
+
+# Import ROS 2 formatted message types
+from can_msgs.msg import Frame
+
+# Import custom ROS 2 interfaces
+from rovr_interfaces.msg import LimitSwitches
+
+# Import our VESC simulation
+from vesc_sim.simulated_motor import SimulatedMotor, SimulatedMotorBank
+
+# CAN IDs of the motors to simulate (the same parameters as config/motor_control.yaml)
+MOTOR_PARAMETERS = [
+    ("FRONT_LEFT_DRIVE", 10),
+    ("FRONT_LEFT_TURN", 4),
+    ("FRONT_RIGHT_DRIVE", 9),
+    ("FRONT_RIGHT_TURN", 3),
+    ("BACK_LEFT_DRIVE", 7),
+    ("BACK_LEFT_TURN", 6),
+    ("BACK_RIGHT_DRIVE", 8),
+    ("BACK_RIGHT_TURN", 5),
+    ("SKIMMER_BELT_MOTOR", 2),
+    ("SKIMMER_LIFT_MOTOR", 1),
+]
+SIMULATION_PARAMETERS = [
+    ("CAN_INTERFACE_TRANSMIT", "can0"),
+    ("CAN_INTERFACE_RECEIVE", "can0"),
+    ("SIMULATION_RATE", 200.0),  # How often to step the motor dynamics (in Hz)
+    ("STATUS_RATE", 50.0),  # How often each VESC broadcasts its status frames (in Hz, 50 is the VESC default)
+    ("MOTOR_MAX_ERPM", 20000.0),  # Electrical RPM at full duty cycle with no load
+    ("MOTOR_TIME_CONSTANT", 0.1),  # How quickly the motors respond (in seconds)
+    ("LIFT_GRAVITY_DUTY", 0.01),  # Duty cycle needed to hold the skimmer lift up
+    ("LIFT_MIN_TACHOMETER", -3600.0),  # Bottom of the skimmer lift (in encoder counts)
+    ("LIFT_MAX_TACHOMETER", 0.0),  # Top of the skimmer lift (in encoder counts)
+    ("PUBLISH_LIMIT_SWITCHES", True),  # Publish limitSwitches from the lift end stops (instead of the Arduino)
+]
+
+
+class VescSimNode(Node):
+    def __init__(self):
+        """Initialize the ROS 2 VESC simulation node."""
+        super().__init__("vesc_sim")
+
+        # Define default values for our ROS parameters below #
+        self.declare_parameters("", MOTOR_PARAMETERS + SIMULATION_PARAMETERS)
+
+        # Assign the ROS Parameters to member variables below #
+        for name, _ in MOTOR_PARAMETERS + SIMULATION_PARAMETERS:
+            setattr(self, name, self.get_parameter(name).value)
+
+        # Print the ROS Parameters to the terminal below #
+        self.get_logger().info(
+            "\n".join(
+                f"{name} has been set to: {getattr(self, name)}" for name, _ in MOTOR_PARAMETERS + SIMULATION_PARAMETERS
+            )
+        )
+
+        # Create a simulated VESC for every motor (the skimmer lift is gravity loaded and has end stops)
+        motors = []
+        for name, _ in MOTOR_PARAMETERS:
+            if name == "SKIMMER_LIFT_MOTOR":
+                continue
+            motors.append(
+                SimulatedMotor(
+                    getattr(self, name), max_erpm=self.MOTOR_MAX_ERPM, time_constant=self.MOTOR_TIME_CONSTANT
+                )
+            )
+        self.lift = SimulatedMotor(
+            self.SKIMMER_LIFT_MOTOR,
+            max_erpm=self.MOTOR_MAX_ERPM,
+            time_constant=self.MOTOR_TIME_CONSTANT,
+            gravity_duty=self.LIFT_GRAVITY_DUTY,
+            min_tachometer=self.LIFT_MIN_TACHOMETER,
+            max_tachometer=self.LIFT_MAX_TACHOMETER,
+        )
+        motors.append(self.lift)
+        self.motor_bank = SimulatedMotorBank(motors)
+
+        # Define publishers and subscribers here
+        # These are the topic names used by ros2socketcan_bridge (from the point of view of motor_control_node)
+        self.can_pub = self.create_publisher(Frame, "CAN/" + self.CAN_INTERFACE_RECEIVE + "/receive", 100)
+        self.can_sub = self.create_subscription(
+            Frame, "CAN/" + self.CAN_INTERFACE_TRANSMIT + "/transmit", self.can_callback, 100
+        )
+        if self.PUBLISH_LIMIT_SWITCHES:
+            self.limit_switches_pub = self.create_publisher(LimitSwitches, "limitSwitches", 10)
+
+        # Define timers here
+        self.last_step_time = self.get_clock().now()
+        self.simulation_timer = self.create_timer(1 / self.SIMULATION_RATE, self.simulation_timer_callback)
+        self.status_timer = self.create_timer(1 / self.STATUS_RATE, self.status_timer_callback)
+
+    # Define timer callback methods here
+
+    def simulation_timer_callback(self) -> None:
+        """This method advances the motor dynamics by the time since it was last called."""
+        now = self.get_clock().now()
+        self.motor_bank.step((now - self.last_step_time).nanoseconds / 1e9)
+        self.last_step_time = now
+
+    def status_timer_callback(self) -> None:
+        """This method broadcasts the status frames of every simulated VESC."""
+        for can_id, data in self.motor_bank.status_frames():
+            self.can_pub.publish(
+                Frame(id=can_id, is_extended=True, dlc=len(data), data=np.frombuffer(data, dtype=np.uint8))
+            )
+        if self.PUBLISH_LIMIT_SWITCHES:
+            self.limit_switches_pub.publish(
+                LimitSwitches(
+                    top_limit_switch=self.lift.tachometer >= self.LIFT_MAX_TACHOMETER,
+                    bottom_limit_switch=self.lift.tachometer <= self.LIFT_MIN_TACHOMETER,
+                )
+            )
+
+    # Define subscriber callback methods here
+
+    def can_callback(self, msg: Frame) -> None:
+        """This method is called whenever a frame is sent to the (simulated) CAN bus."""
+        # Decode the frame's data in place (without copying it)
+        if not self.motor_bank.handle_frame(msg.id, memoryview(msg.data)[: msg.dlc]):
+            self.get_logger().debug(f"Ignored CAN frame with ID {msg.id:#x}")
+
+
+def main(args=None):
+    """The main function."""
+    rclpy.init(args=args)
+
+    node = VescSimNode()
+    node.get_logger().info("Initializing the VESC simulation!")
+    rclpy.spin(node)
+
+    node.destroy_node()
+    rclpy.shutdown()
+
+
+# This code does NOT run if this file is imported as a module
+if __name__ == "__main__":
+    main()